@@ -0,0 +1,201 @@
+#----------------------------------------------------------------------------#
+# ASGI entry point (optional).
+#
+# Serves the read routes (venue/artist/show listings, detail pages and the
+# searches) from an asyncio event loop: Quart for the request handling,
+# SQLAlchemy's asyncio extension over asyncpg for the database. A worker
+# keeps serving other requests while one waits on Postgres instead of
+# blocking a thread per request. The models, the queries in queries.py and
+# the templates are the same as the WSGI app's; the queries run on the async
+# session through run_sync().
+#
+# Writes, the JSON API, /metrics and the page cache stay on the WSGI app, so
+# put both behind one proxy and send the GET routes below (and the search
+# POSTs) here:
+#
+#   $ pip install quart asyncpg    # SQLAlchemy 1.4 or later
+#   $ hypercorn asgi:app --workers 4 -b :8001
+#----------------------------------------------------------------------------#
+
+from quart import Quart, render_template, request, abort, g, current_app, url_for
+from sqlalchemy import event, text
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+import datefmt
+from assets import url_helper
+from models import Venue, Artist
+from queries import (venue_listing, artist_listing, venue_detail, artist_detail, show_rows, search_results,
+                     nearby_rows, text_search_results)
+
+#----------------------------------------------------------------------------#
+# Database.
+#----------------------------------------------------------------------------#
+
+def async_database_uri(config):
+  url = make_url(config['SQLALCHEMY_DATABASE_URI']).set(drivername='postgresql+asyncpg')
+  if config.get('DB_PGBOUNCER'):
+    # no prepared statement cache on the SQLAlchemy side either
+    url = url.update_query_dict({'prepared_statement_cache_size': '0'})
+  return url
+
+def async_engine_options(config):
+  # The sync engine options without the psycopg2 connect_args and sync pool
+  # classes (metrics swaps in a QueuePool subclass), which asyncpg and the
+  # async pool do not take.
+  options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+  poolclass = options.pop('poolclass', None)
+  options.pop('connect_args', None)
+  if poolclass is NullPool:
+    options['poolclass'] = NullPool
+
+  timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+  if config.get('DB_PGBOUNCER'):
+    # Transaction pooling: asyncpg's statement cache keeps named prepared
+    # statements on a server connection the next transaction may not get.
+    # (asyncpg still prepares each statement, so PgBouncer needs 1.21 or
+    # later with max_prepared_statements set.)
+    options['connect_args'] = {'statement_cache_size': 0}
+  elif timeout:
+    options['connect_args'] = {'server_settings': {'statement_timeout': str(timeout)}}
+  return options
+
+def create_session_factory(config):
+  engine = create_async_engine(async_database_uri(config), **async_engine_options(config))
+  timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+  if config.get('DB_PGBOUNCER') and timeout:
+    @event.listens_for(engine.sync_engine, 'begin')
+    def set_statement_timeout(conn):
+      conn.execute(text('SET LOCAL statement_timeout = %d' % timeout))
+  return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+async def run_query(fn, *args, **kwargs):
+  # Runs one of the query builders from queries.py, which take a sync
+  # session=, on an async session; the event loop is free while it waits.
+  async with current_app.extensions['async_session']() as session:
+    return await session.run_sync(lambda sync_session: fn(*args, session=sync_session, **kwargs))
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#
+# Same endpoint names and templates as views.py.
+#----------------------------------------------------------------------------#
+
+async def index():
+  return await render_template('pages/home.html')
+
+async def search():
+  results = await run_query(text_search_results, request.args, current_app.config.get('SEARCH_PAGE_SIZE', 20))
+  return await render_template('pages/search.html', results=results)
+
+async def venues():
+  data = await run_query(venue_listing, request.args)
+  return await render_template('pages/venues.html', areas=data['data'], listing=data)
+
+async def search_venues():
+  form = await request.form
+  response = await run_query(search_results, Venue, form.get('search_term', ''),
+                             max(form.get('page', type=int, default=1), 1),
+                             current_app.config.get('SEARCH_PAGE_SIZE', 20), form.getlist('genre'))
+  return await render_template('pages/search_venues.html', results=response,
+                               search_term=form.get('search_term', ''))
+
+async def nearby_venues():
+  results = error = next_url = first_url = None
+  if request.args:
+    try:
+      results = await run_query(nearby_rows, request.args,
+                                current_app.config.get('NEARBY_PAGE_SIZE', 20),
+                                current_app.config.get('NEARBY_MAX_PAGE_SIZE', 100),
+                                current_app.config.get('NEARBY_DEFAULT_KM', 25),
+                                current_app.config.get('NEARBY_MAX_KM', 500))
+    except ValueError as e:
+      error = str(e)
+  if results is not None:
+    args = request.args.to_dict()
+    args.pop('after', None)
+    first_url = url_for('nearby_venues', **args)
+    if results['next']:
+      next_url = url_for('nearby_venues', after=results['next'], **args)
+  return await render_template('pages/nearby_venues.html', results=results, error=error,
+                               next_url=next_url, first_url=first_url)
+
+async def show_venue(venue_id):
+  data = await run_query(venue_detail, venue_id, current_app.config.get('DETAIL_SHOWS_LIMIT', 50),
+                         current_app.config.get('SERIES_HORIZON_DAYS', 365))
+  if data is None:
+    abort(404)
+  return await render_template('pages/show_venue.html', venue=data)
+
+async def artists():
+  data = await run_query(artist_listing, request.args)
+  return await render_template('pages/artists.html', artists=data['data'], listing=data)
+
+async def search_artists():
+  form = await request.form
+  response = await run_query(search_results, Artist, form.get('search_term', ''),
+                             max(form.get('page', type=int, default=1), 1),
+                             current_app.config.get('SEARCH_PAGE_SIZE', 20), form.getlist('genre'))
+  return await render_template('pages/search_artists.html', results=response,
+                               search_term=form.get('search_term', ''))
+
+async def show_artist(artist_id):
+  data = await run_query(artist_detail, artist_id, current_app.config.get('DETAIL_SHOWS_LIMIT', 50),
+                         current_app.config.get('SERIES_HORIZON_DAYS', 365))
+  if data is None:
+    abort(404)
+  return await render_template('pages/show_artist.html', artist=data)
+
+async def shows():
+  data, show_all, prev_cursor, next_cursor = await run_query(
+    show_rows, request.args, current_app.config.get('SHOWS_PAGE_SIZE', 30),
+    current_app.config.get('SHOWS_MAX_PAGE_SIZE', 100))
+  return await render_template('pages/shows.html', shows=data, show_all=show_all,
+                               prev_cursor=prev_cursor, next_cursor=next_cursor)
+
+async def not_found_error(error):
+  return await render_template('errors/404.html'), 404
+
+async def server_error(error):
+  return await render_template('errors/500.html'), 500
+
+URLS = [
+  ('/', index, None),
+  ('/search', search, None),
+  ('/venues', venues, None),
+  ('/venues/search', search_venues, ['POST']),
+  ('/venues/nearby', nearby_venues, None),
+  ('/venues/<int:venue_id>', show_venue, None),
+  ('/artists', artists, None),
+  ('/artists/search', search_artists, ['POST']),
+  ('/artists/<int:artist_id>', show_artist, None),
+  ('/shows', shows, None),
+]
+
+#----------------------------------------------------------------------------#
+# App.
+#----------------------------------------------------------------------------#
+
+def select_locale():
+  g.locale, g.timezone = datefmt.request_locale(request, current_app.config.get('LOCALES', ['en_US']))
+
+def format_datetime(value, format='medium'):
+  # datefmt reads the locale from flask.g, which Quart does not fill
+  return datefmt.format_datetime(value, format, g.get('locale'), g.get('timezone'),
+                                 current_app.config.get('SERVER_TIMEZONE'))
+
+def create_asgi_app(config='config'):
+  app = Quart(__name__)
+  app.config.from_object(config)
+  app.extensions['async_session'] = create_session_factory(app.config)
+  app.jinja_env.filters['datetime'] = format_datetime
+  app.jinja_env.globals['asset_url'] = url_helper(app.config)
+  app.before_request(select_locale)
+  for rule, view, methods in URLS:
+    app.add_url_rule(rule, view.__name__, view, methods=methods)
+  app.register_error_handler(404, not_found_error)
+  app.register_error_handler(500, server_error)
+  return app
+
+app = create_asgi_app()
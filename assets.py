@@ -0,0 +1,215 @@
+#----------------------------------------------------------------------------#
+# Static asset pipeline.
+#
+# `flask fyyur assets` copies everything under static/ into ASSETS_DIR with
+# a content hash in the name (css/main.css -> css/main.0c5a9e1f2b3d.css),
+# minifying CSS and JS that is not minified yet and writing .gz (and, with
+# the brotli package, .br) variants of the compressible files next to them.
+# manifest.json maps the source paths to the fingerprinted ones.
+#
+# Templates link assets with asset_url('css/main.css'). With a manifest it
+# returns the fingerprinted /assets/ URL, served with the precompressed
+# variant the client accepts and a year long immutable Cache-Control: a
+# changed file gets a new name, so clients and proxies never revalidate.
+# Without a manifest (development) it is the plain /static/ URL.
+#
+#   $ flask fyyur assets [--clean]
+#
+# Optional packages: brotli for .br variants, rcssmin and rjsmin for
+# stricter minification than the built-in CSS whitespace stripper (JS is
+# copied as is without rjsmin).
+#----------------------------------------------------------------------------#
+
+import os
+import re
+import gzip
+import json
+import hashlib
+import mimetypes
+import posixpath
+
+MANIFEST = 'manifest.json'
+# content types worth compressing; images and woff fonts are compressed already
+COMPRESSIBLE = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml',
+                '.ttf', '.otf', '.eot', '.ico'}
+# variants kept only when at least this much smaller than the original
+MIN_SAVING = 0.1
+# (Accept-Encoding token, file suffix), in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+for _type, _ext in (('font/woff', '.woff'), ('font/woff2', '.woff2'), ('font/ttf', '.ttf'),
+                    ('font/otf', '.otf'), ('application/vnd.ms-fontobject', '.eot'),
+                    ('application/json', '.map')):
+  mimetypes.add_type(_type, _ext)
+
+
+def fingerprint(path, content):
+  # css/main.css -> css/main.<12 hex digits of the SHA-256>.css
+  root, ext = posixpath.splitext(path)
+  return '%s.%s%s' % (root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def minify_css(text):
+  try:
+    import rcssmin
+    return rcssmin.cssmin(text)
+  except ImportError:
+    pass
+  # comments and the whitespace around punctuation; strings are left alone
+  parts = re.split(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', text)
+  for n in range(0, len(parts), 2):
+    part = re.sub(r'/\*.*?\*/', '', parts[n], flags=re.S)
+    part = re.sub(r'\s+', ' ', part)
+    part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+    parts[n] = re.sub(r':\s+', ':', part).replace(';}', '}')
+  return ''.join(parts).strip()
+
+
+def minify_js(text):
+  try:
+    import rjsmin
+  except ImportError:
+    return text
+  return rjsmin.jsmin(text)
+
+
+def minify(path, content):
+  if path.endswith('.min.css') or path.endswith('.min.js'):
+    return content
+  if path.endswith('.css'):
+    return minify_css(content.decode('utf-8')).encode('utf-8')
+  if path.endswith('.js'):
+    return minify_js(content.decode('utf-8')).encode('utf-8')
+  return content
+
+
+def rewrite_css_urls(path, text, manifest):
+  # points relative url()s of the stylesheet at path to fingerprinted files
+  def replace(match):
+    quote, url = match.groups()
+    if re.match(r'^(?:[a-z]+:|/|#)', url, re.I):
+      return match.group(0)
+    target, suffix = re.match(r'^([^?#]*)(.*)$', url).groups()
+    source = posixpath.normpath(posixpath.join(posixpath.dirname(path), target))
+    if source not in manifest:
+      return match.group(0)
+    built = posixpath.relpath(manifest[source], posixpath.dirname(path) or '.')
+    return 'url(%s%s%s%s)' % (quote, built, suffix, quote)
+  return CSS_URL.sub(replace, text)
+
+
+def compressed_variants(path, content):
+  # [(suffix, bytes)] worth storing next to the file
+  if posixpath.splitext(path)[1].lower() not in COMPRESSIBLE:
+    return []
+  variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+  if brotli is not None:
+    variants.append(('.br', brotli.compress(content, quality=11)))
+  return [(suffix, data) for suffix, data in variants if len(data) <= len(content) * (1 - MIN_SAVING)]
+
+
+def write_file(path, content):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  tmp_path = path + '.tmp'
+  with open(tmp_path, 'wb') as f:
+    f.write(content)
+  os.replace(tmp_path, path)
+
+
+def source_files(static_dir, out_dir):
+  # static paths (posix, relative), stylesheets last so the files they
+  # reference are fingerprinted first
+  out_dir = os.path.abspath(out_dir)
+  paths = []
+  for root, dirs, files in os.walk(static_dir):
+    dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != out_dir)
+    for name in files:
+      if not name.startswith('.'):
+        paths.append(os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/'))
+  return sorted(paths, key=lambda path: (path.endswith('.css'), path))
+
+
+def build(static_dir, out_dir, clean=False):
+  # Builds out_dir from static_dir; returns (files, source bytes, built
+  # bytes, smallest variant bytes). With clean, files of earlier builds
+  # not in the new manifest are removed.
+  manifest = {}
+  written = {MANIFEST}
+  files = source_bytes = built_bytes = smallest_bytes = 0
+  for path in source_files(static_dir, out_dir):
+    with open(os.path.join(static_dir, path), 'rb') as f:
+      content = f.read()
+    source_bytes += len(content)
+    content = minify(path, content)
+    if path.endswith('.css'):
+      content = rewrite_css_urls(path, content.decode('utf-8'), manifest).encode('utf-8')
+    built = fingerprint(path, content)
+    manifest[path] = built
+    write_file(os.path.join(out_dir, built), content)
+    written.add(built)
+    sizes = [len(content)]
+    for suffix, data in compressed_variants(path, content):
+      write_file(os.path.join(out_dir, built + suffix), data)
+      written.add(built + suffix)
+      sizes.append(len(data))
+    files += 1
+    built_bytes += len(content)
+    smallest_bytes += min(sizes)
+
+  write_file(os.path.join(out_dir, MANIFEST),
+             json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+  if clean:
+    for root, dirs, names in os.walk(out_dir):
+      for name in names:
+        path = os.path.relpath(os.path.join(root, name), out_dir).replace(os.sep, '/')
+        if path not in written:
+          os.remove(os.path.join(root, name))
+  return files, source_bytes, built_bytes, smallest_bytes
+
+
+def load_manifest(out_dir):
+  try:
+    with open(os.path.join(out_dir, MANIFEST), encoding='utf-8') as f:
+      return json.load(f)
+  except FileNotFoundError:
+    return None
+
+
+def url_helper(config):
+  # asset_url() for the templates of an app with this config; the manifest
+  # is read once, so deploys build the assets before starting the app
+  manifest = load_manifest(config['ASSETS_DIR'])
+
+  def asset_url(path):
+    if manifest and path in manifest:
+      return '/assets/' + manifest[path]
+    return '/static/' + path
+  return asset_url
+
+
+def send_asset(out_dir, filename, accept_encodings):
+  # a fingerprinted file as the best precompressed variant the client
+  # accepts (werkzeug MIMEAccept of Accept-Encoding), cached for good
+  from flask import send_from_directory
+  mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+  encoding = None
+  for token, suffix in ENCODINGS:
+    if accept_encodings.quality(token) > 0 and os.path.isfile(os.path.join(out_dir, filename + suffix)):
+      encoding = token
+      response = send_from_directory(out_dir, filename + suffix, mimetype=mimetype, max_age=31536000)
+      break
+  else:
+    response = send_from_directory(out_dir, filename, mimetype=mimetype, max_age=31536000)
+  if encoding is not None:
+    response.headers['Content-Encoding'] = encoding
+  if os.path.splitext(filename)[1].lower() in COMPRESSIBLE:
+    response.vary.add('Accept-Encoding')
+  response.headers['Cache-Control'] = IMMUTABLE
+  return response
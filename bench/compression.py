@@ -0,0 +1,81 @@
+#----------------------------------------------------------------------------#
+# Compression benchmark.
+#
+# Fetches one response per read route through the test client and reports,
+# per route, the identity size and for each codec the encoded size, the
+# ratio and the CPU time to compress it (median over --repeat runs), plus
+# the end-to-end p50 with and without Accept-Encoding. The CPU column is
+# what a page cache miss pays for the bytes column; hits reuse the encoded
+# body (see compression.py).
+#
+#   $ flask bench compression [--repeat 20] [--route venues ...]
+#----------------------------------------------------------------------------#
+
+import time
+import random
+import statistics
+from compression import compress, brotli
+from bench.routes import build_requests, percentile
+
+CODECS = [('gzip-1', 'gzip', 1), ('gzip-6', 'gzip', 6), ('gzip-9', 'gzip', 9)]
+if brotli is not None:
+  CODECS += [('br-4', 'br', 4), ('br-11', 'br', 11)]
+
+
+def cpu_ms(body, encoding, level, repeat):
+  samples = []
+  for _ in range(repeat):
+    started = time.process_time()
+    data = compress(body, encoding, level, level)
+    samples.append((time.process_time() - started) * 1000.0)
+  return len(data), statistics.median(samples)
+
+
+def request_ms(client, method, url, data, headers, repeat):
+  samples = []
+  for _ in range(repeat):
+    started = time.perf_counter()
+    response = client.open(url, method=method, data=data, headers=headers)
+    response.get_data()
+    samples.append((time.perf_counter() - started) * 1000.0)
+  samples.sort()
+  return percentile(samples, 50), len(response.get_data())
+
+
+def run(app, db, Venue, Artist, repeat=20, seed=1, only=None):
+  # Returns {route: {'bytes', 'codecs': {name: (bytes, cpu ms)}, 'identity_ms',
+  # 'encoded_ms', 'wire_bytes'}}.
+  client = app.test_client()
+  with app.app_context():
+    plan = build_requests(app, db, Venue, Artist, random.Random(seed), 1)
+  results = {}
+  for name, [(method, url, data)] in plan:
+    if only and name not in only:
+      continue
+    response = client.open(url, method=method, data=data, headers={'Accept-Encoding': 'identity'})
+    body = response.get_data()
+    if response.status_code != 200:
+      continue
+    codecs = {}
+    for codec, encoding, level in CODECS:
+      codecs[codec] = cpu_ms(body, encoding, level, repeat)
+    identity_ms, _ = request_ms(client, method, url, data, {'Accept-Encoding': 'identity'}, repeat)
+    encoded_ms, wire_bytes = request_ms(client, method, url, data, {'Accept-Encoding': 'gzip, br'}, repeat)
+    results[name] = {'bytes': len(body), 'codecs': codecs, 'identity_ms': identity_ms,
+                     'encoded_ms': encoded_ms, 'wire_bytes': wire_bytes}
+  return results
+
+
+def report(results):
+  codecs = [codec for codec, _, _ in CODECS]
+  lines = ['%-18s %9s ' % ('route', 'bytes') + ' '.join('%17s' % codec for codec in codecs) +
+           ' %9s %9s %9s' % ('wire', 'id ms', 'enc ms'),
+           '%-18s %9s ' % ('', '') + ' '.join('%17s' % 'ratio / cpu ms' for _ in codecs)]
+  for name, stats in sorted(results.items()):
+    cells = []
+    for codec in codecs:
+      size, ms = stats['codecs'][codec]
+      cells.append('%9.1f%% %6.2f' % (100.0 * size / max(stats['bytes'], 1), ms))
+    lines.append('%-18s %9d ' % (name, stats['bytes']) + ' '.join('%17s' % cell for cell in cells) +
+                 ' %9d %9.2f %9.2f' % (stats['wire_bytes'], stats['identity_ms'], stats['encoded_ms']))
+  return '\n'.join(lines)
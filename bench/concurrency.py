@@ -0,0 +1,116 @@
+#----------------------------------------------------------------------------#
+# Concurrency benchmark.
+#
+# Drives running servers with many concurrent keep-alive clients and reports
+# throughput and latency percentiles per concurrency level, e.g. the WSGI app
+# under gunicorn against the ASGI app under hypercorn, same worker count and
+# database:
+#
+#   $ gunicorn --preload -w 4 -b :8000 wsgi:app
+#   $ hypercorn asgi:app --workers 4 -b :8001
+#   $ python -m bench.concurrency wsgi=http://127.0.0.1:8000 asgi=http://127.0.0.1:8001 \
+#       [--concurrency 1,16,64,256] [--duration 10] [--path /venues/1 ...]
+#
+# Turn the page cache off (CACHE_BACKEND = None) on the WSGI side to compare
+# the database paths.
+#----------------------------------------------------------------------------#
+
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+from bench.routes import percentile
+
+DEFAULT_PATHS = ['/venues', '/artists', '/shows', '/venues/1', '/artists/1']
+
+
+async def read_response(reader):
+  # status code of one HTTP/1.1 response, body read and discarded
+  head = await reader.readuntil(b'\r\n\r\n')
+  lines = head.decode('latin-1').split('\r\n')
+  status = int(lines[0].split()[1])
+  headers = {}
+  for line in lines[1:]:
+    if ':' in line:
+      name, value = line.split(':', 1)
+      headers[name.strip().lower()] = value.strip()
+  if headers.get('transfer-encoding', '').lower() == 'chunked':
+    while True:
+      size = int((await reader.readline()).split(b';')[0], 16)
+      await reader.readexactly(size + 2)
+      if size == 0:
+        break
+  else:
+    await reader.readexactly(int(headers.get('content-length', 0)))
+  return status, headers.get('connection', '').lower() == 'close'
+
+
+async def client(url, paths, offset, deadline, samples, errors):
+  # one keep-alive connection issuing requests back to back until deadline
+  parts = urlsplit(url)
+  connection = None
+  index = offset
+  while time.perf_counter() < deadline:
+    path = paths[index % len(paths)]
+    index += 1
+    try:
+      if connection is None:
+        connection = await asyncio.open_connection(parts.hostname, parts.port or 80)
+      reader, writer = connection
+      started = time.perf_counter()
+      writer.write(('GET %s HTTP/1.1\r\nHost: %s\r\n\r\n' % (path, parts.netloc)).encode('latin-1'))
+      status, closed = await read_response(reader)
+      samples.append(time.perf_counter() - started)
+      if status != 200:
+        errors.append(status)
+      if closed:
+        writer.close()
+        connection = None
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+      errors.append(type(e).__name__)
+      connection = None
+  if connection is not None:
+    connection[1].close()
+
+
+async def run_level(url, paths, concurrency, duration):
+  samples, errors = [], []
+  deadline = time.perf_counter() + duration
+  started = time.perf_counter()
+  await asyncio.gather(*[client(url, paths, i, deadline, samples, errors) for i in range(concurrency)])
+  elapsed = time.perf_counter() - started
+  samples.sort()
+  return {
+    'requests': len(samples),
+    'rps': len(samples) / elapsed,
+    'p50': percentile(samples, 50),
+    'p95': percentile(samples, 95),
+    'p99': percentile(samples, 99),
+    'errors': len(errors),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('targets', nargs='+', help='name=base URL of a running server')
+  parser.add_argument('--concurrency', default='1,16,64,256', help='Comma separated client counts.')
+  parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level.')
+  parser.add_argument('--warmup', type=float, default=2.0, help='Seconds of load before each target.')
+  parser.add_argument('--path', action='append', dest='paths', help='Paths to cycle through.')
+  args = parser.parse_args()
+
+  paths = args.paths or DEFAULT_PATHS
+  levels = [int(level) for level in args.concurrency.split(',')]
+  print ('%-8s %6s %9s %9s %9s %9s %8s' % ('target', 'conc', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'))
+  for target in args.targets:
+    name, _, url = target.partition('=')
+    asyncio.run(run_level(url, paths, levels[0], args.warmup))
+    for concurrency in levels:
+      result = asyncio.run(run_level(url, paths, concurrency, args.duration))
+      print ('%-8s %6d %9.1f %9.1f %9.1f %9.1f %8d'
+             % (name, concurrency, result['rps'], result['p50'] * 1000.0,
+                result['p95'] * 1000.0, result['p99'] * 1000.0, result['errors']))
+
+
+if __name__ == '__main__':
+  main()
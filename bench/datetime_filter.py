@@ -0,0 +1,51 @@
+#----------------------------------------------------------------------------#
+# Datetime filter micro-benchmark.
+#
+# Formats the start times of a 500-show page the old way (stringify in the
+# controller, dateutil.parser.parse + babel.dates.format_datetime in the
+# filter) and through datefmt.format_datetime with native datetimes.
+#
+#   $ python -m bench.datetime_filter [--shows 500] [--repeat 20]
+#----------------------------------------------------------------------------#
+
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+import dateutil.parser
+import babel.dates
+from datefmt import format_datetime, FORMATS, DEFAULT_LOCALE
+
+
+def old_filter(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  return babel.dates.format_datetime(date, FORMATS.get(format, format), locale=DEFAULT_LOCALE)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--shows', type=int, default=500)
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  rng = random.Random(1)
+  start = datetime(2026, 1, 1, 18, 0)
+  times = [start + timedelta(minutes=30 * rng.randrange(20000)) for _ in range(args.shows)]
+
+  def old_page():
+    for value in times:
+      old_filter(str(value), 'full')
+
+  def new_page():
+    for value in times:
+      format_datetime(value, 'full')
+
+  assert old_filter(str(times[0]), 'full') == format_datetime(times[0], 'full')
+  for name, page in (('str + dateutil + babel', old_page), ('datefmt, native datetimes', new_page)):
+    best = min(timeit.repeat(page, number=1, repeat=args.repeat))
+    print ('%-28s %8.2f ms per %d-show page (%.1f us per show)'
+           % (name, best * 1000.0, args.shows, best * 1e6 / args.shows))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,288 @@
+#----------------------------------------------------------------------------#
+# Synthetic catalogue generator.
+#
+# Loads a reproducible (seeded) catalogue straight through COPY: venues and
+# artists spread over cities weighted by size, and shows whose venue and
+# artist are drawn from a Zipf-like popularity curve, so a few venues and
+# artists carry most of the shows as they do in the real data. Shows fill
+# two hour evening slots and never double-book a venue (the Show exclusion
+# constraint would reject the COPY); a venue with no slot left hands its
+# show to a venue picked uniformly.
+#
+#   $ flask bench seed --venues 100000 --artists 200000 --shows 5000000
+#----------------------------------------------------------------------------#
+
+import io
+import csv
+import time
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from geo import encode
+
+CITIES = [
+  ('New York', 'NY', 20), ('Los Angeles', 'CA', 13), ('Chicago', 'IL', 9),
+  ('Houston', 'TX', 7), ('Phoenix', 'AZ', 5), ('Philadelphia', 'PA', 5),
+  ('San Antonio', 'TX', 4), ('San Diego', 'CA', 4), ('Dallas', 'TX', 4),
+  ('San Francisco', 'CA', 4), ('Austin', 'TX', 3), ('Seattle', 'WA', 3),
+  ('Denver', 'CO', 3), ('Nashville', 'TN', 3), ('Boston', 'MA', 3),
+  ('Portland', 'OR', 2), ('New Orleans', 'LA', 2), ('Atlanta', 'GA', 2),
+  ('Miami', 'FL', 2), ('Minneapolis', 'MN', 1), ('Detroit', 'MI', 1),
+]
+
+# rough city centres; venues are scattered up to ~15 km around them
+CITY_CENTERS = {
+  'New York': (40.7128, -74.0060), 'Los Angeles': (34.0522, -118.2437),
+  'Chicago': (41.8781, -87.6298), 'Houston': (29.7604, -95.3698),
+  'Phoenix': (33.4484, -112.0740), 'Philadelphia': (39.9526, -75.1652),
+  'San Antonio': (29.4241, -98.4936), 'San Diego': (32.7157, -117.1611),
+  'Dallas': (32.7767, -96.7970), 'San Francisco': (37.7749, -122.4194),
+  'Austin': (30.2672, -97.7431), 'Seattle': (47.6062, -122.3321),
+  'Denver': (39.7392, -104.9903), 'Nashville': (36.1627, -86.7816),
+  'Boston': (42.3601, -71.0589), 'Portland': (45.5152, -122.6784),
+  'New Orleans': (29.9511, -90.0715), 'Atlanta': (33.7490, -84.3880),
+  'Miami': (25.7617, -80.1918), 'Minneapolis': (44.9778, -93.2650),
+  'Detroit': (42.3314, -83.0458),
+}
+SCATTER_DEGREES = 0.13
+
+GENRES = [
+  'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+  'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+  'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+  'Other',
+]
+
+VENUE_WORDS = ['Hall', 'Lounge', 'Club', 'Room', 'Theatre', 'Garden', 'Cellar',
+               'Hop', 'Station', 'Coffee', 'Live Music', 'Stage', 'Tavern', 'Arena']
+ARTIST_WORDS = ['Band', 'Collective', 'Trio', 'Quartet', 'Orchestra', 'Project',
+                'Sound', 'Brothers', 'Sisters', 'Experience', 'Ensemble']
+ADJECTIVES = ['Musical', 'Wild', 'Electric', 'Velvet', 'Golden', 'Park Square',
+              'Midnight', 'Blue', 'Red', 'Silver', 'Dusty', 'Neon', 'Lucky',
+              'Crimson', 'Hollow', 'Northern', 'Sax', 'Rolling', 'Quiet']
+
+BATCH_ROWS = 50000
+
+# two hour slots starting at 6pm, 8pm and 10pm
+SLOT_HOURS = [18, 20, 22]
+SLOT_LENGTH = timedelta(hours=2)
+SLOT_TRIES = 8
+
+
+def genre_picks(rng, picks):
+  # a row's genres go to picks, linked once the row has an id
+  picks.append(rng.sample(GENRES, rng.randint(1, 3)))
+
+
+def popularity(count, skew):
+  # cumulative Zipf weights for ids ranked 1..count
+  return list(accumulate(1.0 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def copy_rows(connection, table, columns, rows):
+  # streams rows into COPY in BATCH_ROWS sized chunks
+  cursor = connection.cursor()
+  sql = 'COPY "%s" (%s) FROM STDIN WITH (FORMAT csv)' % (table, ', '.join(columns))
+  total = 0
+  batch = []
+
+  def flush():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(batch)
+    buffer.seek(0)
+    cursor.copy_expert(sql, buffer)
+    del batch[:]
+
+  for row in rows:
+    batch.append(row)
+    total += 1
+    if len(batch) >= BATCH_ROWS:
+      flush()
+  if batch:
+    flush()
+  cursor.close()
+  return total
+
+
+def venue_rows(rng, count, city_weights, picks):
+  for n in range(count):
+    city, state, _ = rng.choices(CITIES, cum_weights=city_weights)[0]
+    name = 'The %s %s %d' % (rng.choice(ADJECTIVES), rng.choice(VENUE_WORDS), n)
+    genre_picks(rng, picks)
+    lat, lng = CITY_CENTERS[city]
+    lat += rng.uniform(-SCATTER_DEGREES, SCATTER_DEGREES)
+    lng += rng.uniform(-SCATTER_DEGREES, SCATTER_DEGREES)
+    yield (name, city, state,
+           '%d %s St' % (rng.randint(1, 9999), rng.choice(ADJECTIVES)),
+           '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+           'https://example.com/img/venue/%d.jpg' % n,
+           'https://www.facebook.com/venue%d' % n,
+           rng.choice(['Yes', '']),
+           'Looking for local talent',
+           'https://venue%d.example.com' % n,
+           lat, lng, encode(lat, lng))
+
+
+def artist_rows(rng, count, city_weights, picks):
+  for n in range(count):
+    city, state, _ = rng.choices(CITIES, cum_weights=city_weights)[0]
+    name = '%s %s %d' % (rng.choice(ADJECTIVES), rng.choice(ARTIST_WORDS), n)
+    genre_picks(rng, picks)
+    yield (name, city, state,
+           '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+           'https://example.com/img/artist/%d.jpg' % n,
+           'https://www.facebook.com/artist%d' % n,
+           rng.choice(['Yes', '']),
+           'Looking for shows',
+           'https://artist%d.example.com' % n)
+
+
+def copy_with_genres(connection, table, link, fk, columns, rows_for):
+  # COPYs rows_for(picks) into table, then their genre links into link: the
+  # new rows get the ids after the current maximum, in COPY order.
+  cursor = connection.cursor()
+  cursor.execute('SELECT coalesce(max(id), 0) FROM "%s"' % table)
+  last_id = cursor.fetchone()[0]
+  picks = []
+  copy_rows(connection, table, columns, rows_for(picks))
+  cursor.execute('SELECT id FROM "%s" WHERE id > %%s ORDER BY id' % table, (last_id,))
+  ids = [row[0] for row in cursor.fetchall()]
+  cursor.execute('SELECT name, id FROM "Genre"')
+  genre_ids = dict(cursor.fetchall())
+  cursor.close()
+  copy_rows(connection, link, [fk, 'id_genre'],
+            ((id, genre_ids[name]) for id, genres in zip(ids, picks) for name in genres))
+
+
+def slot_window(now):
+  # (first day, days) shows are generated over: two years of history, one
+  # year of bookings ahead
+  return (now - timedelta(days=730)).replace(hour=0, minute=0, second=0, microsecond=0), 1095
+
+
+class SlotBook(object):
+  # Booked slots as one bit per (day, slot hour) of the window for each
+  # venue: ~400 bytes per venue with shows instead of a set entry per show.
+
+  def __init__(self, earliest, days):
+    self.earliest = earliest
+    self.days = days
+    self.size = days * len(SLOT_HOURS)
+    self.venues = {}
+
+  def index(self, day, hour_index):
+    return day * len(SLOT_HOURS) + hour_index
+
+  def start(self, index):
+    day, hour_index = divmod(index, len(SLOT_HOURS))
+    return self.earliest + timedelta(days=day, hours=SLOT_HOURS[hour_index])
+
+  def is_booked(self, id_venue, index):
+    bits = self.venues.get(id_venue)
+    return bits is not None and bits[index >> 3] & (1 << (index & 7))
+
+  def book(self, id_venue, index):
+    bits = self.venues.get(id_venue)
+    if bits is None:
+      bits = self.venues[id_venue] = bytearray((self.size + 7) // 8)
+    bits[index >> 3] |= 1 << (index & 7)
+
+  def book_range(self, id_venue, start_time, end_time):
+    # every slot of the window [start_time, end_time) overlaps
+    first = max((start_time - self.earliest).days - 1, 0)
+    last = min((end_time - self.earliest).days + 1, self.days)
+    for day in range(first, last):
+      for hour_index in range(len(SLOT_HOURS)):
+        index = self.index(day, hour_index)
+        slot = self.start(index)
+        if slot < end_time and start_time < slot + SLOT_LENGTH:
+          self.book(id_venue, index)
+
+
+def booked_slots(cursor, earliest, days):
+  # SlotBook of the slots existing shows overlap, streamed through a named
+  # cursor so the shows are never all in memory
+  book = SlotBook(earliest, days)
+  cursor.execute('SELECT id_venue, start_time, end_time FROM "Show" WHERE end_time > %s AND start_time < %s',
+                 (earliest, earliest + timedelta(days=days + 1)))
+  for id_venue, start_time, end_time in cursor:
+    book.book_range(id_venue, start_time, end_time)
+  cursor.close()
+  return book
+
+
+def show_rows(rng, count, venue_ids, artist_ids, skew, booked):
+  venue_weights = popularity(len(venue_ids), skew)
+  artist_weights = popularity(len(artist_ids), skew)
+  remaining = count
+  while remaining:
+    k = min(remaining, BATCH_ROWS)
+    venues = rng.choices(venue_ids, cum_weights=venue_weights, k=k)
+    artists = rng.choices(artist_ids, cum_weights=artist_weights, k=k)
+    for id_venue, id_artist in zip(venues, artists):
+      for attempt in range(SLOT_TRIES * 2):
+        if attempt == SLOT_TRIES:
+          id_venue = rng.choice(venue_ids)
+        index = rng.randrange(booked.size)
+        if not booked.is_booked(id_venue, index):
+          break
+      else:
+        continue
+      booked.book(id_venue, index)
+      start_time = booked.start(index)
+      yield (id_artist, id_venue, start_time.isoformat(), (start_time + SLOT_LENGTH).isoformat())
+    remaining -= k
+
+
+def generate(db, venues, artists, shows, seed=1, skew=1.1, truncate=False):
+  # Returns {table: (rows, seconds)}.
+  rng = random.Random(seed)
+  city_weights = list(accumulate(weight for _, _, weight in CITIES))
+  stats = {}
+  connection = db.engine.raw_connection()
+  try:
+    cursor = connection.cursor()
+    if truncate:
+      cursor.execute('TRUNCATE "Show", "Venue", "Artist" RESTART IDENTITY CASCADE')
+    cursor.execute('INSERT INTO "Genre" (name) SELECT unnest(%s) ON CONFLICT (name) DO NOTHING', (GENRES,))
+
+    started = time.perf_counter()
+    copy_with_genres(connection, 'Venue', 'VenueGenre', 'id_venue',
+                     ['name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+                      'seeking_talent', 'seeking_description', 'website',
+                      'latitude', 'longitude', 'geohash'],
+                     lambda picks: venue_rows(rng, venues, city_weights, picks))
+    stats['Venue'] = (venues, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    copy_with_genres(connection, 'Artist', 'ArtistGenre', 'id_artist',
+                     ['name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                      'seeking_venue', 'seeking_description', 'website'],
+                     lambda picks: artist_rows(rng, artists, city_weights, picks))
+    stats['Artist'] = (artists, time.perf_counter() - started)
+
+    cursor.execute('SELECT id FROM "Venue" ORDER BY id')
+    venue_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute('SELECT id FROM "Artist" ORDER BY id')
+    artist_ids = [row[0] for row in cursor.fetchall()]
+    # shuffle so popularity is not correlated with insertion order
+    rng.shuffle(venue_ids)
+    rng.shuffle(artist_ids)
+
+    started = time.perf_counter()
+    booked = booked_slots(connection.cursor('booked_slots'), *slot_window(datetime.now()))
+    loaded = copy_rows(connection, 'Show', ['id_artist', 'id_venue', 'start_time', 'end_time'],
+                       show_rows(rng, shows, venue_ids, artist_ids, skew, booked))
+    stats['Show'] = (loaded, time.perf_counter() - started)
+
+    for table in ('Genre', 'Venue', 'Artist', 'VenueGenre', 'ArtistGenre'):
+      cursor.execute('ANALYZE "%s"' % table)
+    cursor.execute('ANALYZE "Show"')
+    cursor.close()
+    connection.commit()
+  except Exception:
+    connection.rollback()
+    raise
+  finally:
+    connection.close()
+  return stats
@@ -0,0 +1,227 @@
+#----------------------------------------------------------------------------#
+# Route benchmark.
+#
+# Drives every read route of the app (taken from its URL map, see
+# route_table) through the Flask test client against the configured
+# database and reports latency percentiles, queries per request and rows
+# fetched per request. Results can be saved as a JSON baseline and
+# later runs compared against it.
+#
+#   $ flask bench run --save bench/baseline.json
+#   $ flask bench run --compare bench/baseline.json
+#----------------------------------------------------------------------------#
+
+import json
+import time
+import random
+from sqlalchemy import event
+from werkzeug.routing import AnyConverter
+
+
+def percentile(samples, pct):
+  # nearest-rank percentile of an already sorted list
+  if not samples:
+    return 0.0
+  index = max(int(round(pct / 100.0 * len(samples) + 0.5)) - 1, 0)
+  return samples[min(index, len(samples) - 1)]
+
+
+class QueryCounter(object):
+  # counts statements and fetched rows on the engine while active
+
+  def __init__(self, engine):
+    self.engine = engine
+    self.queries = 0
+    self.rows = 0
+
+  def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    self.queries += 1
+    if cursor.description is not None and cursor.rowcount > 0:
+      self.rows += cursor.rowcount
+
+  def __enter__(self):
+    event.listen(self.engine, 'after_cursor_execute', self.after_cursor_execute)
+    return self
+
+  def __exit__(self, *exc):
+    event.remove(self.engine, 'after_cursor_execute', self.after_cursor_execute)
+
+
+# endpoints not driven: files (assets, static), the bulk exports, which
+# stream whole tables, and the Prometheus scrape endpoint
+SKIPPED = {'static', 'asset', 'api_export', 'metrics'}
+
+# read-only POST routes; every other POST writes
+POST_ROUTES = {
+  'search_venues': lambda pick: {'search_term': pick.term()},
+  'search_artists': lambda pick: {'search_term': pick.term()},
+}
+
+# query strings of the GET routes that need one
+QUERIES = {
+  'search': lambda pick: {'q': pick.term()},
+  'api_search': lambda pick: {'q': pick.term()},
+  'api_typeahead': lambda pick: {'q': pick.term()[:2]},
+  'nearby_venues': lambda pick: pick.location(),
+  'api_nearby_venues': lambda pick: pick.location(),
+}
+
+# extra runs of a route with other arguments: name -> (endpoint, query)
+VARIANTS = {
+  'shows_all': ('shows', {'all': 1}),
+}
+
+
+class Picker(object):
+  # random targets for the route arguments: ids of existing rows, search
+  # terms, the coordinates of a located venue and any() converter values
+
+  TERMS = ['the', 'band', 'hop', 'music', 'jazz', 'sax', 'club', 'velvet']
+
+  def __init__(self, db, Venue, Artist, rng):
+    from models import Show, ShowSeries
+    self.rng = rng
+    self.ids = {
+      'venue_id': [row[0] for row in db.session.query(Venue.id).limit(10000)],
+      'artist_id': [row[0] for row in db.session.query(Artist.id).limit(10000)],
+      'show_id': [row[0] for row in db.session.query(Show.id).limit(10000)],
+      'series_id': [row[0] for row in db.session.query(ShowSeries.id).limit(10000)],
+    }
+    self.locations = db.session.query(Venue.latitude, Venue.longitude) \
+      .filter(Venue.latitude.isnot(None)).limit(10000).all()
+
+  def term(self):
+    return self.rng.choice(self.TERMS)
+
+  def location(self):
+    if not self.locations:
+      return {'city': 'New York', 'state': 'NY'}
+    lat, lng = self.rng.choice(self.locations)
+    return {'lat': lat, 'lng': lng}
+
+  def can_fill(self, rule):
+    return all(isinstance(converter, AnyConverter) or self.ids.get(name)
+               for name, converter in rule._converters.items())
+
+  def choices(self, converter):
+    # values of an any() converter; werkzeug keeps only the regex,
+    # (?:venues|artists)
+    return [value.replace('\\', '') for value in converter.regex[3:-1].split('|')]
+
+  def values(self, rule):
+    values = {}
+    for name, converter in rule._converters.items():
+      if isinstance(converter, AnyConverter):
+        values[name] = self.rng.choice(self.choices(converter))
+      else:
+        values[name] = self.rng.choice(self.ids[name])
+    return values
+
+
+def route_table(app, picker, skipped=SKIPPED):
+  # {name: callable returning (method, url, form data)} for every read
+  # route of app.url_map whose arguments picker can fill; make(extra=...)
+  # overrides url arguments
+  adapter = app.url_map.bind('localhost')
+  routes = {}
+  for rule in app.url_map.iter_rules():
+    endpoint = rule.endpoint
+    if endpoint in skipped or endpoint in routes or not picker.can_fill(rule):
+      continue
+    if 'GET' in rule.methods:
+      method, form, query = 'GET', None, QUERIES.get(endpoint)
+    elif endpoint in POST_ROUTES:
+      method, form, query = 'POST', POST_ROUTES[endpoint], None
+    else:
+      continue
+
+    def make(rule=rule, method=method, form=form, query=query, extra=None):
+      args = dict(picker.values(rule))
+      args.update(query(picker) if query else {})
+      args.update(extra or {})
+      url = adapter.build(rule.endpoint, args, method=method)
+      return method, url, form(picker) if form else None
+    routes[endpoint] = make
+
+  for name, (endpoint, extra) in VARIANTS.items():
+    if endpoint in routes:
+      routes[name] = lambda make=routes[endpoint], extra=extra: make(extra=extra)
+  return routes
+
+
+def build_requests(app, db, Venue, Artist, rng, count):
+  # (name, [(method, url, form data)] * count) per read route, named after
+  # the endpoint; routes with arguments get a fresh random target on every
+  # iteration
+  routes = route_table(app, Picker(db, Venue, Artist, rng))
+  return [(name, [make() for _ in range(count)]) for name, make in sorted(routes.items())]
+
+
+def run(app, db, Venue, Artist, iterations=50, warmup=3, seed=1, only=None):
+  # Returns {route: {p50_ms, p95_ms, p99_ms, queries, rows, errors}}.
+  # Write routes are not driven: they would change the data being measured.
+  rng = random.Random(seed)
+  results = {}
+  client = app.test_client()
+  with app.app_context():
+    plan = build_requests(app, db, Venue, Artist, rng, iterations + warmup)
+  for name, requests in plan:
+    if only and name not in only:
+      continue
+    timings = []
+    queries = rows = errors = 0
+    for n, (method, url, data) in enumerate(requests):
+      with QueryCounter(db.engine) as counter:
+        started = time.perf_counter()
+        response = client.open(url, method=method, data=data)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+      if n < warmup:
+        continue
+      if response.status_code >= 400:
+        errors += 1
+      timings.append(elapsed * 1000.0)
+      queries += counter.queries
+      rows += counter.rows
+    timings.sort()
+    results[name] = {
+      'p50_ms': round(percentile(timings, 50), 3),
+      'p95_ms': round(percentile(timings, 95), 3),
+      'p99_ms': round(percentile(timings, 99), 3),
+      'queries': round(queries / float(iterations), 2),
+      'rows': round(rows / float(iterations), 2),
+      'errors': errors,
+    }
+  return results
+
+
+def report(results):
+  lines = ['%-20s %10s %10s %10s %9s %10s %7s'
+           % ('route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'rows', 'errors')]
+  for name, stats in sorted(results.items()):
+    lines.append('%-20s %10.2f %10.2f %10.2f %9.1f %10.1f %7d'
+                 % (name, stats['p50_ms'], stats['p95_ms'], stats['p99_ms'],
+                    stats['queries'], stats['rows'], stats['errors']))
+  return '\n'.join(lines)
+
+
+def save(results, path):
+  with open(path, 'w') as f:
+    json.dump(results, f, indent=2, sort_keys=True)
+
+
+def compare(results, path, tolerance=0.2):
+  # Returns a list of human readable regressions against the baseline file:
+  # p95 slower by more than `tolerance`, or more queries per request.
+  with open(path) as f:
+    baseline = json.load(f)
+  regressions = []
+  for name, stats in sorted(results.items()):
+    before = baseline.get(name)
+    if before is None:
+      continue
+    if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+      regressions.append('%s: p95 %.2f ms -> %.2f ms' % (name, before['p95_ms'], stats['p95_ms']))
+    if stats['queries'] > before['queries']:
+      regressions.append('%s: queries/request %.1f -> %.1f' % (name, before['queries'], stats['queries']))
+  return regressions
@@ -0,0 +1,61 @@
+#----------------------------------------------------------------------------#
+# Startup benchmark.
+#
+# Times create_app() in fresh interpreters: lazily (what every flask command
+# pays), eagerly (what a worker pays with wsgi.py) and lazily followed by the
+# first request (what a lazily started worker pays before its first
+# response). Reports the median of each and how many modules were loaded.
+# The flask command also loads its plugins' command groups (Flask-Migrate's
+# db among them) before it gets to create_app(); that part is not timed.
+#
+#   $ python -m bench.startup [--repeat 10]
+#----------------------------------------------------------------------------#
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app(lazy=%(lazy)r)
+created = time.perf_counter()
+if %(request)r:
+  app.test_client().get('/')
+finished = time.perf_counter()
+print(created - started, finished - created, len(sys.modules))
+'''
+
+SCENARIOS = [
+  ('create_app() (flask CLI)', {'lazy': True, 'request': False}),
+  ('create_app(lazy=False) (wsgi)', {'lazy': False, 'request': False}),
+  ('lazy + first request', {'lazy': True, 'request': True}),
+]
+
+
+def probe(options):
+  output = subprocess.check_output([sys.executable, '-c', PROBE % options], cwd=ROOT)
+  startup, first_request, modules = output.split()[-3:]
+  return float(startup), float(first_request), int(modules)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--repeat', type=int, default=10)
+  args = parser.parse_args()
+
+  for name, options in SCENARIOS:
+    samples = [probe(options) for _ in range(args.repeat)]
+    startup = statistics.median(sample[0] for sample in samples)
+    first_request = statistics.median(sample[1] for sample in samples)
+    print ('%-30s %8.1f ms startup %8.1f ms first request %5d modules'
+           % (name, startup * 1000.0, first_request * 1000.0, samples[-1][2]))
+
+
+if __name__ == '__main__':
+  main()
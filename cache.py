@@ -0,0 +1,286 @@
+#----------------------------------------------------------------------------#
+# Page cache.
+#
+# Caches rendered GET responses keyed by URL. Every cached page carries a set
+# of tags ('venues', 'venue:3', ...); writes call invalidate() with the tags
+# they affect. Invalidation bumps a per-tag version that is part of the cache
+# key, so stale pages simply stop being looked up; the backend then drops
+# them once they expire or as the least recently written past its size.
+#
+# Backends:
+#   'lru'  - in-process, bounded, least recently used eviction
+#   'file' - pickled entries in a directory shared by every worker; expired
+#            entries are deleted when read and by a sweep, run by whichever
+#            worker writes first after CACHE_SWEEP_INTERVAL seconds, that
+#            also trims the directory to CACHE_MAX_ENTRIES by write time
+#----------------------------------------------------------------------------#
+
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+import threading
+from functools import wraps
+from collections import OrderedDict
+from flask import request, session, make_response
+from flask.signals import Namespace
+
+# sent with endpoint= and hit= on every cache lookup
+cache_lookup = Namespace().signal('page-cache-lookup')
+
+
+class LRUBackend(object):
+
+  def __init__(self, max_entries=1024):
+    self.max_entries = max_entries
+    self.entries = OrderedDict()
+    self.tags = {}
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      expires_at, value = entry
+      if expires_at is not None and expires_at < time.time():
+        del self.entries[key]
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    expires_at = time.time() + ttl if ttl else None
+    with self.lock:
+      self.entries[key] = (expires_at, value)
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.tags.clear()
+
+  # tag versions live outside the LRU so they are never evicted
+  def tag_version(self, tag):
+    return self.tags.get(tag, 0)
+
+  def bump_tag(self, tag):
+    with self.lock:
+      self.tags[tag] = time.time_ns()
+
+
+class FileBackend(object):
+  # An entry file holds two pickles, the expiry time then the value, so the
+  # sweep reads only the first.
+
+  SWEEP_MARKER = '.swept'
+
+  def __init__(self, directory, max_entries=None, sweep_interval=60):
+    self.directory = directory
+    self.tag_directory = os.path.join(directory, 'tags')
+    self.max_entries = max_entries
+    self.sweep_interval = sweep_interval
+    self.swept_at = 0
+    os.makedirs(self.tag_directory, exist_ok=True)
+
+  def _path(self, directory, key):
+    return os.path.join(directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+  def _read(self, path):
+    try:
+      with open(path, 'rb') as f:
+        return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+      return None
+
+  def _write(self, path, *values):
+    # write to a temporary file and rename so readers never see half an entry
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+      for value in values:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+  def _remove(self, path):
+    try:
+      os.remove(path)
+    except FileNotFoundError:
+      pass
+
+  def get(self, key):
+    # deletes the entry when it has expired or cannot be read
+    path = self._path(self.directory, key)
+    try:
+      with open(path, 'rb') as f:
+        expires_at = pickle.load(f)
+        if expires_at is None or expires_at >= time.time():
+          return pickle.load(f)
+    except FileNotFoundError:
+      return None
+    except (OSError, EOFError, pickle.UnpicklingError, TypeError):
+      pass
+    self._remove(path)
+    return None
+
+  def set(self, key, value, ttl=None):
+    expires_at = time.time() + ttl if ttl else None
+    self._write(self._path(self.directory, key), expires_at, value)
+    self.maybe_sweep()
+
+  def maybe_sweep(self):
+    # sweeps when no worker has for sweep_interval seconds; the marker's
+    # mtime is the last sweep of any worker
+    now = time.time()
+    if now - self.swept_at < self.sweep_interval:
+      return
+    marker = os.path.join(self.directory, self.SWEEP_MARKER)
+    try:
+      self.swept_at = os.stat(marker).st_mtime
+    except FileNotFoundError:
+      self.swept_at = 0
+    if now - self.swept_at < self.sweep_interval:
+      return
+    with open(marker, 'a'):
+      os.utime(marker, (now, now))
+    self.swept_at = now
+    self.sweep()
+
+  def sweep(self):
+    # deletes expired entries, temporary files left by dead writers and,
+    # past max_entries, the least recently written entries; returns the
+    # number of files removed
+    now = time.time()
+    removed = 0
+    entries = []
+    for entry in os.scandir(self.directory):
+      if not entry.is_file() or entry.name == self.SWEEP_MARKER:
+        continue
+      try:
+        mtime = entry.stat().st_mtime
+      except FileNotFoundError:
+        continue
+      if entry.name.startswith('tmp'):
+        if mtime < now - self.sweep_interval:
+          self._remove(entry.path)
+          removed += 1
+        continue
+      try:
+        with open(entry.path, 'rb') as f:
+          expires_at = pickle.load(f)
+        expired = expires_at is not None and expires_at < now
+      except FileNotFoundError:
+        continue
+      except (OSError, EOFError, pickle.UnpicklingError, TypeError):
+        expired = True
+      if expired:
+        self._remove(entry.path)
+        removed += 1
+      else:
+        entries.append((mtime, entry.path))
+    if self.max_entries and len(entries) > self.max_entries:
+      entries.sort()
+      for mtime, path in entries[:len(entries) - self.max_entries]:
+        self._remove(path)
+        removed += 1
+    return removed
+
+  def clear(self):
+    for directory in (self.directory, self.tag_directory):
+      for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+          os.remove(path)
+
+  def tag_version(self, tag):
+    return self._read(self._path(self.tag_directory, tag)) or 0
+
+  def bump_tag(self, tag):
+    self._write(self._path(self.tag_directory, tag), time.time_ns())
+
+
+class PageCache(object):
+  # Flask extension; configured through
+  #   CACHE_BACKEND         'file', 'lru' (one worker only) or None to disable
+  #   CACHE_MAX_ENTRIES     size of the backend
+  #   CACHE_DIR             directory of the 'file' backend
+  #   CACHE_SWEEP_INTERVAL  seconds between sweeps of the 'file' backend
+  #   CACHE_TTLS            {endpoint: seconds}, CACHE_DEFAULT_TTL otherwise
+
+  def __init__(self, app=None):
+    self.backend = None
+    self.app = None
+    self.varies = []
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.app = app
+    kind = app.config.get('CACHE_BACKEND')
+    if kind == 'lru':
+      self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+    elif kind == 'file':
+      self.backend = FileBackend(app.config['CACHE_DIR'], app.config.get('CACHE_MAX_ENTRIES', 1024),
+                                 app.config.get('CACHE_SWEEP_INTERVAL', 60))
+    elif kind:
+      raise ValueError('Unknown CACHE_BACKEND %r' % kind)
+    app.extensions['page_cache'] = self
+
+  def ttl_for(self, endpoint):
+    ttls = self.app.config.get('CACHE_TTLS', {})
+    return ttls.get(endpoint, self.app.config.get('CACHE_DEFAULT_TTL', 60))
+
+  def vary(self, f):
+    # registers a callable whose result also keys cached pages, for
+    # request state the rendered page depends on besides the URL
+    self.varies.append(f)
+    return f
+
+  def key_for(self, tags):
+    versions = ','.join('%s=%s' % (tag, self.backend.tag_version(tag)) for tag in tags)
+    varies = '|'.join(repr(f()) for f in self.varies)
+    return '%s|%s|%s' % (request.full_path, versions, varies)
+
+  def cached(self, tags):
+    # tags is a callable receiving the view arguments and returning the
+    # list of tags the page depends on
+    def decorator(view):
+      @wraps(view)
+      def wrapper(*args, **kwargs):
+        # pages carrying flashed messages are per-user, never cache them
+        if self.backend is None or request.method != 'GET' or '_flashes' in session:
+          return view(*args, **kwargs)
+
+        key = self.key_for(tags(*args, **kwargs))
+        entry = self.backend.get(key)
+        cache_lookup.send(self.app, endpoint=request.endpoint, hit=entry is not None)
+        if entry is not None:
+          body, status, headers = entry
+          return make_response(body, status, headers)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.direct_passthrough:
+          headers = [(k, v) for k, v in response.headers if k.lower() != 'set-cookie']
+          self.backend.set(key, (response.get_data(), response.status_code, headers),
+                           self.ttl_for(request.endpoint))
+        return response
+      return wrapper
+    return decorator
+
+  def tag_version(self, tag):
+    # changes on every invalidate() of tag; None without a backend
+    if self.backend is None:
+      return None
+    return self.backend.tag_version(tag)
+
+  def invalidate(self, *tags):
+    if self.backend is None:
+      return
+    for tag in tags:
+      self.backend.bump_tag(tag)
+
+  def clear(self):
+    if self.backend is not None:
+      self.backend.clear()
@@ -0,0 +1,372 @@
+#----------------------------------------------------------------------------#
+# Commands.
+#
+# Registered on the app by create_app(). Modules only some commands need
+# (forms, exporter, geo, assets, plancheck, bench) are imported inside them, so
+# `flask db upgrade` and friends start without loading them.
+#----------------------------------------------------------------------------#
+
+import sys
+import click
+import dateutil.parser
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from werkzeug.utils import import_string
+from extensions import db, page_cache, typeahead
+from cache import LRUBackend
+from models import Venue, Artist, Show, count_imported_shows, DEFAULT_SHOW_DURATION
+from queries import (roll_show_counters, rebuild_show_counters, verify_show_counters, export_query,
+                     booking_conflicts, link_genres, reindex_search_vectors)
+from importer import detect_format, read_rows, run_import, validate, NameResolver
+
+
+class LazyGroup(click.Group):
+  # A command group given by import name, imported when one of its commands
+  # is looked up: Flask-Migrate and alembic only load for the flask db
+  # commands. (Where Flask-Migrate's own `db` plugin is installed the flask
+  # command uses that one instead; app.test_cli_runner() gets this one.)
+
+  def __init__(self, name, import_name, **kwargs):
+    super(LazyGroup, self).__init__(name, **kwargs)
+    self.import_name = import_name
+
+  def list_commands(self, ctx):
+    return import_string(self.import_name).list_commands(ctx)
+
+  def get_command(self, ctx, name):
+    return import_string(self.import_name).get_command(ctx, name)
+
+db_cli = LazyGroup('db', 'flask_migrate.cli:db', help='Perform database migrations.')
+
+def invalidate_pages(*tags):
+  # Drops the cached pages with these tags (all of them without tags). An
+  # 'lru' cache is in the memory of each web worker, out of reach here.
+  if tags:
+    page_cache.invalidate(*tags)
+  else:
+    page_cache.clear()
+  if isinstance(page_cache.backend, LRUBackend):
+    click.echo("Warning: CACHE_BACKEND is 'lru'; running web workers keep serving their cached "
+               "pages until the CACHE_TTLS expire (use 'file' to share invalidations).", err=True)
+
+@click.command('check-plans')
+@with_appcontext
+def check_plans_command():
+  """EXPLAIN every query the read routes issue; fail on seq scans of large tables."""
+  from plancheck import check_plans
+  # cached pages issue no SQL and would pass unchecked
+  backend = page_cache.backend
+  page_cache.backend = None
+  try:
+    violations = check_plans(current_app._get_current_object(), db, Venue, Artist)
+  finally:
+    page_cache.backend = backend
+  for endpoint, table, statement in violations:
+    print ('SEQ SCAN on %s in %s:\n  %s' % (table, endpoint, ' '.join(statement.split())))
+  if violations:
+    sys.exit(1)
+  print ('All query plans use indexes.')
+
+counters_cli = AppGroup('counters', help='Maintain the denormalized show counters.')
+
+@counters_cli.command('roll')
+def roll_counters_command():
+  """Move shows that have started since the last roll into the past counts."""
+  roll_show_counters()
+  invalidate_pages('venues', 'artists')
+
+@counters_cli.command('rebuild')
+def rebuild_counters_command():
+  """Recompute every venue/artist show counter from the Show table."""
+  rebuild_show_counters()
+  invalidate_pages('venues', 'artists')
+  print ('Show counters rebuilt.')
+
+@counters_cli.command('verify')
+def verify_counters_command():
+  """Compare the stored counters with the Show table; fail on any mismatch."""
+  mismatches = verify_show_counters()
+  for table, entity_id, upcoming, past, actual_upcoming, actual_past in mismatches:
+    print ('%s %d: stored %d upcoming / %d past, actual %d / %d'
+           % (table, entity_id, upcoming, past, actual_upcoming, actual_past))
+  if mismatches:
+    sys.exit(1)
+  print ('Show counters match.')
+
+bench_cli = AppGroup('bench', help='Synthetic data and route benchmarks.')
+
+@bench_cli.command('seed')
+@click.option('--venues', default=100000, show_default=True)
+@click.option('--artists', default=200000, show_default=True)
+@click.option('--shows', default=5000000, show_default=True)
+@click.option('--seed', default=1, show_default=True, help='Random seed.')
+@click.option('--skew', default=1.1, show_default=True, help='Zipf exponent of venue/artist popularity.')
+@click.option('--truncate', is_flag=True, help='Empty the Show, Venue and Artist tables first.')
+def bench_seed_command(venues, artists, shows, seed, skew, truncate):
+  """Load a reproducible synthetic catalogue."""
+  from bench.fixtures import generate
+  if venues < 1 or artists < 1:
+    raise click.BadParameter('need at least one venue and one artist')
+  stats = generate(db, venues, artists, shows, seed=seed, skew=skew, truncate=truncate)
+  for table, (rows, seconds) in stats.items():
+    print ('%-7s %10d rows in %7.1fs (%d rows/s)' % (table, rows, seconds, rows / max(seconds, 1e-9)))
+  # COPY bypasses the Show insert hooks
+  rebuild_show_counters()
+  invalidate_pages()
+
+@bench_cli.command('run')
+@click.option('--iterations', default=50, show_default=True, help='Measured requests per route.')
+@click.option('--warmup', default=3, show_default=True)
+@click.option('--seed', default=1, show_default=True, help='Random seed for picking targets.')
+@click.option('--route', 'routes', multiple=True, help='Only run these routes.')
+@click.option('--cache/--no-cache', default=False, show_default=True, help='Keep the page cache enabled.')
+@click.option('--save', type=click.Path(), help='Write the results as a JSON baseline.')
+@click.option('--compare', type=click.Path(exists=True), help='Fail on regressions against this baseline.')
+@click.option('--tolerance', default=0.2, show_default=True, help='Allowed p95 slowdown for --compare.')
+def bench_run_command(iterations, warmup, seed, routes, cache, save, compare, tolerance):
+  """Benchmark every read route through the test client."""
+  from bench import routes as route_bench
+  backend = page_cache.backend
+  if not cache:
+    page_cache.backend = None
+  try:
+    results = route_bench.run(current_app._get_current_object(), db, Venue, Artist, iterations=iterations,
+                              warmup=warmup, seed=seed, only=set(routes))
+  finally:
+    page_cache.backend = backend
+  print (route_bench.report(results))
+  if save:
+    route_bench.save(results, save)
+  if compare:
+    regressions = route_bench.compare(results, compare, tolerance)
+    for regression in regressions:
+      print ('REGRESSION ' + regression)
+    if regressions:
+      sys.exit(1)
+
+@bench_cli.command('compression')
+@click.option('--repeat', default=20, show_default=True, help='Runs per measurement.')
+@click.option('--seed', default=1, show_default=True, help='Random seed for picking targets.')
+@click.option('--route', 'routes', multiple=True, help='Only run these routes.')
+@click.option('--cache/--no-cache', default=False, show_default=True, help='Keep the page cache enabled.')
+def bench_compression_command(repeat, seed, routes, cache):
+  """Response bytes and compression CPU per route and codec."""
+  from bench import compression as compression_bench
+  backend = page_cache.backend
+  if not cache:
+    page_cache.backend = None
+  try:
+    results = compression_bench.run(current_app._get_current_object(), db, Venue, Artist,
+                                    repeat=repeat, seed=seed, only=set(routes))
+  finally:
+    page_cache.backend = backend
+  print (compression_bench.report(results))
+
+fyyur_cli = AppGroup('fyyur', help='Catalogue import and maintenance.')
+
+# form (in forms.py) and extra columns accepted per import kind
+IMPORT_COLUMNS = {
+  'venues': ('VenueForm', Venue, ['website', 'seeking_talent', 'seeking_description']),
+  'artists': ('ArtistForm', Artist, ['address', 'website', 'seeking_venue', 'seeking_description']),
+}
+
+def reserve_ids(model, count):
+  # the next count ids of model's sequence, to insert rows with known ids
+  return [row[0] for row in db.session.execute(
+    db.text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+    {'table': '"%s"' % model.__tablename__, 'count': count})]
+
+def prepare_entities(form_class, model, extras, genres):
+  # genres collects {id: genre names} of the prepared rows, which are
+  # linked after their INSERT
+  columns = set(model.__table__.columns.keys())
+
+  def prepare(batch):
+    prepared = []
+    for line_no, row in batch:
+      data, errors = validate(form_class, row)
+      if data is None:
+        prepared.append((line_no, None, errors))
+        continue
+      values = {key: value for key, value in data.items() if key in columns}
+      # every row of a multi-row INSERT needs the same columns
+      values.update((key, row.get(key) or None) for key in extras)
+      prepared.append((line_no, values, data['genres']))
+    ids = iter(reserve_ids(model, sum(1 for _, values, _ in prepared if values is not None)))
+    for n, (line_no, values, names) in enumerate(prepared):
+      if values is not None:
+        values['id'] = next(ids)
+        genres[values['id']] = names
+        prepared[n] = (line_no, values, None)
+    return prepared
+  return prepare
+
+def prepare_shows(form_class):
+  # shows reference venues/artists by venue_id/artist_id or by
+  # venue_name/artist_name; shows overlapping one already booked at their
+  # venue (or earlier in the file) are rejected rather than failing the batch
+  venue_names = NameResolver(db, Venue)
+  artist_names = NameResolver(db, Artist)
+
+  def existing(model, ids):
+    ids = {int(i) for i in ids if str(i).isdigit()}
+    if not ids:
+      return set()
+    return {row[0] for row in db.session.query(model.id).filter(model.id.in_(ids))}
+
+  def prepare(batch):
+    venue_names.load(row['venue_name'] for _, row in batch if row.get('venue_name'))
+    artist_names.load(row['artist_name'] for _, row in batch if row.get('artist_name'))
+    venue_ids = existing(Venue, (row['venue_id'] for _, row in batch if row.get('venue_id')))
+    artist_ids = existing(Artist, (row['artist_id'] for _, row in batch if row.get('artist_id')))
+
+    prepared = []
+    for line_no, row in batch:
+      data, errors = validate(form_class, row)
+      if data is None:
+        prepared.append((line_no, None, errors))
+        continue
+      id_venue = int(row['venue_id']) if str(row.get('venue_id', '')).isdigit() else venue_names.get(row.get('venue_name'))
+      id_artist = int(row['artist_id']) if str(row.get('artist_id', '')).isdigit() else artist_names.get(row.get('artist_name'))
+      errors = {}
+      if id_venue is None or (row.get('venue_id') and id_venue not in venue_ids):
+        errors['venue'] = ['Unknown venue']
+      if id_artist is None or (row.get('artist_id') and id_artist not in artist_ids):
+        errors['artist'] = ['Unknown artist']
+      end_time = data['end_time'] or data['start_time'] + DEFAULT_SHOW_DURATION
+      if end_time <= data['start_time']:
+        errors['end_time'] = ['Must be after start_time']
+      if errors:
+        prepared.append((line_no, None, errors))
+      else:
+        prepared.append((line_no, {'id_venue': id_venue, 'id_artist': id_artist,
+                                   'start_time': data['start_time'], 'end_time': end_time}, None))
+
+    bookings = [(values['id_venue'], values['start_time'], values['end_time'])
+                for _, values, _ in prepared if values is not None]
+    conflicts = booking_conflicts(bookings)
+    if conflicts:
+      accepted = [i for i, (_, values, _) in enumerate(prepared) if values is not None]
+      for n in conflicts:
+        line_no = prepared[accepted[n]][0]
+        prepared[accepted[n]] = (line_no, None, {'start_time': ['Venue already booked at that time']})
+    return prepared
+  return prepare
+
+@fyyur_cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT/commit.')
+@click.option('--rejects', type=click.File('w'), help='Write rejected rows (line, errors) as NDJSON here.')
+def import_command(kind, path, fmt, batch_size, rejects):
+  """Bulk load venues, artists or shows from a CSV or NDJSON file."""
+  import forms
+  rows = read_rows(path, fmt or detect_format(path))
+  touched = set()
+
+  def progress(stats):
+    click.echo('\r' + stats.summary(), nl=False, err=True)
+
+  with current_app.test_request_context():
+    if kind == 'shows':
+      def after_batch(shows):
+        count_imported_shows(shows)
+        touched.update('venue:%d' % show['id_venue'] for show in shows)
+        touched.update('artist:%d' % show['id_artist'] for show in shows)
+      stats = run_import(db, Show.__table__, rows, prepare_shows(forms.ShowForm), batch_size,
+                         rejects, after_batch, progress)
+    else:
+      form_name, model, extras = IMPORT_COLUMNS[kind]
+      form_class = getattr(forms, form_name)
+      genres = {}
+
+      def after_batch(values):
+        link_genres(model, {row['id']: genres.pop(row['id']) for row in values})
+      stats = run_import(db, model.__table__, rows, prepare_entities(form_class, model, extras, genres),
+                         batch_size, rejects, after_batch, progress)
+
+  invalidate_pages('venues', 'artists', 'shows', *touched)
+  if kind != 'shows':
+    typeahead.invalidate(kind)
+  click.echo(err=True)
+  print (stats.summary())
+
+@fyyur_cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='ndjson', show_default=True)
+@click.option('--since', help='Only rows updated after this timestamp.')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='Defaults to stdout.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip.')
+def export_command(kind, fmt, since, output, batch_size):
+  """Stream venues, artists or shows out as NDJSON or CSV."""
+  from exporter import export_lines
+  since = dateutil.parser.parse(since) if since else None
+  for line in export_lines(export_query(kind, since), fmt, batch_size):
+    output.write(line)
+
+@fyyur_cli.command('geocode')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'geonames']), default='csv', show_default=True)
+@click.option('--country', default='US', show_default=True, help='GeoNames: only places in this country.')
+@click.option('--all', 'relocate', is_flag=True, help='Also venues that already have coordinates.')
+@click.option('--batch-size', default=1000, show_default=True, help='Venues per UPDATE/commit.')
+def geocode_command(path, fmt, country, relocate, batch_size):
+  """Fill venue coordinates from a local gazetteer (CSV or GeoNames dump)."""
+  from geo import read_gazetteer, place_key, encode
+  places = read_gazetteer(path, fmt, country)
+  table = Venue.__table__
+  update = table.update().where(table.c.id == db.bindparam('venue_id')) \
+    .values(latitude=db.bindparam('lat'), longitude=db.bindparam('lng'), geohash=db.bindparam('cell'))
+  located = unknown = 0
+  last_id = 0
+  while True:
+    query = db.session.query(Venue.id, Venue.address, Venue.city, Venue.state).filter(Venue.id > last_id)
+    if not relocate:
+      query = query.filter(Venue.geohash.is_(None))
+    batch = query.order_by(Venue.id).limit(batch_size).all()
+    if not batch:
+      break
+    last_id = batch[-1].id
+    updates = []
+    for venue_id, address, city, state in batch:
+      point = places.get(place_key(address, city, state)) or places.get(place_key(None, city, state))
+      if point is None:
+        unknown += 1
+      else:
+        updates.append({'venue_id': venue_id, 'lat': point[0], 'lng': point[1], 'cell': encode(*point)})
+    if updates:
+      db.session.execute(update, updates)
+      located += len(updates)
+    db.session.commit()
+    click.echo('\r%d venues located, %d not in the gazetteer' % (located, unknown), nl=False, err=True)
+  click.echo(err=True)
+  print ('%d venues located, %d not in the gazetteer.' % (located, unknown))
+
+@fyyur_cli.command('reindex')
+@click.option('--only', type=click.Choice(['venues', 'artists']), help='Defaults to both.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per UPDATE/commit.')
+def reindex_command(only, batch_size):
+  """Rebuild the full-text search vectors in batches, without locking the tables."""
+  for kind, model in (('venues', Venue), ('artists', Artist)):
+    if only in (None, kind):
+      count = reindex_search_vectors(model, batch_size,
+                                     lambda done: click.echo('\r%d %s' % (done, kind), nl=False, err=True))
+      click.echo(err=True)
+      print ('%d %s reindexed.' % (count, kind))
+
+@fyyur_cli.command('assets')
+@click.option('--clean', is_flag=True, help='Remove files of earlier builds.')
+def assets_command(clean):
+  """Fingerprint, minify and precompress static/ into ASSETS_DIR."""
+  from assets import build
+  files, source, built, smallest = build(current_app.static_folder, current_app.config['ASSETS_DIR'], clean)
+  print ('%d files: %d bytes, %d minified, %d compressed.' % (files, source, built, smallest))
+
+
+def register_commands(app):
+  app.cli.add_command(db_cli)
+  app.cli.add_command(check_plans_command)
+  app.cli.add_command(counters_cli)
+  app.cli.add_command(bench_cli)
+  app.cli.add_command(fyyur_cli)
@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Datetime formatting.
+#
+# The `datetime` Jinja filter. Takes datetimes as they come from the models
+# (strings are still parsed, for old callers), keeps compiled Babel patterns
+# and Locale objects per (format, locale) instead of re-parsing them for
+# every show tile, and honours a per-request locale and timezone set on
+# flask.g (see select_locale in views.py).
+#
+# Show times are stored naive, in the server's local time (the queries
+# compare them with datetime.now()). Converting to a display timezone first
+# places them in SERVER_TIMEZONE, the server's local zone unless set.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from functools import lru_cache
+import dateutil.parser
+from babel import Locale
+from babel.dates import parse_pattern, get_timezone, LOCALTZ
+from flask import g, current_app, has_request_context
+
+FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+DEFAULT_LOCALE = 'en_US'
+
+
+@lru_cache(maxsize=256)
+def compiled_pattern(format, locale):
+  return parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=128)
+def timezone(name):
+  return get_timezone(name)
+
+
+def localize(value, tzinfo):
+  # naive value as a time in tzinfo (pytz zones need localize())
+  if hasattr(tzinfo, 'localize'):
+    return tzinfo.localize(value)
+  return value.replace(tzinfo=tzinfo)
+
+
+def request_locale(request, locales):
+  # (locale, timezone) for a request: the locale from Accept-Language, the
+  # display timezone from the 'tz' cookie when it names a known zone
+  locale = request.accept_languages.best_match(locales) or DEFAULT_LOCALE
+  tz = request.cookies.get('tz')
+  if tz:
+    try:
+      timezone(tz)
+    except LookupError:
+      tz = None
+  return locale, tz or None
+
+
+def format_datetime(value, format='medium', locale=None, tzinfo=None, server_tzinfo=None):
+  # Naive datetimes are taken as server_tzinfo (SERVER_TIMEZONE) when a
+  # display timezone is in effect, and shown unconverted otherwise.
+  if value is None or value == '':
+    return ''
+  if not isinstance(value, datetime):
+    value = dateutil.parser.parse(value)
+  if has_request_context():
+    locale = locale or g.get('locale')
+    tzinfo = tzinfo or g.get('timezone')
+    server_tzinfo = server_tzinfo or current_app.config.get('SERVER_TIMEZONE')
+
+  pattern, locale = compiled_pattern(format, locale or DEFAULT_LOCALE)
+  if tzinfo:
+    if value.tzinfo is None:
+      value = localize(value, timezone(server_tzinfo) if server_tzinfo else LOCALTZ)
+    value = value.astimezone(timezone(tzinfo))
+  return pattern.apply(value, locale)
@@ -0,0 +1,21 @@
+#----------------------------------------------------------------------------#
+# Extensions.
+#
+# Created unbound so models, views and commands can import them without an
+# app; create_app() binds them with init_app(). Flask-Migrate is only set
+# up when a flask db command needs it (see LazyMigrate in app.py).
+#----------------------------------------------------------------------------#
+
+from flask_moment import Moment
+from flask_sqlalchemy import SQLAlchemy
+from cache import PageCache
+from compression import Compression
+from sqlstats import SQLStats
+from typeahead import Typeahead
+
+db = SQLAlchemy()
+moment = Moment()
+page_cache = PageCache()
+compression = Compression()
+sql_stats = SQLStats()
+typeahead = Typeahead(db, page_cache)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, AnyOf, URL, Optional
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -15,6 +15,19 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # defaults to start_time + models.DEFAULT_SHOW_DURATION
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()]
+    )
+
+class ShowSeriesForm(ShowForm):
+    # start_time is the first date; rule an RRULE body such as
+    # FREQ=WEEKLY;BYDAY=FR or FREQ=WEEKLY;BYDAY=FR;COUNT=10
+    end_time = None
+    rule = StringField(
+        'rule', validators=[DataRequired()]
+    )
 
 class VenueForm(Form):
     name = StringField(
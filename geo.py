@@ -0,0 +1,114 @@
+#----------------------------------------------------------------------------#
+# Geohash grid.
+#
+# Venues store a geohash of their coordinates: a base32 string whose every
+# extra character splits the cell into 32, so all venues inside a cell share
+# its hash as a prefix. With a C-collation btree index on the column a cell
+# is one index range scan, and a "within N km" search is the few cells
+# covering the circle's bounding box, refined by the exact distance.
+#
+# Coordinates come from a local gazetteer (read_gazetteer), no online
+# geocoding service.
+#----------------------------------------------------------------------------#
+
+import csv
+from math import radians, degrees, sin, cos, asin, floor
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# precision stored on Venue.geohash (cells of about 5m x 5m)
+PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = radians(1) * EARTH_RADIUS_KM
+
+
+def encode(lat, lng, precision=PRECISION):
+  lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+  chars = []
+  bits = 0
+  value = 0
+  even = True
+  while len(chars) < precision:
+    interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+    middle = (interval[0] + interval[1]) / 2
+    value <<= 1
+    if coordinate >= middle:
+      value |= 1
+      interval[0] = middle
+    else:
+      interval[1] = middle
+    even = not even
+    bits += 1
+    if bits == 5:
+      chars.append(BASE32[value])
+      bits = value = 0
+  return ''.join(chars)
+
+
+def cell_size(precision):
+  # (height, width) of a cell in degrees
+  lng_bits = (5 * precision + 1) // 2
+  lat_bits = 5 * precision // 2
+  return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def covering_cells(lat, lng, km, max_cells=16):
+  # Geohash prefixes whose cells cover the bounding box of the circle of
+  # `km` around (lat, lng): the finest precision needing at most max_cells.
+  angle = km / EARTH_RADIUS_KM
+  south, north = lat - degrees(angle), lat + degrees(angle)
+  if south <= -90.0 or north >= 90.0:
+    # the circle contains a pole: every longitude
+    south, north, dlng = max(south, -90.0), min(north, 90.0), 180.0
+  else:
+    dlng = degrees(asin(min(sin(angle) / cos(radians(lat)), 1.0)))
+  west, east = lng - dlng, lng + dlng
+
+  for precision in range(PRECISION, 0, -1):
+    height, width = cell_size(precision)
+    rows = range(int(floor((south + 90.0) / height)), int(floor((north + 90.0) / height)) + 1)
+    cols = range(int(floor((west + 180.0) / width)), int(floor((east + 180.0) / width)) + 1)
+    if len(rows) * min(len(cols), int(round(360.0 / width))) <= max_cells:
+      break
+
+  cells = set()
+  for row in rows:
+    center_lat = min(-90.0 + (row + 0.5) * height, 90.0)
+    for col in cols:
+      center_lng = (-180.0 + (col + 0.5) * width + 180.0) % 360.0 - 180.0
+      cells.add(encode(center_lat, center_lng, precision))
+  return sorted(cells)
+
+
+def place_key(address, city, state):
+  return ((address or '').strip().lower(), (city or '').strip().lower(), (state or '').strip().upper())
+
+
+def read_gazetteer(path, fmt='csv', country='US'):
+  # Offline geocoding data: {place_key(address, city, state): (lat, lng)},
+  # address '' for whole towns. Formats:
+  #   csv       header with city, state, latitude, longitude and optionally
+  #             address (street level matches win over the town's)
+  #   geonames  a GeoNames dump (cities15000.txt, allCountries.txt, ...):
+  #             populated places of `country`, state = admin1 code, the most
+  #             populous place winning a shared name
+  places = {}
+  if fmt == 'csv':
+    with open(path, newline='', encoding='utf-8') as f:
+      for row in csv.DictReader(f):
+        places[place_key(row.get('address'), row['city'], row['state'])] = \
+          (float(row['latitude']), float(row['longitude']))
+    return places
+
+  population = {}
+  with open(path, encoding='utf-8') as f:
+    for line in f:
+      fields = line.rstrip('\n').split('\t')
+      if len(fields) < 15 or fields[6] != 'P' or (country and fields[8] != country):
+        continue
+      people = int(fields[14] or 0)
+      for name in {fields[1], fields[2]}:
+        key = place_key(None, name, fields[10])
+        if people >= population.get(key, -1):
+          population[key] = people
+          places[key] = (float(fields[4]), float(fields[5]))
+  return places
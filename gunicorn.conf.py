@@ -0,0 +1,17 @@
+#----------------------------------------------------------------------------#
+# Gunicorn settings, read from the working directory by default:
+#
+#   $ PROMETHEUS_MULTIPROC_DIR=/tmp/fyyur-metrics gunicorn --preload -w 4 wsgi:app
+#
+# With PROMETHEUS_MULTIPROC_DIR set, a worker's samples stay in the
+# directory after it exits. The 'livesum' gauges (pool connections) would
+# keep counting a dead worker's last values, so child_exit marks it dead.
+#----------------------------------------------------------------------------#
+
+import os
+
+
+def child_exit(server, worker):
+  if 'PROMETHEUS_MULTIPROC_DIR' in os.environ or 'prometheus_multiproc_dir' in os.environ:
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,146 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# Streams CSV or NDJSON files row by row, validates every row with the same
+# WTForms classes the create pages use, and writes the accepted rows with one
+# multi-row INSERT per batch. Memory stays bounded by the batch size no
+# matter how large the file is. Rejected rows are counted and can be written
+# to an NDJSON file together with their line number and errors.
+#
+#   $ flask fyyur import venues venues.csv
+#   $ flask fyyur import shows shows.ndjson --rejects rejected.ndjson
+#----------------------------------------------------------------------------#
+
+import csv
+import json
+import time
+from werkzeug.datastructures import MultiDict
+
+
+def detect_format(path):
+  if path.endswith('.csv'):
+    return 'csv'
+  if path.endswith('.ndjson') or path.endswith('.jsonl') or path.endswith('.json'):
+    return 'ndjson'
+  raise ValueError('Cannot tell the format of %s, pass --format' % path)
+
+
+def read_rows(path, fmt):
+  # yields (line number, row dict)
+  with open(path, newline='', encoding='utf-8') as f:
+    if fmt == 'csv':
+      reader = csv.DictReader(f)
+      for row in reader:
+        yield reader.line_num, row
+    else:
+      for line_no, line in enumerate(f, 1):
+        if line.strip():
+          yield line_no, json.loads(line)
+
+
+def form_data(row):
+  # WTForms input for a row; genres may be a list or a ';' separated string
+  data = MultiDict()
+  for key, value in row.items():
+    if value is None:
+      continue
+    if isinstance(value, list):
+      for item in value:
+        data.add(key, str(item))
+    elif key == 'genres':
+      for item in str(value).split(';'):
+        if item.strip():
+          data.add(key, item.strip())
+    else:
+      data.add(key, str(value))
+  return data
+
+
+def validate(form_class, row):
+  # Returns (form.data, None) or (None, errors). Must run inside a request
+  # context because the forms are Flask-WTF forms; CSRF is off for imports.
+  form = form_class(formdata=form_data(row), meta={'csrf': False})
+  if form.validate():
+    return form.data, None
+  return None, form.errors
+
+
+class NameResolver(object):
+  # Maps venue/artist names to ids, one IN query per batch of unseen names.
+  # Names that match several rows resolve to the lowest id.
+
+  def __init__(self, db, model):
+    self.db = db
+    self.model = model
+    self.ids = {}
+
+  def load(self, names):
+    missing = set(names) - set(self.ids)
+    if not missing:
+      return
+    rows = self.db.session.query(self.model.name, self.db.func.min(self.model.id)) \
+      .filter(self.model.name.in_(missing)) \
+      .group_by(self.model.name)
+    for name, entity_id in rows:
+      self.ids[name] = entity_id
+
+  def get(self, name):
+    return self.ids.get(name)
+
+
+class ImportStats(object):
+
+  def __init__(self):
+    self.read = 0
+    self.loaded = 0
+    self.rejected = 0
+    self.started = time.perf_counter()
+
+  @property
+  def seconds(self):
+    return time.perf_counter() - self.started
+
+  def summary(self):
+    rate = self.loaded / max(self.seconds, 1e-9)
+    return ('%d rows read, %d loaded, %d rejected in %.1fs (%d rows/s)'
+            % (self.read, self.loaded, self.rejected, self.seconds, rate))
+
+
+def run_import(db, table, rows, prepare, batch_size=1000, rejects=None,
+               after_batch=None, progress=None):
+  # Loads `rows` ((line number, row dict) pairs) into `table`.
+  #   prepare(batch)       -> [(line_no, values or None, errors)] for a batch
+  #                           of raw rows; values are the column dict to insert
+  #   after_batch(values)  called with the inserted column dicts, in the same
+  #                        transaction (counters, cache tags, ...)
+  # Each batch commits on its own, so a failure loses at most one batch.
+  stats = ImportStats()
+  batch = []
+
+  def flush():
+    accepted = []
+    for line_no, values, errors in prepare(batch):
+      if values is None:
+        stats.rejected += 1
+        if rejects is not None:
+          rejects.write(json.dumps({'line': line_no, 'errors': errors}) + '\n')
+      else:
+        accepted.append(values)
+    if accepted:
+      db.session.execute(table.insert().values(accepted))
+      if after_batch is not None:
+        after_batch(accepted)
+      db.session.commit()
+      stats.loaded += len(accepted)
+    del batch[:]
+    if progress is not None:
+      progress(stats)
+
+  for line_no, row in rows:
+    stats.read += 1
+    batch.append((line_no, row))
+    if len(batch) >= batch_size:
+      flush()
+  if batch:
+    flush()
+  return stats
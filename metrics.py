@@ -0,0 +1,153 @@
+#----------------------------------------------------------------------------#
+# Prometheus metrics.
+#
+# Request latency per endpoint/method/status, template render time, DB time
+# per request, connection pool checkout wait and usage, and page cache
+# lookups, served on /metrics in the text exposition format.
+#
+# Under a multi-process server (gunicorn, uwsgi) point the
+# PROMETHEUS_MULTIPROC_DIR environment variable at an empty directory before
+# the workers start; every worker then writes its samples there and /metrics
+# aggregates all of them, whichever worker answers the scrape. The server
+# must also call prometheus_client.multiprocess.mark_process_dead(pid) when
+# a worker exits, or the 'livesum' pool gauges keep its last values in the
+# sum; gunicorn.conf.py does this in child_exit.
+#----------------------------------------------------------------------------#
+
+import os
+import time
+from flask import g, request, Response, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.pool import Pool, QueuePool
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+from cache import cache_lookup
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 10.0)
+WAIT_BUCKETS = (.0005, .001, .005, .01, .025, .05, .1, .25, .5, 1.0, 5.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+  'fyyur_request_duration_seconds', 'Time spent handling a request.',
+  ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS)
+TEMPLATE_RENDER = Histogram(
+  'fyyur_template_render_seconds', 'Time spent rendering a Jinja template.',
+  ['template'], buckets=LATENCY_BUCKETS)
+DB_TIME = Histogram(
+  'fyyur_request_db_seconds', 'Time spent in the database per request.',
+  ['endpoint'], buckets=LATENCY_BUCKETS)
+POOL_WAIT = Histogram(
+  'fyyur_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.',
+  buckets=WAIT_BUCKETS)
+POOL_CONNECTIONS = Gauge(
+  'fyyur_db_pool_connections', 'Open database connections held by the pools.',
+  multiprocess_mode='livesum')
+POOL_CHECKED_OUT = Gauge(
+  'fyyur_db_pool_checked_out', 'Pooled connections currently in use.',
+  multiprocess_mode='livesum')
+POOL_LIMIT = Gauge(
+  'fyyur_db_pool_limit', 'Configured pool_size + max_overflow per process.',
+  multiprocess_mode='max')
+CACHE_LOOKUPS = Counter(
+  'fyyur_page_cache_lookups_total', 'Page cache lookups by result.',
+  ['endpoint', 'result'])
+
+
+class TimedQueuePool(QueuePool):
+  # QueuePool that records how long each checkout waited for a connection
+
+  def _do_get(self):
+    started = time.perf_counter()
+    try:
+      return super(TimedQueuePool, self)._do_get()
+    finally:
+      POOL_WAIT.observe(time.perf_counter() - started)
+
+
+def _connected(dbapi_connection, connection_record):
+  POOL_CONNECTIONS.inc()
+
+def _closed(dbapi_connection, connection_record):
+  POOL_CONNECTIONS.dec()
+
+def _detached(dbapi_connection, connection_record):
+  # a detached connection never checks back in; it is counted open until
+  # close_detached
+  POOL_CHECKED_OUT.dec()
+
+def _closed_detached(dbapi_connection):
+  POOL_CONNECTIONS.dec()
+
+def _checked_out(dbapi_connection, connection_record, connection_proxy):
+  POOL_CHECKED_OUT.inc()
+
+def _checked_in(dbapi_connection, connection_record):
+  POOL_CHECKED_OUT.dec()
+
+
+def registry():
+  if 'PROMETHEUS_MULTIPROC_DIR' in os.environ or 'prometheus_multiproc_dir' in os.environ:
+    collected = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collected)
+    return collected
+  return REGISTRY
+
+
+class Metrics(object):
+  # Flask extension; METRICS_ENABLED = False turns it off. Must be set up
+  # before the first database use so the engine picks up TimedQueuePool.
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    if not app.config.get('METRICS_ENABLED', True):
+      return
+    engine_options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    engine_options.setdefault('poolclass', TimedQueuePool)
+    if 'pool_size' in engine_options:
+      POOL_LIMIT.set(engine_options['pool_size'] + engine_options.get('max_overflow', 0))
+    if not event.contains(Pool, 'connect', _connected):
+      event.listen(Pool, 'connect', _connected)
+      event.listen(Pool, 'close', _closed)
+      event.listen(Pool, 'detach', _detached)
+      event.listen(Pool, 'close_detached', _closed_detached)
+      event.listen(Pool, 'checkout', _checked_out)
+      event.listen(Pool, 'checkin', _checked_in)
+
+    app.before_request(self.start_request)
+    app.after_request(self.finish_request)
+    before_render_template.connect(self.start_render, app)
+    template_rendered.connect(self.finish_render, app)
+    cache_lookup.connect(self.count_lookup, app)
+    app.add_url_rule('/metrics', 'metrics', self.expose)
+    app.extensions['metrics'] = self
+
+  def start_request(self):
+    g.metrics_started = time.perf_counter()
+
+  def finish_request(self, response):
+    started = g.get('metrics_started')
+    if started is None:
+      return response
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_LATENCY.labels(endpoint, request.method, str(response.status_code)) \
+      .observe(time.perf_counter() - started)
+    stats = g.get('sql_stats')
+    if stats is not None:
+      DB_TIME.labels(endpoint).observe(stats.db_time)
+    return response
+
+  def start_render(self, sender, template, context, **extra):
+    g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+  def finish_render(self, sender, template, context, **extra):
+    renders = g.get('metrics_renders')
+    if renders:
+      TEMPLATE_RENDER.labels(template.name or 'string').observe(time.perf_counter() - renders.pop())
+
+  def count_lookup(self, sender, endpoint, hit, **extra):
+    CACHE_LOOKUPS.labels(endpoint, 'hit' if hit else 'miss').inc()
+
+  def expose(self):
+    return Response(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
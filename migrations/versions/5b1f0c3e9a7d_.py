@@ -0,0 +1,63 @@
+"""trigram indexes for venue/artist name search
+
+Revision ID: 5b1f0c3e9a7d
+Revises: 3480b3374daa
+Create Date: 2026-10-18 09:12:04.118532
+
+"""
+import logging
+from alembic import op
+from sqlalchemy.exc import DBAPIError
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1f0c3e9a7d'
+down_revision = '3480b3374daa'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+
+def ensure_pg_trgm(connection):
+    # True once pg_trgm is installed. The CREATE runs in a savepoint so a
+    # role without the privilege (or a server without the contrib package)
+    # leaves the migration going, minus the trigram indexes.
+    if connection.exec_driver_sql(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").first():
+        return True
+    if not connection.exec_driver_sql(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'").first():
+        logger.warning('pg_trgm is not available on this server; '
+                       'skipping the trigram indexes')
+        return False
+    savepoint = connection.begin_nested()
+    try:
+        connection.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DBAPIError as e:
+        savepoint.rollback()
+        logger.warning('cannot create pg_trgm (%s); skipping the trigram indexes',
+                       str(e.orig).strip().splitlines()[0])
+        return False
+    savepoint.commit()
+    return True
+
+
+def upgrade():
+    # pg_trgm ships with the standard contrib package; creating it needs a
+    # role allowed to create extensions. Without it the app falls back to a
+    # plain ILIKE search (queries.trigram_available); after installing it
+    # later, create the two indexes below by hand.
+    if not ensure_pg_trgm(op.get_bind()):
+        return
+    op.create_index('ix_venue_name_trgm', 'Venue', ['name'],
+                    postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artist_name_trgm', 'Artist', ['name'],
+                    postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_artist_name_trgm"')
+    op.execute('DROP INDEX IF EXISTS "ix_venue_name_trgm"')
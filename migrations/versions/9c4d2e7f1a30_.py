@@ -0,0 +1,33 @@
+"""indexes for the show/venue/artist access paths
+
+Revision ID: 9c4d2e7f1a30
+Revises: 5b1f0c3e9a7d
+Create Date: 2026-10-18 10:03:41.552190
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d2e7f1a30'
+down_revision = '5b1f0c3e9a7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # venue page and venue counts: shows of one venue, split/sorted by time
+    op.create_index('ix_show_venue_start', 'Show', ['id_venue', 'start_time'])
+    # artist page and artist counts: shows of one artist, split/sorted by time
+    op.create_index('ix_show_artist_start', 'Show', ['id_artist', 'start_time'])
+    # /shows keyset pagination on (start_time, id)
+    op.create_index('ix_show_start_id', 'Show', ['start_time', 'id'])
+    # /venues listing grouped and ordered by area
+    op.create_index('ix_venue_city_state_name', 'Venue', ['city', 'state', 'name'])
+
+
+def downgrade():
+    op.drop_index('ix_venue_city_state_name', table_name='Venue')
+    op.drop_index('ix_show_start_id', table_name='Show')
+    op.drop_index('ix_show_artist_start', table_name='Show')
+    op.drop_index('ix_show_venue_start', table_name='Show')
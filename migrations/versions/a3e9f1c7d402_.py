@@ -0,0 +1,86 @@
+"""Weighted full-text search vectors on Venue and Artist, kept by triggers
+
+Revision ID: a3e9f1c7d402
+Revises: f7c3d1a85b29
+Create Date: 2026-10-18 21:02:47.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e9f1c7d402'
+down_revision = 'f7c3d1a85b29'
+branch_labels = None
+depends_on = None
+
+TABLES = (('Venue', 'VenueGenre', 'id_venue', 'ix_venue_search_vector'),
+          ('Artist', 'ArtistGenre', 'id_artist', 'ix_artist_search_vector'))
+
+# Rebuilds NEW.search_vector: name (A), genres (B), city and state (C) and
+# seeking_description (D). Arguments: the genre link table and its column.
+SEARCH_VECTOR_FUNCTION = '''
+CREATE FUNCTION search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+  genres text;
+BEGIN
+  EXECUTE format('SELECT string_agg(g.name, '' '') FROM %I AS l JOIN "Genre" AS g ON g.id = l.id_genre
+                   WHERE l.%I = $1', TG_ARGV[0], TG_ARGV[1])
+    INTO genres USING NEW.id;
+  NEW.search_vector :=
+    setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(genres, '')), 'B') ||
+    setweight(to_tsvector('english', concat_ws(' ', NEW.city, NEW.state)), 'C') ||
+    setweight(to_tsvector('english', coalesce(NEW.seeking_description, '')), 'D');
+  RETURN NEW;
+END
+$$
+'''
+
+# After a statement adding or removing genre links, recomputes the vectors
+# of the rows whose links changed (setting search_vector fires the trigger
+# above). Arguments: the entity table and the link table's column.
+GENRE_LINKS_FUNCTION = '''
+CREATE FUNCTION search_vector_genres_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  EXECUTE format('UPDATE %I SET search_vector = NULL WHERE id IN (SELECT %I FROM changed_links)',
+                 TG_ARGV[0], TG_ARGV[1]);
+  RETURN NULL;
+END
+$$
+'''
+
+
+def upgrade():
+    op.execute(SEARCH_VECTOR_FUNCTION)
+    op.execute(GENRE_LINKS_FUNCTION)
+    for table, link, column, index in TABLES:
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        # only the searched columns: the show counters change far more often
+        op.execute('''
+            CREATE TRIGGER search_vector_update
+            BEFORE INSERT OR UPDATE OF name, city, state, seeking_description, search_vector ON "{table}"
+            FOR EACH ROW EXECUTE FUNCTION search_vector_update('{link}', '{column}')
+        '''.replace('{table}', table).replace('{link}', link).replace('{column}', column))
+        for event, transition in (('INSERT', 'NEW'), ('DELETE', 'OLD')):
+            op.execute('''
+                CREATE TRIGGER search_vector_genres_{event}
+                AFTER {event} ON "{link}" REFERENCING {transition} TABLE AS changed_links
+                FOR EACH STATEMENT EXECUTE FUNCTION search_vector_genres_changed('{table}', '{column}')
+            '''.replace('{event}', event).replace('{transition}', transition).replace('{link}', link)
+               .replace('{table}', table).replace('{column}', column))
+        op.execute('UPDATE "%s" SET search_vector = NULL' % table)
+        op.create_index(index, table, ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table, link, column, index in TABLES:
+        op.drop_index(index, table_name=table)
+        for event in ('INSERT', 'DELETE'):
+            op.execute('DROP TRIGGER search_vector_genres_%s ON "%s"' % (event, link))
+        op.execute('DROP TRIGGER search_vector_update ON "%s"' % table)
+        op.drop_column(table, 'search_vector')
+    op.execute('DROP FUNCTION search_vector_genres_changed()')
+    op.execute('DROP FUNCTION search_vector_update()')
@@ -0,0 +1,54 @@
+"""Per-table deletion counters, kept by triggers, for the API versions
+
+Revision ID: b6d2f8a4c913
+Revises: a3e9f1c7d402
+Create Date: 2026-10-19 10:14:52.630871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2f8a4c913'
+down_revision = 'a3e9f1c7d402'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+# After a DELETE statement, adds the number of rows it removed to the
+# table's counter. One row per table, so concurrent deletes from one table
+# queue on it; inserts and updates never touch it.
+COUNT_DELETIONS_FUNCTION = '''
+CREATE FUNCTION count_deletions() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  UPDATE "TableDeletions" SET deleted = deleted + (SELECT count(*) FROM deleted_rows)
+   WHERE table_name = TG_TABLE_NAME;
+  RETURN NULL;
+END
+$$
+'''
+
+
+def upgrade():
+    op.create_table('TableDeletions',
+    sa.Column('table_name', sa.String(length=63), nullable=False),
+    sa.Column('deleted', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute(COUNT_DELETIONS_FUNCTION)
+    for table in TABLES:
+        op.execute('INSERT INTO "TableDeletions" (table_name) VALUES (\'%s\')' % table)
+        op.execute('''
+            CREATE TRIGGER count_deletions
+            AFTER DELETE ON "{table}" REFERENCING OLD TABLE AS deleted_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION count_deletions()
+        '''.replace('{table}', table))
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute('DROP TRIGGER count_deletions ON "%s"' % table)
+    op.execute('DROP FUNCTION count_deletions()')
+    op.drop_table('TableDeletions')
@@ -0,0 +1,56 @@
+"""ShowSeries and ShowSeriesOverride
+
+Revision ID: c41e7a9d2b63
+Revises: b27f94c0d815
+Create Date: 2026-10-18 16:05:12.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e7a9d2b63'
+down_revision = 'b27f94c0d815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowSeries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('id_artist', sa.Integer(), nullable=False),
+    sa.Column('id_venue', sa.Integer(), nullable=False),
+    sa.Column('rule', sa.String(length=500), nullable=False),
+    sa.Column('starts_at', sa.DateTime(), nullable=False),
+    sa.Column('ends_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False,
+              server_default=sa.text("(now() at time zone 'utc')")),
+    sa.ForeignKeyConstraint(['id_artist'], ['Artist.id'], ),
+    sa.ForeignKeyConstraint(['id_venue'], ['Venue.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_show_series_venue_start', 'ShowSeries', ['id_venue', 'starts_at'], unique=False)
+    op.create_index('ix_show_series_artist_start', 'ShowSeries', ['id_artist', 'starts_at'], unique=False)
+    op.create_index('ix_show_series_start_end', 'ShowSeries', ['starts_at', 'ends_at'], unique=False)
+    op.create_index(op.f('ix_ShowSeries_updated_at'), 'ShowSeries', ['updated_at'], unique=False)
+    op.create_table('ShowSeriesOverride',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('id_series', sa.Integer(), nullable=False),
+    sa.Column('occurrence', sa.DateTime(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['id_series'], ['ShowSeries.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id_series', 'occurrence', name='uq_show_series_override_occurrence')
+    )
+    op.create_index('ix_show_series_override_start', 'ShowSeriesOverride', ['id_series', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_series_override_start', table_name='ShowSeriesOverride')
+    op.drop_table('ShowSeriesOverride')
+    op.drop_index(op.f('ix_ShowSeries_updated_at'), table_name='ShowSeries')
+    op.drop_index('ix_show_series_start_end', table_name='ShowSeries')
+    op.drop_index('ix_show_series_artist_start', table_name='ShowSeries')
+    op.drop_index('ix_show_series_venue_start', table_name='ShowSeries')
+    op.drop_table('ShowSeries')
@@ -0,0 +1,71 @@
+"""Show end_time, during range and venue double-booking exclusion
+
+Revision ID: d5a8f3c61e07
+Revises: c41e7a9d2b63
+Create Date: 2026-10-18 17:12:44.518203
+
+"""
+from alembic import op
+from alembic.util import CommandError
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a8f3c61e07'
+down_revision = 'c41e7a9d2b63'
+branch_labels = None
+depends_on = None
+
+# shows sharing a venue and start time: no end time keeps both of them
+# positive and apart
+DOUBLE_BOOKINGS = '''
+    SELECT id_venue, start_time, array_agg(id ORDER BY id)
+      FROM "Show"
+     GROUP BY id_venue, start_time
+    HAVING count(*) > 1
+     ORDER BY id_venue, start_time
+'''
+
+
+def check_double_bookings(connection, shown=20):
+    rows = connection.execute(sa.text(DOUBLE_BOOKINGS)).fetchall()
+    if not rows:
+        return
+    lines = ['venue %d at %s: shows %s' % (id_venue, start_time, ', '.join(map(str, ids)))
+             for id_venue, start_time, ids in rows[:shown]]
+    if len(rows) > shown:
+        lines.append('... and %d more' % (len(rows) - shown))
+    raise CommandError('%d venue time slots are double booked; move or delete all but one show '
+                       'of each and upgrade again:\n  %s' % (len(rows), '\n  '.join(lines)))
+
+
+def upgrade():
+    # Existing shows get the default two hours, cut short at the next show
+    # at the same venue so the constraint below holds for the old bookings
+    # too. Shows starting together at a venue would end up empty (the
+    # constraint ignores empty ranges, the app rejects them): those are
+    # reported and the upgrade stops before changing anything.
+    check_double_bookings(op.get_bind())
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('''
+        UPDATE "Show" AS s
+           SET end_time = LEAST(s.start_time + interval '2 hours', n.next_start)
+          FROM (SELECT id, lead(start_time) OVER (PARTITION BY id_venue
+                                                  ORDER BY start_time, id) AS next_start
+                  FROM "Show") AS n
+         WHERE s.id = n.id
+    ''')
+    op.alter_column('Show', 'end_time', nullable=False)
+    op.add_column('Show', sa.Column('during', postgresql.TSRANGE(),
+                                    sa.Computed("tsrange(start_time, end_time, '[)')"), nullable=True))
+    op.execute('''
+        ALTER TABLE "Show" ADD CONSTRAINT ex_show_venue_during
+        EXCLUDE USING gist (int4range(id_venue, id_venue, '[]') WITH =, during WITH &&)
+    ''')
+
+
+def downgrade():
+    op.drop_constraint('ex_show_venue_during', 'Show')
+    op.drop_column('Show', 'during')
+    op.drop_column('Show', 'end_time')
@@ -0,0 +1,30 @@
+"""Venue latitude, longitude and geohash
+
+Revision ID: e6b2c9d40f18
+Revises: d5a8f3c61e07
+Create Date: 2026-10-18 18:03:27.116940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2c9d40f18'
+down_revision = 'd5a8f3c61e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geohash', sa.String(length=12, collation='C'), nullable=True))
+    op.create_index(op.f('ix_Venue_geohash'), 'Venue', ['geohash'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_Venue_geohash'), table_name='Venue')
+    op.drop_column('Venue', 'geohash')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
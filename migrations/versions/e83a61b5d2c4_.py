@@ -0,0 +1,50 @@
+"""denormalized upcoming/past show counters
+
+Revision ID: e83a61b5d2c4
+Revises: 9c4d2e7f1a30
+Create Date: 2026-10-18 11:26:17.904377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e83a61b5d2c4'
+down_revision = '9c4d2e7f1a30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('ShowCounterWatermark',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # backfill from the existing shows, as of now
+    op.execute('INSERT INTO "ShowCounterWatermark" (id, rolled_at) VALUES (1, LOCALTIMESTAMP)')
+    for table, column in (('Venue', 'id_venue'), ('Artist', 'id_artist')):
+        op.execute('''
+            UPDATE "{table}" AS t
+               SET upcoming_shows_count = c.upcoming,
+                   past_shows_count = c.past
+              FROM (SELECT {column} AS owner_id,
+                           count(*) FILTER (WHERE start_time > w.rolled_at) AS upcoming,
+                           count(*) FILTER (WHERE start_time <= w.rolled_at) AS past
+                      FROM "Show", "ShowCounterWatermark" AS w
+                     WHERE w.id = 1
+                     GROUP BY {column}) AS c
+             WHERE t.id = c.owner_id
+        '''.format(table=table, column=column))
+
+
+def downgrade():
+    op.drop_table('ShowCounterWatermark')
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,70 @@
+"""Genre table with venue/artist links, replacing the genres arrays
+
+Revision ID: f7c3d1a85b29
+Revises: e6b2c9d40f18
+Create Date: 2026-10-18 19:20:05.731862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c3d1a85b29'
+down_revision = 'e6b2c9d40f18'
+branch_labels = None
+depends_on = None
+
+LINKS = (('Venue', 'VenueGenre', 'id_venue', 'ix_venue_genre_genre_venue'),
+         ('Artist', 'ArtistGenre', 'id_artist', 'ix_artist_genre_genre_artist'))
+
+
+def upgrade():
+    op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, link, column, index in LINKS:
+        op.create_table(link,
+        sa.Column(column, sa.Integer(), nullable=False),
+        sa.Column('id_genre', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['id_genre'], ['Genre.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint([column], ['%s.id' % table], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(column, 'id_genre')
+        )
+
+    # The arrays hold whatever the forms posted, including elements that are
+    # a whole array literal ("{Jazz,Blues}"): unnest, split those on commas
+    # and trim the braces, quotes and blanks.
+    for table, link, column, index in LINKS:
+        op.execute('''
+            INSERT INTO "Genre" (name)
+            SELECT DISTINCT btrim(part, ' {}"')
+              FROM "{table}", unnest(genres) AS g, regexp_split_to_table(g, ',') AS part
+             WHERE btrim(part, ' {}"') <> ''
+            ON CONFLICT (name) DO NOTHING
+        '''.replace('{table}', table))
+        op.execute('''
+            INSERT INTO "{link}" ({column}, id_genre)
+            SELECT DISTINCT t.id, "Genre".id
+              FROM "{table}" AS t, unnest(t.genres) AS g, regexp_split_to_table(g, ',') AS part, "Genre"
+             WHERE "Genre".name = btrim(part, ' {}"')
+        '''.replace('{link}', link).replace('{column}', column).replace('{table}', table))
+        op.create_index(index, link, ['id_genre', column], unique=False)
+        op.drop_column(table, 'genres')
+
+
+def downgrade():
+    for table, link, column, index in LINKS:
+        op.add_column(table, sa.Column('genres', sa.ARRAY(sa.String(length=120)), nullable=True))
+        op.execute('''
+            UPDATE "{table}" AS t
+               SET genres = (SELECT array_agg("Genre".name ORDER BY "Genre".name)
+                               FROM "{link}" JOIN "Genre" ON "Genre".id = "{link}".id_genre
+                              WHERE "{link}".{column} = t.id)
+        '''.replace('{link}', link).replace('{column}', column).replace('{table}', table))
+        op.drop_index(index, table_name=link)
+        op.drop_table(link)
+    op.drop_table('Genre')
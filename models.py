@@ -0,0 +1,266 @@
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import ExcludeConstraint, TSRANGE, TSVECTOR
+from extensions import db
+from recurrence import parse_rule
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable = False, unique = True)
+
+    def __repr__(self):
+        return f'<Genre {self.id} {self.name}>'
+
+# Genre links. The primary keys index venue/artist -> genres, the second
+# index genre -> venues/artists for the genre filters and facets.
+venue_genres = db.Table('VenueGenre',
+    db.Column('id_venue', db.Integer, db.ForeignKey('Venue.id', ondelete = 'CASCADE'), primary_key = True),
+    db.Column('id_genre', db.Integer, db.ForeignKey('Genre.id', ondelete = 'CASCADE'), primary_key = True),
+    db.Index('ix_venue_genre_genre_venue', 'id_genre', 'id_venue'),
+)
+
+artist_genres = db.Table('ArtistGenre',
+    db.Column('id_artist', db.Integer, db.ForeignKey('Artist.id', ondelete = 'CASCADE'), primary_key = True),
+    db.Column('id_genre', db.Integer, db.ForeignKey('Genre.id', ondelete = 'CASCADE'), primary_key = True),
+    db.Index('ix_artist_genre_genre_artist', 'id_genre', 'id_artist'),
+)
+
+def genres_named(names):
+  # Genre rows for the given names, in order, creating the missing ones
+  names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+  if not names:
+    return []
+  existing = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+  for name in names:
+    if name not in existing:
+      existing[name] = Genre(name = name)
+      db.session.add(existing[name])
+  return [existing[name] for name in names]
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_venue_city_state_name', 'city', 'state', 'name'),
+        db.Index('ix_venue_search_vector', 'search_vector', postgresql_using = 'gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.String)
+    seeking_description = db.Column(db.String(500))
+    website = db.Column(db.String(500))
+    # filled by `flask fyyur geocode` from a local gazetteer; geohash (see
+    # geo.py) is the spatial index for the nearby search, compared bytewise
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12, collation = 'C'), index = True)
+    # weighted full-text search document, written by the search_vector_update
+    # trigger (see the a3e9f1c7d402 migration) and `flask fyyur reindex`
+    search_vector = db.deferred(db.Column(TSVECTOR))
+    # maintained by the Show insert/delete hooks and roll_show_counters()
+    upcoming_shows_count = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    past_shows_count = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    updated_at = db.Column(db.DateTime, nullable = False, default = datetime.utcnow,
+                           onupdate = datetime.utcnow, server_default = db.text("(now() at time zone 'utc')"), index = True)
+
+    shows = db.relationship('Show', backref = 'venue', lazy= True)
+    genres = db.relationship('Genre', secondary = venue_genres, order_by = 'Genre.name',
+                             backref = db.backref('venues', lazy = 'dynamic'))
+    # DONE: implement any missing fields, as a database migration using Flask-Migrate
+
+    def __repr__(self):
+        return f'<Artist {self.id} {self.name}>'
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_artist_search_vector', 'search_vector', postgresql_using = 'gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    address = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    seeking_venue = db.Column(db.String(120))
+    seeking_description = db.Column(db.String)
+    image_link = db.Column(db.String(500))
+    website = db.Column(db.String(500))
+    # weighted full-text search document, written by the search_vector_update
+    # trigger (see the a3e9f1c7d402 migration) and `flask fyyur reindex`
+    search_vector = db.deferred(db.Column(TSVECTOR))
+    # maintained by the Show insert/delete hooks and roll_show_counters()
+    upcoming_shows_count = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    past_shows_count = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    updated_at = db.Column(db.DateTime, nullable = False, default = datetime.utcnow,
+                           onupdate = datetime.utcnow, server_default = db.text("(now() at time zone 'utc')"), index = True)
+    
+    shows = db.relationship('Show', backref = 'artist', lazy = True)
+    genres = db.relationship('Genre', secondary = artist_genres, order_by = 'Genre.name',
+                             backref = db.backref('artists', lazy = 'dynamic'))
+    # DONE: implement any missing fields, as a database migration using Flask-Migrate
+    
+    def __repr__(self):
+      return f'<Artist {self.id} {self.name}>'
+
+# DONE Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+# length of a show booked without an end time
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+
+def default_end_time(context):
+  return context.get_current_parameters()['start_time'] + DEFAULT_SHOW_DURATION
+
+def venue_range(id_venue):
+  # The venue as a single value int4range. The exclusion constraint below
+  # compares venues this way so the plain GiST range operator class covers
+  # both of its columns, without the btree_gist extension; queries that
+  # want its index must use the same expression.
+  return db.func.int4range(id_venue, id_venue, db.literal_column("'[]'"))
+
+class Show(db.Model):
+  # Shows occupy their venue over during = [start_time, end_time); the
+  # exclusion constraint rejects a show overlapping another one at the same
+  # venue, through a GiST index probe instead of a scan.
+  __tablename__ = 'Show'
+  __table_args__ = (
+      db.Index('ix_show_venue_start', 'id_venue', 'start_time'),
+      db.Index('ix_show_artist_start', 'id_artist', 'start_time'),
+      db.Index('ix_show_start_id', 'start_time', 'id'),
+      ExcludeConstraint((venue_range(db.column('id_venue')), '='), ('during', '&&'),
+                        name = 'ex_show_venue_during', using = 'gist'),
+  )
+  id = db.Column(db.Integer, primary_key=True)
+  id_artist = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable = False)
+  id_venue = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable = False)
+  start_time = db.Column(db.DateTime, nullable = False, default = datetime.utcnow)
+  end_time = db.Column(db.DateTime, nullable = False, default = default_end_time)
+  during = db.deferred(db.Column(TSRANGE, db.Computed("tsrange(start_time, end_time, '[)')")))
+  updated_at = db.Column(db.DateTime, nullable = False, default = datetime.utcnow,
+                         onupdate = datetime.utcnow, server_default = db.text("(now() at time zone 'utc')"), index = True)
+  
+  def __repr__(self):
+      return f'<Shows {self.id} {self.id_artist} {self.id_venue}>'
+
+class ShowSeries(db.Model):
+  # A recurring show (a residency): one row with a recurrence rule instead of
+  # a Show row per date. Dates are expanded on read for the window a page
+  # asks for (see recurrence.py); ShowSeriesOverride rows move or cancel
+  # single dates.
+  __tablename__ = 'ShowSeries'
+  __table_args__ = (
+      db.Index('ix_show_series_venue_start', 'id_venue', 'starts_at'),
+      db.Index('ix_show_series_artist_start', 'id_artist', 'starts_at'),
+      db.Index('ix_show_series_start_end', 'starts_at', 'ends_at'),
+  )
+  id = db.Column(db.Integer, primary_key=True)
+  id_artist = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable = False)
+  id_venue = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable = False)
+  # RRULE body, e.g. FREQ=WEEKLY;BYDAY=FR, anchored at starts_at (the first date)
+  rule = db.Column(db.String(500), nullable = False)
+  starts_at = db.Column(db.DateTime, nullable = False)
+  # last date of a COUNT/UNTIL bounded rule, NULL when the series never ends
+  ends_at = db.Column(db.DateTime)
+  updated_at = db.Column(db.DateTime, nullable = False, default = datetime.utcnow,
+                         onupdate = datetime.utcnow, server_default = db.text("(now() at time zone 'utc')"), index = True)
+
+  venue = db.relationship('Venue', backref = 'series', lazy = True)
+  artist = db.relationship('Artist', backref = 'series', lazy = True)
+  overrides = db.relationship('ShowSeriesOverride', backref = 'series', lazy = True,
+                              cascade = 'all, delete-orphan')
+
+  def recurrence(self):
+    # the form checked the rule's limits when the series was listed
+    return parse_rule(self.rule, self.starts_at, limits=False)
+
+  def __repr__(self):
+      return f'<ShowSeries {self.id} {self.id_artist} {self.id_venue} {self.rule}>'
+
+class ShowSeriesOverride(db.Model):
+  # One date of a series moved to start_time, or cancelled (start_time NULL).
+  __tablename__ = 'ShowSeriesOverride'
+  __table_args__ = (
+      db.UniqueConstraint('id_series', 'occurrence', name = 'uq_show_series_override_occurrence'),
+      db.Index('ix_show_series_override_start', 'id_series', 'start_time'),
+  )
+  id = db.Column(db.Integer, primary_key=True)
+  id_series = db.Column(db.Integer, db.ForeignKey('ShowSeries.id'), nullable = False)
+  # the date as the rule produces it
+  occurrence = db.Column(db.DateTime, nullable = False)
+  start_time = db.Column(db.DateTime)
+
+class ShowCounterWatermark(db.Model):
+  # Single row: the instant the upcoming/past show counters are correct as of.
+  # Shows starting after it are counted as upcoming; roll_show_counters()
+  # moves the ones that have started since into the past counts.
+  __tablename__ = 'ShowCounterWatermark'
+  id = db.Column(db.Integer, primary_key=True)
+  rolled_at = db.Column(db.DateTime, nullable = False)
+
+class TableDeletions(db.Model):
+  # Rows deleted from each table so far, counted by the count_deletions
+  # trigger (see the b6d2f8a4c913 migration). With the table's latest
+  # updated_at it versions the table without counting its rows.
+  __tablename__ = 'TableDeletions'
+  table_name = db.Column(db.String(63), primary_key=True)
+  deleted = db.Column(db.BigInteger, nullable = False, default = 0, server_default = '0')
+
+def adjust_show_counters(connection, id_venue, id_artist, start_time, delta):
+  # FOR SHARE: a concurrent roll_show_counters() (FOR UPDATE) waits for this
+  # transaction, or this one for the roll, so a show is never counted
+  # against a watermark the roll is moving past it
+  watermark = connection.execute(
+    db.select([ShowCounterWatermark.rolled_at]).where(ShowCounterWatermark.id == 1)
+      .with_for_update(read=True)).scalar()
+  upcoming = watermark is None or start_time > watermark
+  for model, entity_id in ((Venue, id_venue), (Artist, id_artist)):
+    column = model.upcoming_shows_count if upcoming else model.past_shows_count
+    connection.execute(model.__table__.update()
+                       .where(model.id == entity_id)
+                       .values({column.name: column + delta}))
+
+def count_imported_shows(shows):
+  # Counter updates for shows inserted in bulk (bypassing the mapper hooks):
+  # one executemany UPDATE per table with each entity's total increments.
+  # locked FOR SHARE as in adjust_show_counters()
+  watermark = db.session.query(ShowCounterWatermark.rolled_at).filter_by(id=1) \
+    .with_for_update(read=True).scalar()
+  for model, key in ((Venue, 'id_venue'), (Artist, 'id_artist')):
+    counts = {}
+    for show in shows:
+      upcoming = watermark is None or show['start_time'] > watermark
+      num_upcoming, num_past = counts.get(show[key], (0, 0))
+      counts[show[key]] = (num_upcoming + upcoming, num_past + (not upcoming))
+    table = model.__table__
+    db.session.execute(
+      table.update()
+        .where(table.c.id == db.bindparam('entity_id'))
+        .values(upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam('num_upcoming'),
+                past_shows_count=table.c.past_shows_count + db.bindparam('num_past')),
+      [{'entity_id': entity_id, 'num_upcoming': num_upcoming, 'num_past': num_past}
+       for entity_id, (num_upcoming, num_past) in counts.items()])
+
+@db.event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, show):
+  adjust_show_counters(connection, show.id_venue, show.id_artist, show.start_time, 1)
+
+@db.event.listens_for(Show, 'after_delete')
+def count_deleted_show(mapper, connection, show):
+  adjust_show_counters(connection, show.id_venue, show.id_artist, show.start_time, -1)
+
+# set up the backrefs (Show.venue, Show.artist) now; queries join through
+# them before any mapper would otherwise get configured
+db.configure_mappers()
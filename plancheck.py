@@ -0,0 +1,155 @@
+#----------------------------------------------------------------------------#
+# Query plan checks.
+#
+# Drives every read route of the URL map (as the route benchmark finds them,
+# bench.routes.route_table, each value of an any() argument apart) through
+# the Flask test client, captures the SELECT
+# statements the controllers issue and runs EXPLAIN on each of them. A route
+# fails the check when its plan sequentially scans a large table (any table
+# of the models) that the route is not expected to read in full. Run with
+# the page cache off: a cached page issues no SQL to check.
+#
+#   $ flask check-plans              # after seeding the database
+#----------------------------------------------------------------------------#
+
+import json
+import random
+from sqlalchemy import event
+from werkzeug.routing import AnyConverter
+
+# tables at or above this many (estimated) rows count as large
+LARGE_TABLE_ROWS = 10000
+
+# tables a route legitimately reads from end to end (the listings show every
+# entity and the genre facets count every link, the typeahead loads every
+# name into its in-memory index, the exports stream whole tables)
+FULL_SCAN_ALLOWED = {
+  'venues': {'Venue', 'VenueGenre'},
+  'artists': {'Artist', 'ArtistGenre'},
+  'api_venues': {'Venue', 'VenueGenre'},
+  'api_artists': {'Artist', 'ArtistGenre'},
+  'api_typeahead:venues': {'Venue'},
+  'api_typeahead:artists': {'Artist'},
+  'api_export:venues': {'Venue', 'VenueGenre'},
+  'api_export:artists': {'Artist', 'ArtistGenre'},
+  'api_export:shows': {'Show', 'Venue', 'Artist'},
+}
+
+# the name searches fall back to a scanning ILIKE without pg_trgm (see
+# queries.trigram_available), which the 5b1f0c3e9a7d migration warns about
+WITHOUT_TRIGRAM_ALLOWED = {
+  'search_venues': {'Venue', 'VenueGenre'},
+  'search_artists': {'Artist', 'ArtistGenre'},
+}
+
+# endpoints issuing no queries: files and the Prometheus scrape
+SKIPPED = {'static', 'asset', 'metrics'}
+
+# fixed search terms, where the route benchmark picks a random one: a term
+# matching most rows rightly gets a scan
+ARGUMENTS = {
+  'search': {'q': 'jazz'},
+  'api_search': {'q': 'jazz'},
+  'api_typeahead': {'q': 'ja'},
+}
+
+
+def plan_nodes(plan):
+  yield plan
+  for child in plan.get('Plans', []):
+    for node in plan_nodes(child):
+      yield node
+
+
+def table_sizes(connection, tables):
+  # {table: estimated rows}; tables never analyzed are counted
+  cursor = connection.cursor()
+  cursor.execute("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relname = ANY(%s)",
+                 (list(tables),))
+  sizes = dict(cursor.fetchall())
+  for table, rows in list(sizes.items()):
+    if rows < 0:
+      cursor.execute('SELECT count(*) FROM "%s"' % table.replace('"', '""'))
+      sizes[table] = cursor.fetchone()[0]
+  cursor.close()
+  return sizes
+
+
+def capture_statements(db, client, method, url, data=None):
+  statements = []
+
+  def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith('SELECT'):
+      statements.append((statement, parameters))
+
+  event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+  try:
+    # the body too: the exports query as they stream
+    response = client.open(url, method=method, data=data)
+    response.get_data()
+    response.close()
+  finally:
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+  return response, statements
+
+
+def explain(connection, statement, parameters):
+  cursor = connection.cursor()
+  cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+  plan = cursor.fetchone()[0]
+  cursor.close()
+  if isinstance(plan, str):
+    plan = json.loads(plan)
+  return plan[0]['Plan']
+
+
+def routes_to_check(app, db, Venue, Artist, seed=1):
+  # [(name, method, url, form data)]: one request per read route, named
+  # after the endpoint, or endpoint:value for each value of its any()
+  # argument, plus the route benchmark's variants
+  from bench.routes import Picker, route_table
+  picker = Picker(db, Venue, Artist, random.Random(seed))
+  table = route_table(app, picker, SKIPPED)
+  routes = []
+  for rule in app.url_map.iter_rules():
+    make = table.pop(rule.endpoint, None)
+    if make is None:
+      continue
+    kinds = [(name, value) for name, converter in rule._converters.items()
+             if isinstance(converter, AnyConverter) for value in picker.choices(converter)]
+    extra = ARGUMENTS.get(rule.endpoint, {})
+    if not kinds:
+      routes.append((rule.endpoint,) + make(extra=extra))
+    for name, value in kinds:
+      routes.append(('%s:%s' % (rule.endpoint, value),) + make(extra=dict(extra, **{name: value})))
+  routes += [(name,) + make() for name, make in sorted(table.items())]
+  return routes
+
+
+def check_plans(app, db, Venue, Artist):
+  # Returns a list of (endpoint, table, statement) violations.
+  from queries import trigram_available
+  violations = []
+  client = app.test_client()
+  with app.app_context():
+    allowed_scans = dict(FULL_SCAN_ALLOWED)
+    if not trigram_available():
+      print ('pg_trgm is not installed: the name searches may scan')
+      allowed_scans.update(WITHOUT_TRIGRAM_ALLOWED)
+    connection = db.engine.raw_connection()
+    try:
+      sizes = table_sizes(connection, db.metadata.tables)
+      large = {name for name, rows in sizes.items() if rows >= LARGE_TABLE_ROWS}
+      for endpoint, method, url, data in routes_to_check(app, db, Venue, Artist):
+        response, statements = capture_statements(db, client, method, url, data)
+        print ('%-24s %s %s -> %d, %d statements' % (endpoint, method, url, response.status_code, len(statements)))
+        allowed = allowed_scans.get(endpoint, set())
+        for statement, parameters in statements:
+          plan = explain(connection, statement, parameters)
+          for node in plan_nodes(plan):
+            table = node.get('Relation Name')
+            if node['Node Type'] == 'Seq Scan' and table in large and table not in allowed:
+              violations.append((endpoint, table, statement))
+    finally:
+      connection.close()
+  return violations
@@ -0,0 +1,1011 @@
+#----------------------------------------------------------------------------#
+# Queries.
+#
+# Everything the controllers and commands read from or maintain in the
+# database, kept apart from the views so commands can use it without
+# loading them.
+#----------------------------------------------------------------------------#
+
+import time
+import bisect
+from datetime import datetime, timedelta
+from itertools import groupby
+from collections import namedtuple
+from flask import request, abort, current_app
+from markupsafe import escape, Markup
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from extensions import db
+from models import (Venue, Artist, Show, ShowCounterWatermark, ShowSeries, ShowSeriesOverride,
+                    TableDeletions, DEFAULT_SHOW_DURATION, venue_range, Genre, venue_genres, artist_genres,
+                    genres_named)
+from recurrence import expand, count_dates
+from cache import LRUBackend
+from geo import covering_cells, EARTH_RADIUS_KM
+
+# series dates, shaped like the rows of shows_page() and detail_with_shows()
+SeriesShow = namedtuple('SeriesShow', 'id start_time venue_id venue_name artist_id artist_name '
+                                      'artist_image_link series_id')
+SeriesDetailShow = namedtuple('SeriesDetailShow', 'start_time other_id other_name other_image_link')
+
+def series_dates(lower, upper=None, limit=None, reverse=False, criterion=None, session=None):
+  # (series, start_time) for the dates of every series (matching criterion)
+  # within [lower, upper], at most limit per series, expanded from the rules
+  # with their overrides applied. lower None means from each series' start;
+  # a reverse walk with a limit then only expands the latest dates.
+  session = session or db.session
+  query = session.query(ShowSeries) \
+    .options(db.joinedload(ShowSeries.venue), db.joinedload(ShowSeries.artist))
+  if lower is not None:
+    query = query.filter(db.or_(ShowSeries.ends_at.is_(None), ShowSeries.ends_at >= lower))
+  if upper is not None:
+    query = query.filter(ShowSeries.starts_at <= upper)
+  if criterion is not None:
+    query = query.filter(criterion)
+  series_list = query.all()
+  if not series_list:
+    return []
+
+  # only overrides of dates in the window, or moving a date into it
+  overrides = {}
+  rows = session.query(ShowSeriesOverride.id_series, ShowSeriesOverride.occurrence,
+                       ShowSeriesOverride.start_time) \
+    .filter(ShowSeriesOverride.id_series.in_([series.id for series in series_list]))
+  if lower is not None:
+    rows = rows.filter(db.or_(ShowSeriesOverride.occurrence >= lower, ShowSeriesOverride.start_time >= lower))
+  if upper is not None:
+    rows = rows.filter(db.or_(ShowSeriesOverride.occurrence <= upper, ShowSeriesOverride.start_time <= upper))
+  for id_series, occurrence, start_time in rows:
+    overrides.setdefault(id_series, {})[occurrence] = start_time
+
+  dates = []
+  for series in series_list:
+    first = lower
+    if first is None and not (reverse and limit):
+      first = series.starts_at
+    for start_time in expand(series.recurrence(), first, upper, overrides.get(series.id), limit, reverse):
+      dates.append((series, start_time))
+  return dates
+
+# scope -> (series version, next date), see next_series_start
+_next_series_starts = LRUBackend(4096)
+
+def next_series_start(now, scope, version, criterion=None, session=None):
+  # Start of the next upcoming series date (matching criterion), for the API
+  # versions. version is the SQL series version of the scope (see
+  # series_version); the date is expanded again only when it changes or the
+  # remembered date has passed, so a conditional poll expands nothing.
+  cached = _next_series_starts.get(scope)
+  if cached is not None and cached[0] == version and (cached[1] is None or cached[1] > now):
+    return cached[1]
+  starts = [start_time for _, start_time in series_dates(now, limit=2, criterion=criterion, session=session)
+            if start_time > now]
+  start = min(starts) if starts else None
+  _next_series_starts.set(scope, (version, start))
+  return start
+
+def detail_with_shows(model, entity_id, show_fk, show_rel, other, limit=None, horizon=None, session=None):
+  # Fetches a venue (or artist) together with its shows in one round trip.
+  # The shows are joined to the other side through the Show backref, split
+  # into upcoming/past in SQL, ordered (soonest upcoming first, latest past
+  # first) and capped at DETAIL_SHOWS_LIMIT rows per section; the window
+  # count still reports the full number of shows in each section. Dates of
+  # the entity's show series are merged in; upcoming ones up to `horizon`
+  # days ahead (SERIES_HORIZON_DAYS), as open-ended series never run out.
+  # Returns (entity, upcoming_shows, past_shows, upcoming_count, past_count),
+  # or None when the entity does not exist.
+  session = session or db.session
+  limit = limit or current_app.config.get('DETAIL_SHOWS_LIMIT', 50)
+  horizon = horizon or current_app.config.get('SERIES_HORIZON_DAYS', 365)
+  now = datetime.now()
+  is_upcoming = Show.start_time > now
+  ranked = session.query(
+      show_fk.label('owner_id'),
+      Show.start_time.label('start_time'),
+      other.id.label('other_id'),
+      other.name.label('other_name'),
+      other.image_link.label('other_image_link'),
+      is_upcoming.label('upcoming'),
+      db.func.row_number().over(
+        partition_by=is_upcoming,
+        order_by=(db.case([(is_upcoming, Show.start_time)]).asc(),
+                  Show.start_time.desc())).label('position'),
+      db.func.count(Show.id).over(partition_by=is_upcoming).label('total')) \
+    .join(show_rel) \
+    .filter(show_fk == entity_id) \
+    .subquery()
+
+  rows = session.query(model, ranked) \
+    .outerjoin(ranked, db.and_(ranked.c.owner_id == model.id,
+                               ranked.c.position <= limit)) \
+    .filter(model.id == entity_id) \
+    .order_by(ranked.c.position) \
+    .all()
+  if not rows:
+    return None
+
+  entity = rows[0][0]
+  upcoming_shows, past_shows = [], []
+  counts = {True: 0, False: 0}
+  for row in rows:
+    if row.upcoming is None:
+      continue
+    (upcoming_shows if row.upcoming else past_shows).append(row)
+    counts[row.upcoming] = row.total
+
+  criterion = getattr(ShowSeries, show_fk.key) == entity_id
+  upcoming_dates = [SeriesDetailShow(start_time, *detail_other(series, other))
+                    for series, start_time in series_dates(now, now + timedelta(days=horizon),
+                                                           criterion=criterion, session=session)
+                    if start_time > now]
+  past_dates = [SeriesDetailShow(start_time, *detail_other(series, other))
+                for series, start_time in series_dates(None, now, limit, reverse=True,
+                                                       criterion=criterion, session=session)]
+  if upcoming_dates:
+    upcoming_shows = sorted(upcoming_shows + upcoming_dates, key=lambda row: row.start_time)[:limit]
+  if past_dates:
+    past_shows = sorted(past_shows + past_dates, key=lambda row: row.start_time, reverse=True)[:limit]
+  return (entity, upcoming_shows, past_shows,
+          counts[True] + len(upcoming_dates),
+          counts[False] + past_series_count(now, criterion, session))
+
+def past_series_count(now, criterion, session=None):
+  # Number of series dates (matching criterion) up to now: each rule's own
+  # dates by arithmetic (count_dates), less the overridden ones, plus the
+  # ones moved into the past.
+  session = session or db.session
+  series_list = session.query(ShowSeries).filter(criterion, ShowSeries.starts_at <= now).all()
+  if not series_list:
+    return 0
+  total = sum(count_dates(series.recurrence(), now) for series in series_list)
+  overridden, moved = session.query(
+      db.func.count(ShowSeriesOverride.id).filter(ShowSeriesOverride.occurrence <= now),
+      db.func.count(ShowSeriesOverride.id).filter(ShowSeriesOverride.start_time <= now)) \
+    .filter(ShowSeriesOverride.id_series.in_([series.id for series in series_list])) \
+    .one()
+  return total - overridden + moved
+
+def detail_other(series, other):
+  # (id, name, image_link) of the series' artist (or venue)
+  entity = series.artist if other is Artist else series.venue
+  return entity.id, entity.name, entity.image_link
+
+def roll_show_counters(now=None):
+  # Moves shows that started since the last roll from the upcoming to the
+  # past counters, one grouped UPDATE per table. Meant to run periodically
+  # (flask counters roll, e.g. from cron).
+  now = now or datetime.now()
+  state = ShowCounterWatermark.query.with_for_update().get(1)
+  if state is None:
+    return rebuild_show_counters(now)
+  for model, show_fk in ((Venue, Show.id_venue), (Artist, Show.id_artist)):
+    started = db.session.query(show_fk.label('owner_id'), db.func.count(Show.id).label('num_shows')) \
+      .filter(Show.start_time > state.rolled_at, Show.start_time <= now) \
+      .group_by(show_fk) \
+      .subquery()
+    db.session.query(model) \
+      .filter(model.id == started.c.owner_id) \
+      .update({model.upcoming_shows_count: model.upcoming_shows_count - started.c.num_shows,
+               model.past_shows_count: model.past_shows_count + started.c.num_shows},
+              synchronize_session=False)
+  state.rolled_at = now
+  db.session.commit()
+
+def counted_shows(show_fk, now):
+  # (owner_id, upcoming, past) straight from the Show table
+  return db.session.query(
+      show_fk.label('owner_id'),
+      db.func.count(Show.id).filter(Show.start_time > now).label('upcoming'),
+      db.func.count(Show.id).filter(Show.start_time <= now).label('past')) \
+    .group_by(show_fk) \
+    .subquery()
+
+def rebuild_show_counters(now=None):
+  # Recomputes every counter from the Show table.
+  now = now or datetime.now()
+  state = ShowCounterWatermark.query.with_for_update().get(1)
+  if state is None:
+    state = ShowCounterWatermark(id=1, rolled_at=now)
+    db.session.add(state)
+  for model, show_fk in ((Venue, Show.id_venue), (Artist, Show.id_artist)):
+    counts = counted_shows(show_fk, now)
+    db.session.query(model).update({model.upcoming_shows_count: 0, model.past_shows_count: 0},
+                                   synchronize_session=False)
+    db.session.query(model) \
+      .filter(model.id == counts.c.owner_id) \
+      .update({model.upcoming_shows_count: counts.c.upcoming,
+               model.past_shows_count: counts.c.past},
+              synchronize_session=False)
+  state.rolled_at = now
+  db.session.commit()
+
+def verify_show_counters():
+  # Returns (table, id, stored upcoming, stored past, actual upcoming, actual
+  # past) for every entity whose counters disagree with the Show table.
+  state = ShowCounterWatermark.query.get(1)
+  if state is None:
+    return []
+  mismatches = []
+  for model, show_fk in ((Venue, Show.id_venue), (Artist, Show.id_artist)):
+    counts = counted_shows(show_fk, state.rolled_at)
+    actual_upcoming = db.func.coalesce(counts.c.upcoming, 0)
+    actual_past = db.func.coalesce(counts.c.past, 0)
+    rows = db.session.query(model.id, model.upcoming_shows_count, model.past_shows_count,
+                            actual_upcoming, actual_past) \
+      .outerjoin(counts, counts.c.owner_id == model.id) \
+      .filter(db.or_(model.upcoming_shows_count != actual_upcoming,
+                     model.past_shows_count != actual_past)) \
+      .all()
+    mismatches.extend((model.__tablename__,) + tuple(row) for row in rows)
+  return mismatches
+
+def counterpart_ids(show_fk, entity_id, other_fk):
+  # ids of the venues (or artists) sharing shows or show series with the
+  # given artist (or venue)
+  series_fk, series_other_fk = getattr(ShowSeries, show_fk.key), getattr(ShowSeries, other_fk.key)
+  return db.session.query(other_fk).filter(show_fk == entity_id) \
+    .union(db.session.query(series_other_fk).filter(series_fk == entity_id))
+
+def touch_counterparts(show_fk, entity_id, other, other_fk):
+  # Bumps updated_at of the venues (or artists) sharing shows with an edited
+  # artist (or venue): their pages show its name, so their versions change.
+  ids = counterpart_ids(show_fk, entity_id, other_fk)
+  db.session.query(other).filter(other.id.in_(ids.subquery())) \
+    .update({other.updated_at: datetime.utcnow()}, synchronize_session=False)
+
+def counterpart_tags(show_fk, entity_id, other_fk, prefix):
+  # page-cache tags of the detail pages listing shows of the given entity,
+  # e.g. the artist pages that link to a venue
+  return ['%s:%d' % (prefix, row[0]) for row in counterpart_ids(show_fk, entity_id, other_fk)]
+
+def encode_show_cursor(start_time, show_id):
+  # keyset cursor for the /shows listing: "<start_time isoformat>_<show id>"
+  return '%s_%d' % (start_time.isoformat(), show_id)
+
+def decode_show_cursor(cursor):
+  start_time, _, show_id = cursor.rpartition('_')
+  try:
+    return datetime.fromisoformat(start_time), int(show_id)
+  except ValueError:
+    abort(400)
+
+def show_key(row):
+  # listing order; series dates sort by their negated series id, before the
+  # shows starting at the same time
+  return row.start_time, (row.id if row.series_id is None else -row.series_id)
+
+def shows_page(after=None, before=None, per_page=20, upcoming_only=True, session=None):
+  # Returns one page of shows ordered by (start_time, id) with the venue and
+  # artist joined in, plus the cursors for the neighbouring pages. Paging is
+  # keyset based (WHERE (start_time, id) > cursor), so every page costs the
+  # same regardless of how deep into the table it is. Series dates are
+  # expanded for the stretch of time the page covers and merged in.
+  session = session or db.session
+  now = datetime.now()
+  key = db.tuple_(Show.start_time, Show.id)
+  query = session.query(
+      Show.id.label('id'),
+      Show.start_time.label('start_time'),
+      Venue.id.label('venue_id'),
+      Venue.name.label('venue_name'),
+      Artist.id.label('artist_id'),
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+      db.null().label('series_id')) \
+    .join(Show.venue) \
+    .join(Show.artist)
+  if upcoming_only:
+    query = query.filter(Show.start_time > now)
+
+  cursor = None
+  if before is not None:
+    # walk backwards from the cursor, then flip the page back into order
+    cursor = decode_show_cursor(before)
+    query = query.filter(key < db.tuple_(*cursor)) \
+      .order_by(Show.start_time.desc(), Show.id.desc())
+  else:
+    if after is not None:
+      cursor = decode_show_cursor(after)
+      query = query.filter(key > db.tuple_(*cursor))
+    query = query.order_by(Show.start_time, Show.id)
+
+  rows = query.limit(per_page + 1).all()
+  rows = merge_series_shows(rows, cursor, before is not None, per_page + 1,
+                            now if upcoming_only else None, session)
+  has_more = len(rows) > per_page
+  rows = rows[:per_page]
+  if before is not None:
+    rows.reverse()
+    has_prev, has_next = has_more, True
+  else:
+    has_prev, has_next = after is not None, has_more
+
+  next_cursor = prev_cursor = None
+  if rows and has_next:
+    next_cursor = encode_show_cursor(*show_key(rows[-1]))
+  if rows and has_prev:
+    prev_cursor = encode_show_cursor(*show_key(rows[0]))
+  return rows, prev_cursor, next_cursor
+
+def merge_series_shows(rows, cursor, backwards, count, now=None, session=None):
+  # Merges series dates into a page of Show rows fetched from the cursor
+  # (count rows at most, walking backwards or forwards). Dates can only land
+  # on the page between the cursor and the furthest show fetched, or
+  # anywhere past the cursor once the shows run out; with `now` only
+  # upcoming dates count. Each series contributes at most one date at the
+  # window edges that the cursor or `now` then excludes, hence count + 1.
+  edge = rows[-1].start_time if len(rows) >= count else None
+  bound = cursor[0] if cursor is not None else None
+  if now is not None:
+    if backwards:
+      edge = max(edge, now) if edge is not None else now
+    else:
+      bound = max(bound, now) if bound is not None else now
+  if backwards:
+    if bound is None:
+      return rows
+    lower, upper = edge, bound
+  else:
+    lower, upper = bound, edge
+
+  dates = []
+  for series, start_time in series_dates(lower, upper, count + 1, backwards, session=session):
+    row = SeriesShow(None, start_time, series.venue.id, series.venue.name, series.artist.id,
+                     series.artist.name, series.artist.image_link, series.id)
+    if now is not None and start_time <= now:
+      continue
+    if cursor is not None and (show_key(row) >= cursor if backwards else show_key(row) <= cursor):
+      continue
+    dates.append(row)
+  if not dates:
+    return rows
+  return sorted(rows + dates, key=show_key, reverse=backwards)[:count]
+
+# when pg_trgm was last found missing; rechecked after TRIGRAM_RECHECK seconds
+_trigram_support = {}
+TRIGRAM_RECHECK = 60
+
+def trigram_available(session=None):
+  # pg_trgm is installed by a migration, but the role running it may not be
+  # allowed to create extensions. Once found it stays; a missing extension
+  # (or a failed check) is looked up again after TRIGRAM_RECHECK seconds, so
+  # installing it later takes effect without a restart.
+  session = session or db.session
+  if _trigram_support.get('available'):
+    return True
+  checked = _trigram_support.get('checked_at')
+  if checked is not None and time.monotonic() - checked < TRIGRAM_RECHECK:
+    return False
+  try:
+    row = session.execute(
+      db.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+    _trigram_support['available'] = row is not None
+  except Exception:
+    session.rollback()
+    current_app.logger.exception('checking for pg_trgm failed; using the ILIKE name search')
+    _trigram_support['available'] = False
+  _trigram_support['checked_at'] = time.monotonic()
+  return _trigram_support['available']
+
+def name_match(model, term, session=None):
+  # (criterion, ordering) of the name search: with pg_trgm the ILIKE and the
+  # similarity operator are both answered by the trigram GIN index and
+  # matches rank by similarity; without it a plain ILIKE ordered by name.
+  pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+  matches = model.name.ilike(pattern, escape='\\')
+  if trigram_available(session):
+    return (db.or_(matches, model.name.op('%')(term)),
+            (db.func.similarity(model.name, term).desc(), model.name))
+  return matches, (model.name,)
+
+def search_by_name(model, term, page=1, per_page=20, genres=None, session=None):
+  # Case-insensitive partial/fuzzy name search returning one page of
+  # (id, name, num_upcoming_shows) rows and the total number of matches,
+  # optionally only those of any of the given genres.
+  session = session or db.session
+  criterion, ordering = name_match(model, term, session)
+  query = session.query(
+      model.id.label('id'),
+      model.name.label('name'),
+      model.upcoming_shows_count.label('num_upcoming_shows'),
+      db.func.count().over().label('total')) \
+    .filter(criterion)
+  if genres:
+    query = query.filter(genre_criterion(model, genres))
+
+  rows = query.order_by(*ordering).limit(per_page).offset((page - 1) * per_page).all()
+  return rows, (rows[0].total if rows else 0)
+
+def search_response(model):
+  # shared by the venue and artist search handlers
+  return search_results(model, request.form.get('search_term', ''),
+                        max(request.form.get('page', type=int, default=1), 1),
+                        current_app.config.get('SEARCH_PAGE_SIZE', 20),
+                        request.form.getlist('genre'))
+
+def search_results(model, search_term, page, per_page, genres=None, session=None):
+  # One page of matches plus the genre facets of all matches (ignoring the
+  # genre filter, so the counts say what picking a genre would leave).
+  rows, count = search_by_name(model, search_term, page, per_page, genres, session)
+
+  response = {}
+  response['count'] = count
+  response['genres'] = genres or []
+  response['facets'] = genre_facets(model, [name_match(model, search_term, session)[0]], session)
+  response['data'] = [{'id': row.id, 'name': row.name,
+                       'num_upcoming_shows': row.num_upcoming_shows} for row in rows]
+  response['page'] = page
+  response['has_prev'] = page > 1
+  response['has_next'] = page * per_page < count
+  return response
+
+def venue_distance(lat, lng):
+  # great-circle distance in km from (lat, lng) to the venue, in SQL
+  a = db.func.power(db.func.sin(db.func.radians(Venue.latitude - lat) / 2), 2) + \
+    db.func.cos(db.func.radians(lat)) * db.func.cos(db.func.radians(Venue.latitude)) * \
+    db.func.power(db.func.sin(db.func.radians(Venue.longitude - lng) / 2), 2)
+  return 2 * EARTH_RADIUS_KM * db.func.asin(db.func.least(1.0, db.func.sqrt(a)))
+
+def encode_distance_cursor(distance, venue_id):
+  # keyset cursor for the nearby listing: "<distance>_<venue id>", the
+  # distance as repr() so it round-trips to the same float
+  return '%r_%d' % (distance, venue_id)
+
+def decode_distance_cursor(cursor):
+  distance, _, venue_id = cursor.rpartition('_')
+  return float(distance), int(venue_id)
+
+def venues_near(lat, lng, km, after=None, per_page=20, session=None):
+  # One page of the venues within km of (lat, lng), nearest first, and the
+  # cursor of the next page. The geohash cells covering the circle narrow
+  # the candidates through the index; only they get an exact distance.
+  session = session or db.session
+  distance = venue_distance(lat, lng)
+  cells = covering_cells(lat, lng, km)
+  query = session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.image_link,
+                        Venue.upcoming_shows_count.label('num_upcoming_shows'),
+                        distance.label('distance')) \
+    .filter(db.or_(*[db.and_(Venue.geohash >= cell, Venue.geohash < cell + '~') for cell in cells]),
+            distance <= km)
+  if after is not None:
+    query = query.filter(db.tuple_(distance, Venue.id) > db.tuple_(*decode_distance_cursor(after)))
+  rows = query.order_by(distance, Venue.id).limit(per_page + 1).all()
+  next_cursor = None
+  if len(rows) > per_page:
+    rows = rows[:per_page]
+    next_cursor = encode_distance_cursor(rows[-1].distance, rows[-1].id)
+  return rows, next_cursor
+
+def city_center(city, state, session=None):
+  # mean position of the located venues in a city, None when there are none
+  session = session or db.session
+  center = session.query(db.func.avg(Venue.latitude), db.func.avg(Venue.longitude)) \
+    .filter(db.func.lower(Venue.city) == city.strip().lower(), Venue.state == state.strip().upper(),
+            Venue.latitude.isnot(None)).one()
+  return None if center[0] is None else (float(center[0]), float(center[1]))
+
+def nearby_listing():
+  # nearby venue data for the current request
+  return nearby_rows(request.args, current_app.config.get('NEARBY_PAGE_SIZE', 20),
+                     current_app.config.get('NEARBY_MAX_PAGE_SIZE', 100),
+                     current_app.config.get('NEARBY_DEFAULT_KM', 25),
+                     current_app.config.get('NEARBY_MAX_KM', 500))
+
+def nearby_rows(args, page_size=20, max_page_size=100, default_km=25, max_km=500, session=None):
+  # Venues near ?lat=&lng= (or the venues of ?city=&state=) within ?km=,
+  # paged by ?after= and ?per_page=. Returns a dict with the search and its
+  # page; ValueError when the arguments do not locate anywhere.
+  km = args.get('km', type=float, default=default_km)
+  if not 0 < km <= max_km:
+    raise ValueError('km must be between 0 and %g' % max_km)
+  if args.get('lat') or args.get('lng'):
+    lat, lng = args.get('lat', type=float), args.get('lng', type=float)
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+      raise ValueError('lat and lng must be valid coordinates')
+  elif args.get('city') and args.get('state'):
+    center = city_center(args['city'], args['state'], session)
+    if center is None:
+      raise ValueError('No located venues in %s, %s' % (args['city'], args['state']))
+    lat, lng = center
+  else:
+    raise ValueError('Give lat and lng, or city and state')
+  per_page = min(args.get('per_page', type=int, default=page_size), max_page_size)
+  rows, next_cursor = venues_near(lat, lng, km, args.get('after'), max(per_page, 1), session)
+  return {
+    'lat': lat,
+    'lng': lng,
+    'km': km,
+    'venues': [{'id': row.id, 'name': row.name, 'city': row.city, 'state': row.state,
+                'image_link': row.image_link, 'num_upcoming_shows': row.num_upcoming_shows,
+                'distance_km': round(row.distance, 3)} for row in rows],
+    'next': next_cursor,
+  }
+
+#----------------------------------------------------------------------------#
+# Genres.
+#
+# Filters and facet counts go through the link tables' (id_genre, id) index,
+# so "Jazz venues in San Francisco" reads the Jazz venue ids from the index
+# instead of checking the genres of every venue.
+#----------------------------------------------------------------------------#
+
+def genre_link(model):
+  # (link table, its column referencing model)
+  if model is Venue:
+    return venue_genres, venue_genres.c.id_venue
+  return artist_genres, artist_genres.c.id_artist
+
+def link_genres(model, genres, session=None):
+  # Links rows inserted without the ORM (bulk imports) to their genres:
+  # {model id: genre names}, missing genres created
+  session = session or db.session
+  link, fk = genre_link(model)
+  named = {genre.name: genre for genre in genres_named(name for names in genres.values() for name in names)}
+  session.flush()
+  rows = [{fk.name: id, 'id_genre': named[name].id}
+          for id, names in genres.items()
+          for name in dict.fromkeys(name.strip() for name in names if name and name.strip())]
+  if rows:
+    session.execute(link.insert(), rows)
+
+def genre_criterion(model, genres):
+  # model rows with any of the named genres
+  link, fk = genre_link(model)
+  ids = db.select([fk]).select_from(link.join(Genre, Genre.id == link.c.id_genre)) \
+    .where(Genre.name.in_(genres))
+  return model.id.in_(ids)
+
+def genre_facets(model, criteria=(), session=None):
+  # [(genre, number of model rows matching criteria)], most common first,
+  # in one grouped query
+  session = session or db.session
+  link, fk = genre_link(model)
+  count = db.func.count(fk)
+  query = session.query(Genre.name, count).join(link, link.c.id_genre == Genre.id)
+  if criteria:
+    query = query.join(model, model.id == fk).filter(*criteria)
+  return [tuple(row) for row in query.group_by(Genre.name).order_by(count.desc(), Genre.name)]
+
+def listing_criteria(model, city=None, state=None):
+  criteria = []
+  if city:
+    criteria.append(db.func.lower(model.city) == city.strip().lower())
+  if state:
+    criteria.append(model.state == state.strip().upper())
+  return criteria
+
+def listing_filters(args):
+  # ?genre= (repeatable, any of), ?city=, ?state= of the /venues and
+  # /artists listings
+  return {'genres': args.getlist('genre'), 'city': args.get('city', ''), 'state': args.get('state', '')}
+
+def listing(model, rows_for, args, session=None):
+  # listing page data: the filtered rows and the genre facets of the rows
+  # matching the other filters
+  filters = listing_filters(args)
+  data = rows_for(session=session, **filters)
+  facets = genre_facets(model, listing_criteria(model, filters['city'], filters['state']), session)
+  return dict(filters, data=data, facets=facets)
+
+def venue_listing(args=None, session=None):
+  return listing(Venue, venue_areas, request.args if args is None else args, session)
+
+def artist_listing(args=None, session=None):
+  return listing(Artist, artist_summaries, request.args if args is None else args, session)
+
+def venue_areas(genres=None, city=None, state=None, session=None):
+  # /venues data: venues grouped by city/state with their upcoming counts.
+  # One query over the Venue table; upcoming counts are maintained on write,
+  # and the ordering puts venues of the same city/state next to each other.
+  session = session or db.session
+  query = session.query(Venue.city, Venue.state, Venue.id, Venue.name,
+                        Venue.upcoming_shows_count) \
+    .filter(*listing_criteria(Venue, city, state))
+  if genres:
+    query = query.filter(genre_criterion(Venue, genres))
+  rows = query.order_by(Venue.city, Venue.state, Venue.name).all()
+
+  data = []
+  for (city, state), area_rows in groupby(rows, key=lambda row: (row[0], row[1])):
+    venues_list = [{'id': venue_id, 'name': name, 'num_upcoming_shows': num_shows}
+                   for _, _, venue_id, name, num_shows in area_rows]
+    data.append({'city': city,
+                 'state': state,
+                 'venues': venues_list,
+                 'num_upcoming_shows': sum(v['num_upcoming_shows'] for v in venues_list)})
+  return data
+
+def artist_summaries(genres=None, city=None, state=None, session=None):
+  session = session or db.session
+  query = session.query(Artist.id, Artist.name).filter(*listing_criteria(Artist, city, state))
+  if genres:
+    query = query.filter(genre_criterion(Artist, genres))
+  rows = query.order_by(Artist.id).all()
+  return [{'id': artist_id, 'name': name} for artist_id, name in rows]
+
+def venue_detail(venue_id, limit=None, horizon=None, session=None):
+  # venue page data, or None when the venue does not exist
+  result = detail_with_shows(Venue, venue_id, Show.id_venue, Show.artist, Artist, limit, horizon, session)
+  if result is None:
+    return None
+  venue, upcoming, past, upcoming_count, past_count = result
+
+  def show_to_dict(row):
+    return {'artist_id': row.other_id,
+            'artist_name': row.other_name,
+            'artist_image_link': row.other_image_link,
+            'start_time': row.start_time}
+
+  return {
+    "id": venue_id,
+    "name": venue.name,
+    "genres": [genre.name for genre in venue.genres],
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": [show_to_dict(row) for row in past],
+    "upcoming_shows": [show_to_dict(row) for row in upcoming],
+    "past_shows_count": past_count,
+    "upcoming_shows_count": upcoming_count,
+  }
+
+def artist_detail(artist_id, limit=None, horizon=None, session=None):
+  # artist page data, or None when the artist does not exist
+  result = detail_with_shows(Artist, artist_id, Show.id_artist, Show.venue, Venue, limit, horizon, session)
+  if result is None:
+    return None
+  artist, upcoming, past, upcoming_count, past_count = result
+
+  def show_to_dict(row):
+    return {'venue_id': row.other_id,
+            'venue_name': row.other_name,
+            'venue_image_link': row.other_image_link,
+            'start_time': row.start_time}
+
+  return {
+    "id": artist_id,
+    "name": artist.name,
+    "genres": [genre.name for genre in artist.genres],
+    "address": artist.address,
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "past_shows": [show_to_dict(row) for row in past],
+    "upcoming_shows": [show_to_dict(row) for row in upcoming],
+    "past_shows_count": past_count,
+    "upcoming_shows_count": upcoming_count,
+  }
+
+#----------------------------------------------------------------------------#
+# Full-text search.
+#
+# Venues and artists carry a weighted tsvector, search_vector: name (A),
+# genres (B), city and state (C) and seeking_description (D). Triggers keep
+# it current on insert, update and genre changes (see the a3e9f1c7d402
+# migration) and a GIN index answers the @@ match. One search ranks the
+# matches of both tables together; snippets are built for the page shown
+# only, ts_headline being the expensive part.
+#----------------------------------------------------------------------------#
+
+# the text search configuration of the search_vector_update trigger
+SEARCH_CONFIG = 'english'
+SEARCH_KINDS = (('venue', Venue), ('artist', Artist))
+# ts_headline marks matches with these control characters, which become
+# <mark> tags once the snippet is HTML escaped
+HIGHLIGHT_START, HIGHLIGHT_STOP = '\x02', '\x03'
+SNIPPET_OPTIONS = ('StartSel=%s, StopSel=%s, MaxFragments=2, MaxWords=18, MinWords=6, '
+                   'FragmentDelimiter=" ... "' % (HIGHLIGHT_START, HIGHLIGHT_STOP))
+
+def text_query(term):
+  # web search syntax: words, "quoted phrases", or, -excluded
+  return db.func.websearch_to_tsquery(SEARCH_CONFIG, term)
+
+def search_document(model):
+  # the text search_vector is built from, as one string for ts_headline
+  link, fk = genre_link(model)
+  genres = db.select([db.func.string_agg(Genre.name, ', ')]) \
+    .select_from(link.join(Genre, Genre.id == link.c.id_genre)) \
+    .where(fk == model.id) \
+    .as_scalar()
+  return db.func.concat_ws(' - ', model.name, genres, db.func.concat_ws(', ', model.city, model.state),
+                           model.seeking_description)
+
+def text_search(term, page=1, per_page=20, kinds=None, session=None):
+  # One page of (kind, id, name, rank) rows matching term in the given
+  # kinds ('venue', 'artist'; default both), best ranked first, and the
+  # total number of matches.
+  session = session or db.session
+  query = text_query(term)
+  matches = db.union_all(*[
+    db.select([db.literal(kind).label('kind'), model.id.label('id'), model.name.label('name'),
+               db.func.ts_rank_cd(model.search_vector, query).label('rank')])
+      .where(model.search_vector.op('@@')(query))
+    for kind, model in SEARCH_KINDS if not kinds or kind in kinds]).subquery()
+  rows = session.query(matches, db.func.count().over().label('total')) \
+    .order_by(matches.c.rank.desc(), matches.c.kind, matches.c.id) \
+    .limit(per_page).offset((page - 1) * per_page).all()
+  return rows, (rows[0].total if rows else 0)
+
+def highlight(snippet):
+  return str(escape(snippet).replace(HIGHLIGHT_START, Markup('<mark>'))
+                            .replace(HIGHLIGHT_STOP, Markup('</mark>')))
+
+def search_snippets(term, rows, session=None):
+  # {(kind, id): snippet HTML with the matches in <mark>} for the rows, one
+  # query per kind
+  session = session or db.session
+  snippets = {}
+  for kind, model in SEARCH_KINDS:
+    ids = [row.id for row in rows if row.kind == kind]
+    if ids:
+      headline = db.func.ts_headline(SEARCH_CONFIG, search_document(model), text_query(term), SNIPPET_OPTIONS)
+      for id, snippet in session.query(model.id, headline).filter(model.id.in_(ids)):
+        snippets[kind, id] = highlight(snippet)
+  return snippets
+
+def text_search_args(args):
+  # ?q=, ?type=venue|artist (repeatable, default both) and ?page=
+  kinds = [kind for kind in args.getlist('type') if kind in dict(SEARCH_KINDS)]
+  return args.get('q', '').strip(), kinds, max(args.get('page', type=int, default=1), 1)
+
+def text_search_results(args=None, per_page=20, session=None):
+  # /search data for the request arguments (or args)
+  term, kinds, page = text_search_args(request.args if args is None else args)
+  rows, count = text_search(term, page, per_page, kinds, session) if term else ([], 0)
+  snippets = search_snippets(term, rows, session)
+
+  response = {}
+  response['q'] = term
+  response['types'] = kinds
+  response['count'] = count
+  response['data'] = [{'type': row.kind, 'id': row.id, 'name': row.name, 'rank': row.rank,
+                       'snippet': snippets.get((row.kind, row.id), '')} for row in rows]
+  response['page'] = page
+  response['has_prev'] = page > 1
+  response['has_next'] = page * per_page < count
+  return response
+
+def reindex_search_vectors(model, batch_size=1000, progress=None):
+  # Recomputes search_vector of every model row, batch_size rows (in id
+  # order) per UPDATE and commit: row locks on one batch at a time, reads
+  # and writes of the other rows go on. Returns the number of rows.
+  table = model.__table__
+  done = 0
+  last_id = 0
+  while True:
+    batch = db.session.query(model.id).filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+    if not batch:
+      return done
+    upto = batch[-1].id
+    # assigning search_vector fires the search_vector_update trigger; the
+    # content is unchanged, so updated_at (and the API versions) stay
+    result = db.session.execute(table.update()
+                                .where(table.c.id > last_id).where(table.c.id <= upto)
+                                .values(search_vector=None, updated_at=table.c.updated_at))
+    db.session.commit()
+    done += result.rowcount
+    last_id = upto
+    if progress is not None:
+      progress(done)
+
+#----------------------------------------------------------------------------#
+# Bookings.
+#
+# Overlap tests go through the GiST index of the ex_show_venue_during
+# exclusion constraint, so they cost an index probe whatever the number of
+# shows. The constraint only sees Show rows; series dates count as booked
+# for DEFAULT_SHOW_DURATION in venue_bookings(), which the show and series
+# forms check against (first_booked) and free_slots() reads.
+#----------------------------------------------------------------------------#
+
+BOOKING_CONFLICTS = db.text('''
+  SELECT b.n
+    FROM unnest(CAST(:venues AS integer[]), CAST(:starts AS timestamp[]), CAST(:ends AS timestamp[]))
+         WITH ORDINALITY AS b(id_venue, start_time, end_time, n)
+   WHERE EXISTS (SELECT 1 FROM "Show" AS s
+                  WHERE int4range(s.id_venue, s.id_venue, '[]') = int4range(b.id_venue, b.id_venue, '[]')
+                    AND s.during && tsrange(b.start_time, b.end_time, '[)'))
+''')
+
+def booked_shows(venue_id, lower, upper, session=None):
+  # shows at the venue overlapping [lower, upper), in start order
+  session = session or db.session
+  return session.query(Show.id, Show.start_time, Show.end_time) \
+    .filter(venue_range(Show.id_venue) == venue_range(venue_id),
+            Show.during.op('&&')(db.func.tsrange(lower, upper, db.literal_column("'[)'")))) \
+    .order_by(Show.start_time, Show.id)
+
+def booking_conflicts(bookings, session=None):
+  # Positions of the (id_venue, start_time, end_time) bookings that overlap
+  # a show already booked, or an earlier booking in the list; one query for
+  # the whole list.
+  session = session or db.session
+  if not bookings:
+    return set()
+  rows = session.execute(BOOKING_CONFLICTS, {
+    'venues': [booking[0] for booking in bookings],
+    'starts': [booking[1] for booking in bookings],
+    'ends': [booking[2] for booking in bookings]})
+  conflicts = {n - 1 for n, in rows}
+  accepted = {}
+  for i, (id_venue, start_time, end_time) in enumerate(bookings):
+    if i in conflicts:
+      continue
+    taken = accepted.setdefault(id_venue, [])
+    if any(start_time < other_end and other_start < end_time for other_start, other_end in taken):
+      conflicts.add(i)
+    else:
+      taken.append((start_time, end_time))
+  return conflicts
+
+def venue_bookings(venue_id, lower, upper, exclude_series=None, session=None):
+  # [(start, end)] of the venue's shows and series dates (but those of
+  # exclude_series) overlapping [lower, upper), in start order
+  session = session or db.session
+  criterion = ShowSeries.id_venue == venue_id
+  if exclude_series is not None:
+    criterion = db.and_(criterion, ShowSeries.id != exclude_series)
+  busy = [(start_time, end_time) for _, start_time, end_time in booked_shows(venue_id, lower, upper, session)]
+  busy += [(start_time, start_time + DEFAULT_SHOW_DURATION)
+           for _, start_time in series_dates(lower - DEFAULT_SHOW_DURATION, upper,
+                                             criterion=criterion, session=session)
+           if lower - DEFAULT_SHOW_DURATION < start_time < upper]
+  busy.sort()
+  return busy
+
+def first_booked(venue_id, spans, exclude_series=None, session=None):
+  # Start of the first (start, end) span overlapping a show or series date
+  # of the venue, or None; one read of the bookings across all the spans.
+  if not spans:
+    return None
+  spans = sorted(spans)
+  busy = venue_bookings(venue_id, spans[0][0], max(end for _, end in spans), exclude_series, session)
+  starts = [start_time for start_time, _ in busy]
+  # reach[k]: latest end among the first k bookings
+  reach = [None]
+  for _, end_time in busy:
+    reach.append(end_time if reach[-1] is None else max(reach[-1], end_time))
+  for start_time, end_time in spans:
+    before = bisect.bisect_left(starts, end_time)
+    if before and reach[before] > start_time:
+      return start_time
+  return None
+
+def free_slots(venue_id, lower, upper, min_length=None, session=None):
+  # [(start, end)] gaps of at least min_length between the venue's bookings
+  # (shows and series dates) within [lower, upper)
+  busy = venue_bookings(venue_id, lower, upper, session=session)
+
+  slots = []
+  cursor = lower
+  for start_time, end_time in busy + [(upper, upper)]:
+    start_time = min(max(start_time, lower), upper)
+    if start_time > cursor and (min_length is None or start_time - cursor >= min_length):
+      slots.append((cursor, start_time))
+    cursor = max(cursor, end_time)
+  return slots
+
+def export_query(kind, since=None):
+  # every venue/artist/show (shows with their venue and artist names joined),
+  # optionally only rows updated after `since`, in id order
+  if kind == 'shows':
+    model = Show
+    query = db.session.query(Show.id, Show.start_time, Show.end_time,
+                             Show.id_venue.label('venue_id'), Venue.name.label('venue_name'),
+                             Show.id_artist.label('artist_id'), Artist.name.label('artist_name'),
+                             Show.updated_at) \
+      .join(Show.venue).join(Show.artist)
+  else:
+    model = Venue if kind == 'venues' else Artist
+    link, fk = genre_link(model)
+    genres = db.select([db.func.array_agg(aggregate_order_by(Genre.name, Genre.name))]) \
+      .select_from(link.join(Genre, Genre.id == link.c.id_genre)) \
+      .where(fk == model.id) \
+      .label('genres')
+    columns = [column for column in model.__table__.columns if column.key != 'search_vector']
+    query = db.session.query(*columns, genres)
+  if since is not None:
+    query = query.filter(model.updated_at > since)
+  return query.order_by(model.id)
+
+def show_listing():
+  # /shows data for the current request
+  return show_rows(request.args, current_app.config.get('SHOWS_PAGE_SIZE', 30),
+                   current_app.config.get('SHOWS_MAX_PAGE_SIZE', 100))
+
+def show_rows(args, page_size=30, max_page_size=100, session=None):
+  # /shows data for the ?all=, ?after=/?before= and ?per_page= arguments in
+  # args: (shows, show_all, prev_cursor, next_cursor)
+  show_all = args.get('all', type=int, default=0) == 1
+  per_page = min(args.get('per_page', type=int, default=page_size), max_page_size)
+  rows, prev_cursor, next_cursor = shows_page(after=args.get('after'),
+                                              before=args.get('before'),
+                                              per_page=max(per_page, 1),
+                                              upcoming_only=not show_all,
+                                              session=session)
+
+  data = []
+  for show in rows:
+    data.append({'id': show.id,
+                'venue_id': show.venue_id,
+                'venue_name': show.venue_name,
+                'artist_id': show.artist_id,
+                'artist_name': show.artist_name,
+                'artist_image_link': show.artist_image_link,
+                'start_time': show.start_time,
+                'series_id': show.series_id })
+  return data, show_all, prev_cursor, next_cursor
+
+#----------------------------------------------------------------------------#
+# API versions.
+#
+# Cheap queries whose result changes whenever the matching API document does;
+# they are hashed into the ETag so a conditional GET never builds the body.
+# Edits and show counter updates bump updated_at (see touch_counterparts and
+# adjust_show_counters), deletes bump the table's TableDeletions counter, and
+# the next upcoming start time covers shows moving from upcoming to past as
+# time passes. Series and their overrides bump the
+# series' updated_at; their next date is expanded like on the pages, but only
+# when that version changes or the date passes (see next_series_start).
+#----------------------------------------------------------------------------#
+
+def table_version(model):
+  # (rows deleted so far, latest updated_at): two index lookups, where a
+  # row count would scan the table on every poll
+  return db.session.query(
+    db.session.query(TableDeletions.deleted)
+      .filter(TableDeletions.table_name == model.__tablename__).as_scalar(),
+    db.session.query(db.func.max(model.updated_at)).as_scalar()).one()
+
+def search_version():
+  return tuple(table_version(Venue)) + tuple(table_version(Artist))
+
+def series_version(criterion=None):
+  # (count, latest updated_at) of the series matching criterion as scalar
+  # subqueries; touch_series bumps updated_at on every series or override
+  # write, the count covers deletes
+  columns = []
+  for column in (db.func.count(ShowSeries.id), db.func.max(ShowSeries.updated_at)):
+    query = db.session.query(column)
+    if criterion is not None:
+      query = query.filter(criterion)
+    columns.append(query.as_scalar())
+  return columns
+
+def shows_version():
+  now = datetime.now()
+  version = db.session.query(
+    db.session.query(db.func.max(Show.updated_at)).as_scalar(),
+    db.session.query(db.func.max(Venue.updated_at)).as_scalar(),
+    db.session.query(db.func.max(Artist.updated_at)).as_scalar(),
+    db.session.query(db.func.min(Show.start_time)).filter(Show.start_time > now).as_scalar(),
+    *series_version()).one()
+  return tuple(version) + (next_series_start(now, 'shows', tuple(version[-2:])),)
+
+def entity_version(model, entity_id, show_fk):
+  now = datetime.now()
+  next_show = db.session.query(db.func.min(Show.start_time)) \
+    .filter(show_fk == model.id, Show.start_time > now) \
+    .as_scalar()
+  criterion = getattr(ShowSeries, show_fk.key) == entity_id
+  version = db.session.query(model.updated_at, next_show, *series_version(criterion)) \
+    .filter(model.id == entity_id).first()
+  if version is None:
+    return None
+  scope = '%s:%d' % (model.__tablename__, entity_id)
+  return tuple(version) + (next_series_start(now, scope, tuple(version[-2:]), criterion),)
+
+def show_version(show_id):
+  return db.session.query(Show.updated_at, Venue.updated_at, Artist.updated_at) \
+    .join(Show.venue).join(Show.artist) \
+    .filter(Show.id == show_id).first()
@@ -0,0 +1,179 @@
+#----------------------------------------------------------------------------#
+# Show series recurrence.
+#
+# A ShowSeries stores one RFC 5545 RRULE ("FREQ=WEEKLY;BYDAY=FR") anchored
+# at its first date instead of a Show row per date. Dates are expanded here,
+# on read, for the window a page shows only; open-ended series are walked
+# lazily so a page never expands more dates than it can display, and past
+# dates are counted by arithmetic over the rule's cycle rather than walked
+# (count_dates). Single dates can be moved or cancelled through overrides:
+# {original date: new start time, or None when cancelled}.
+#
+# Rules from the series form are limited (parse_rule) to daily or longer
+# frequencies, a few dates a day and a bounded COUNT/UNTIL, so no rule has
+# more dates in a page's window than a page can show.
+#----------------------------------------------------------------------------#
+
+import math
+import heapq
+from datetime import timedelta
+from itertools import islice, takewhile
+from dateutil.relativedelta import relativedelta
+from dateutil.rrule import rrulestr, YEARLY, MONTHLY, WEEKLY, DAILY, HOURLY, MINUTELY, SECONDLY
+
+# length of one period of the fixed-length frequencies
+PERIODS = {WEEKLY: timedelta(weeks=1), DAILY: timedelta(days=1), HOURLY: timedelta(hours=1),
+           MINUTELY: timedelta(minutes=1), SECONDLY: timedelta(seconds=1)}
+# upper bounds of the others, for sizing search windows
+LONGEST_PERIODS = {MONTHLY: timedelta(days=31), YEARLY: timedelta(days=366)}
+
+# period after which each filter repeats; rules filtered by anything else
+# (months, month days, week numbers, BYSETPOS, ...) follow the calendar
+FILTER_PERIODS = {'byweekday': timedelta(weeks=1), 'byhour': timedelta(days=1),
+                  'byminute': timedelta(hours=1), 'bysecond': timedelta(minutes=1)}
+
+# limits of rules from the series form (rrule frequencies count up from
+# YEARLY = 0 to SECONDLY = 6)
+SHORTEST_FREQ = DAILY
+MAX_DATES_PER_DAY = 4
+MAX_COUNT = 1000
+MAX_UNTIL = timedelta(days=10 * 366)
+
+
+def parse_rule(rule, dtstart, limits=True):
+  # rrule for an RRULE body anchored at dtstart; ValueError when invalid or,
+  # with limits, beyond what a series may be (see the limits above)
+  rule = (rule or '').strip()
+  if rule.upper().startswith('RRULE:'):
+    rule = rule[len('RRULE:'):]
+  if not rule or '\n' in rule or 'DTSTART' in rule.upper():
+    raise ValueError('Expected a single RRULE such as FREQ=WEEKLY;BYDAY=FR')
+  parsed = rrulestr(rule, dtstart=dtstart)
+  if limits:
+    if parsed._freq > SHORTEST_FREQ:
+      raise ValueError('A series repeats daily at most (FREQ=DAILY, WEEKLY, MONTHLY or YEARLY)')
+    per_day = len(parsed._byhour or ()) * len(parsed._byminute or ()) * len(parsed._bysecond or ())
+    if per_day > MAX_DATES_PER_DAY:
+      raise ValueError('A series has at most %d dates a day' % MAX_DATES_PER_DAY)
+    if parsed._count is not None and parsed._count > MAX_COUNT:
+      raise ValueError('COUNT is at most %d' % MAX_COUNT)
+    if parsed._until is not None and parsed._until > dtstart + MAX_UNTIL:
+      raise ValueError('UNTIL is at most %d years after the first date' % (MAX_UNTIL.days // 366))
+  return parsed
+
+
+def last_date(rule):
+  # last date of a COUNT/UNTIL bounded rule, None when it never ends
+  if rule._count is None and rule._until is None:
+    return None
+  last = None
+  for last in rule:
+    pass
+  return last
+
+
+def anchored(rule, lower):
+  # The rule with dtstart moved forward by whole intervals to just before
+  # lower: the same dates from lower on, without dateutil walking every date
+  # since the first one. COUNT rules (finite anyway) are returned as they
+  # are, as are month/year steps the day of month does not survive (the
+  # 31st, 29 February).
+  start = rule._dtstart
+  if rule._count is not None or lower <= start:
+    return rule
+  interval = rule._interval
+  if rule._freq in PERIODS:
+    step = PERIODS[rule._freq] * interval
+    anchor = start + step * max((lower - start) // step - 1, 0)
+  else:
+    months = (lower.year - start.year) * 12 + lower.month - start.month
+    if rule._freq == YEARLY:
+      months -= months % 12
+      interval *= 12
+    steps = max(months // interval - 1, 0)
+    anchor = start + relativedelta(months=steps * interval)
+    if anchor.day != start.day:
+      return rule
+  return rule if anchor == start else rule.replace(dtstart=anchor)
+
+
+def cycle_length(rule):
+  # shortest span after which the rule's dates repeat, None when they
+  # follow the calendar
+  if rule._freq not in PERIODS or rule._bynweekday:
+    return None
+  seconds = int((PERIODS[rule._freq] * rule._interval).total_seconds())
+  for name, value in rule._original_rule.items():
+    if value is None:
+      continue
+    if name not in FILTER_PERIODS:
+      return None
+    seconds = math.lcm(seconds, int(FILTER_PERIODS[name].total_seconds()))
+  return timedelta(seconds=seconds)
+
+
+def count_dates(rule, upper):
+  # Number of the rule's own dates up to upper (inclusive). A periodic rule
+  # has the same number of dates in every cycle from dtstart on, so only
+  # the first cycle and the part after the last whole one are expanded.
+  start = rule._dtstart
+  if rule._until is not None:
+    upper = min(upper, rule._until)
+  if upper < start:
+    return 0
+  cycle = cycle_length(rule)
+  if cycle is None or rule._count is not None:
+    # bounded by COUNT, or a monthly/yearly rule: a few dates a month
+    return sum(1 for _ in takewhile(lambda date: date <= upper, rule))
+  cycles = (upper - start) // cycle
+  per_cycle = sum(1 for _ in takewhile(lambda date: date < start + cycle, rule))
+  tail_start = start + cycles * cycle
+  return cycles * per_cycle + len(anchored(rule, tail_start).between(tail_start, upper, inc=True))
+
+
+def last_dates(rule, upper, limit):
+  # the rule's latest `limit` dates up to upper, latest first, searching
+  # back from upper in doubling windows
+  start = rule._dtstart
+  if rule._until is not None:
+    upper = min(upper, rule._until)
+  if upper < start or not limit:
+    return []
+  period = PERIODS.get(rule._freq) or LONGEST_PERIODS[rule._freq]
+  span = period * rule._interval * (limit + 1)
+  while True:
+    lower = max(upper - span, start)
+    dates = anchored(rule, lower).between(lower, upper, inc=True)
+    if len(dates) >= limit or lower == start:
+      return dates[::-1][:limit]
+    span *= 2
+
+
+def expand(rule, lower, upper=None, overrides=None, limit=None, reverse=False):
+  # Dates of the rule within [lower, upper] (upper None: no end; lower None:
+  # from the first date), with overrides applied, in order (latest first
+  # with reverse), at most limit. Without upper a limit is required, and a
+  # reverse walk needs upper; without lower it needs a limit too.
+  overrides = overrides or {}
+  moved = sorted(start for start in overrides.values()
+                 if start is not None and (lower is None or start >= lower) and (upper is None or start <= upper))
+
+  if lower is None:
+    # enough of the latest dates to fill limit after the overrides
+    dates = iter(last_dates(rule, upper, limit + len(overrides)))
+  elif upper is None:
+    dates = anchored(rule, lower).xafter(lower, inc=True)
+  else:
+    dates = iter(anchored(rule, lower).between(lower, upper, inc=True))
+  dates = (date for date in dates if date not in overrides)
+
+  if reverse:
+    merged = sorted(list(dates) + moved, reverse=True)
+  else:
+    merged = heapq.merge(dates, moved)
+  return list(islice(merged, limit))
+
+
+def is_date(rule, date):
+  # whether date is one of the rule's own (not overridden) dates
+  return anchored(rule, date).after(date, inc=True) == date
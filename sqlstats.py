@@ -0,0 +1,128 @@
+#----------------------------------------------------------------------------#
+# Per-request SQL instrumentation.
+#
+# Records, for every request, how many statements ran, the total time spent
+# in the database and the slowest statements. The summary is sent as an
+# X-SQL-Stats response header (when enabled) and logged as one JSON line on
+# the 'fyyur.sql' logger. Statements whose shape repeats within a request
+# more than SQL_N_PLUS_ONE_THRESHOLD times are reported as an N+1 pattern;
+# with SQL_N_PLUS_ONE_RAISE (defaults to TESTING) the request fails instead.
+#----------------------------------------------------------------------------#
+
+import re
+import json
+import time
+import logging
+from collections import Counter
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('fyyur.sql')
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class NPlusOneError(Exception):
+  pass
+
+
+def statement_shape(statement):
+  # statements are parameterised already; also fold inlined literals and
+  # whitespace so the same query always has the same shape
+  return _literals.sub('?', ' '.join(statement.split()))
+
+
+class RequestStats(object):
+
+  def __init__(self):
+    self.queries = 0
+    self.db_time = 0.0
+    self.statements = []
+    self.shapes = Counter()
+
+  def record(self, statement, elapsed):
+    self.queries += 1
+    self.db_time += elapsed
+    self.statements.append((elapsed, statement))
+    self.shapes[statement_shape(statement)] += 1
+
+  def slowest(self, count):
+    return sorted(self.statements, key=lambda item: item[0], reverse=True)[:count]
+
+  def repeated(self, threshold):
+    return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  if has_request_context() and 'sql_stats' in g:
+    conn.info.setdefault('sql_stats_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  started = conn.info.get('sql_stats_started')
+  if not started:
+    return
+  elapsed = time.perf_counter() - started.pop()
+  if has_request_context() and 'sql_stats' in g:
+    g.sql_stats.record(statement, elapsed)
+
+
+class SQLStats(object):
+  # Flask extension; configured through
+  #   SQL_STATS_ENABLED           collect stats at all (default True)
+  #   SQL_STATS_HEADER            add the X-SQL-Stats header (default DEBUG)
+  #   SQL_STATS_SLOWEST           slow statements kept in the log line
+  #   SQL_N_PLUS_ONE_THRESHOLD    repeats of one shape tolerated per request
+  #   SQL_N_PLUS_ONE_RAISE        raise NPlusOneError (default TESTING)
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.config.setdefault('SQL_STATS_ENABLED', True)
+    app.config.setdefault('SQL_STATS_HEADER', app.debug)
+    app.config.setdefault('SQL_STATS_SLOWEST', 3)
+    app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+    app.config.setdefault('SQL_N_PLUS_ONE_RAISE', app.testing)
+    if not app.config['SQL_STATS_ENABLED']:
+      return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+      event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+      event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(self.start_request)
+    app.after_request(self.finish_request)
+    app.extensions['sql_stats'] = self
+
+  def start_request(self):
+    g.sql_stats = RequestStats()
+
+  def finish_request(self, response):
+    app = current_app
+    # left on g so other after_request hooks (metrics) can read it
+    stats = g.get('sql_stats')
+    if stats is None:
+      return response
+
+    repeated = stats.repeated(app.config['SQL_N_PLUS_ONE_THRESHOLD'])
+    logger.info(json.dumps({
+      'endpoint': request.endpoint,
+      'method': request.method,
+      'path': request.path,
+      'status': response.status_code,
+      'queries': stats.queries,
+      'db_ms': round(stats.db_time * 1000.0, 3),
+      'slowest': [{'ms': round(elapsed * 1000.0, 3), 'sql': ' '.join(statement.split())}
+                  for elapsed, statement in stats.slowest(app.config['SQL_STATS_SLOWEST'])],
+      'n_plus_one': [{'count': n, 'sql': shape} for shape, n in repeated],
+    }))
+    if app.config['SQL_STATS_HEADER']:
+      response.headers['X-SQL-Stats'] = 'queries=%d; db_ms=%.3f' % (stats.queries, stats.db_time * 1000.0)
+
+    if repeated:
+      message = '%s ran %d identical statements: %s' % (request.endpoint, repeated[0][1], repeated[0][0])
+      if app.config['SQL_N_PLUS_ONE_RAISE']:
+        raise NPlusOneError(message)
+      logger.warning('N+1 query pattern: ' + message)
+    return response
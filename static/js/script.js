@@ -2,3 +2,37 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Venue/artist pickers (templates/layouts/pickers.html): suggest names from
+// the typeahead endpoint and copy the chosen one's id into the id field.
+document.querySelectorAll('input[data-typeahead]').forEach(function (input) {
+  var options = document.getElementById(input.getAttribute('list'));
+  var target = document.getElementById(input.dataset.target);
+  var ids = {};
+  var pending = null;
+
+  input.addEventListener('input', function () {
+    if (ids.hasOwnProperty(input.value)) {
+      target.value = ids[input.value];
+      return;
+    }
+    var q = input.value.trim();
+    if (!q) return;
+    if (pending) pending.abort();
+    pending = new AbortController();
+    fetch(input.dataset.typeahead + '?q=' + encodeURIComponent(q), {signal: pending.signal})
+      .then(function (response) { return response.json(); })
+      .then(function (matches) {
+        ids = {};
+        options.innerHTML = '';
+        matches.forEach(function (match) {
+          var label = match.name + ' (#' + match.id + ')';
+          ids[label] = match.id;
+          var option = document.createElement('option');
+          option.value = label;
+          options.appendChild(option);
+        });
+      })
+      .catch(function () {});
+  });
+});
@@ -0,0 +1,62 @@
+#----------------------------------------------------------------------------#
+# Test fixtures.
+#
+# The tests run against the database DATABASE_URL points at (migrated and,
+# for the plan checks, seeded with `flask bench seed`) and are skipped
+# without it. Rows they create are removed again.
+#----------------------------------------------------------------------------#
+
+import os
+import sys
+import uuid
+import types
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def testing_config(**overrides):
+  import config
+  settings = {key: getattr(config, key) for key in dir(config) if key.isupper()}
+  settings.update(TESTING=True, WTF_CSRF_ENABLED=False, CACHE_BACKEND=None, SQL_STATS_HEADER=True)
+  settings.update(overrides)
+  return types.SimpleNamespace(**settings)
+
+
+@pytest.fixture(scope='session')
+def app():
+  if not os.environ.get('DATABASE_URL'):
+    pytest.skip('DATABASE_URL is not set')
+  from app import create_app
+  return create_app(testing_config())
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+
+@pytest.fixture
+def catalogue(app):
+  # a venue and an artist of their own, deleted with their shows and series
+  # afterwards
+  from extensions import db
+  from models import Venue, Artist, Show, ShowSeries
+  tag = uuid.uuid4().hex[:8]
+  with app.app_context():
+    venue = Venue(name='Test Venue %s' % tag, city='Testville', state='NY', address='1 Test St',
+                  phone='555-555-5555')
+    artist = Artist(name='Test Artist %s' % tag, city='Testville', state='NY', phone='555-555-5555')
+    db.session.add_all([venue, artist])
+    db.session.commit()
+    ids = types.SimpleNamespace(venue_id=venue.id, artist_id=artist.id, tag=tag)
+  yield ids
+  with app.app_context():
+    for model in (Show, ShowSeries):
+      for row in model.query.filter(db.or_(model.id_venue == ids.venue_id, model.id_artist == ids.artist_id)):
+        db.session.delete(row)
+    db.session.commit()
+    db.session.delete(Venue.query.get(ids.venue_id))
+    db.session.delete(Artist.query.get(ids.artist_id))
+    db.session.commit()
+    db.session.remove()
@@ -0,0 +1,22 @@
+# The API ETags change with every write to the listed table, deletes
+# included.
+
+
+def test_venue_delete_changes_etag(app, client, catalogue):
+  from extensions import db
+  from models import Venue
+  with app.app_context():
+    # an older row, so the latest updated_at stays the same
+    venue = Venue(name='Test Venue %s old' % catalogue.tag, city='Testville', state='NY',
+                  address='2 Test St', phone='555-555-5555')
+    db.session.add(venue)
+    db.session.commit()
+    venue.updated_at = Venue.query.order_by(Venue.updated_at).first().updated_at
+    db.session.commit()
+    added = client.get('/api/v1/venues').headers['ETag']
+    db.session.delete(venue)
+    db.session.commit()
+  deleted = client.get('/api/v1/venues').headers['ETag']
+  assert deleted != added
+  assert client.get('/api/v1/venues', headers={'If-None-Match': added}).status_code == 200
+  assert client.get('/api/v1/venues', headers={'If-None-Match': deleted}).status_code == 304
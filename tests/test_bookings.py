@@ -0,0 +1,45 @@
+# Shows and series dates at one venue may not overlap, whichever is listed
+# first.
+
+from datetime import datetime, timedelta
+
+
+def series_start():
+  return (datetime.now() + timedelta(days=30)).replace(hour=20, minute=0, second=0, microsecond=0)
+
+
+def test_show_against_series(app, client, catalogue):
+  from models import Show
+  starts_at = series_start()
+  response = client.post('/shows/series/create', data={
+    'venue_id': catalogue.venue_id, 'artist_id': catalogue.artist_id,
+    'start_time': starts_at.strftime('%Y-%m-%d %H:%M:%S'), 'rule': 'FREQ=WEEKLY'})
+  assert 'Show series was successfully listed!' in response.get_data(as_text=True)
+
+  clash = starts_at + timedelta(weeks=2, hours=1)
+  response = client.post('/shows/create', data={
+    'venue_id': catalogue.venue_id, 'artist_id': catalogue.artist_id,
+    'start_time': clash.strftime('%Y-%m-%d %H:%M:%S')})
+  assert 'The venue is already booked at that time!' in response.get_data(as_text=True)
+  with app.app_context():
+    assert Show.query.filter_by(id_venue=catalogue.venue_id).count() == 0
+
+
+def test_series_against_shows(app, client, catalogue):
+  from extensions import db
+  from models import Show, ShowSeries
+  starts_at = series_start()
+  clash = starts_at + timedelta(days=3, hours=-1)
+  with app.app_context():
+    db.session.add(Show(id_venue=catalogue.venue_id, id_artist=catalogue.artist_id,
+                        start_time=clash, end_time=clash + timedelta(hours=2)))
+    db.session.commit()
+
+  response = client.post('/shows/series/create', data={
+    'venue_id': catalogue.venue_id, 'artist_id': catalogue.artist_id,
+    'start_time': starts_at.strftime('%Y-%m-%d %H:%M:%S'), 'rule': 'FREQ=DAILY'})
+  booked = (starts_at + timedelta(days=3)).strftime('%Y-%m-%d %H:%M')
+  assert 'The venue is already booked on %s!' % booked in response.get_data(as_text=True)
+  with app.app_context():
+    assert ShowSeries.query.filter_by(id_venue=catalogue.venue_id).count() == 0
+
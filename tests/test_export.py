@@ -0,0 +1,42 @@
+# Exports load back through `flask fyyur import`.
+
+from datetime import datetime, timedelta
+import pytest
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_shows_round_trip(app, catalogue, tmp_path, fmt):
+  from extensions import db
+  from models import Show
+  start = datetime.now().replace(microsecond=0) + timedelta(days=400)
+  times = [(start, start + timedelta(hours=2)), (start + timedelta(days=1), start + timedelta(days=1, hours=3))]
+  since = datetime.now() - timedelta(seconds=1)
+  with app.app_context():
+    for start_time, end_time in times:
+      db.session.add(Show(id_venue=catalogue.venue_id, id_artist=catalogue.artist_id,
+                          start_time=start_time, end_time=end_time))
+    db.session.commit()
+
+  path = tmp_path / ('shows.' + fmt)
+  runner = app.test_cli_runner()
+  result = runner.invoke(args=['fyyur', 'export', 'shows', '--format', fmt,
+                               '--since', since.isoformat(), '-o', str(path)])
+  assert result.exit_code == 0, result.output
+  lines = [line for line in path.read_text().splitlines() if catalogue.tag in line]
+  assert len(lines) == len(times)
+
+  with app.app_context():
+    Show.query.filter_by(id_venue=catalogue.venue_id).delete()
+    db.session.commit()
+  header = path.read_text().splitlines()[:1] if fmt == 'csv' else []
+  path.write_text('\n'.join(header + lines) + '\n')
+
+  rejects = tmp_path / 'rejects.ndjson'
+  result = runner.invoke(args=['fyyur', 'import', 'shows', str(path), '--rejects', str(rejects)])
+  assert result.exit_code == 0, result.output
+  assert not rejects.exists() or rejects.read_text() == ''
+  assert '2 loaded, 0 rejected' in result.output
+  with app.app_context():
+    shows = Show.query.filter_by(id_venue=catalogue.venue_id).order_by(Show.start_time).all()
+    assert [(show.start_time, show.end_time, show.id_artist) for show in shows] == \
+      [(start_time, end_time, catalogue.artist_id) for start_time, end_time in times]
@@ -0,0 +1,28 @@
+# The query plan check (flask check-plans) over every read route; against a
+# seeded database it fails on sequential scans of the large tables.
+
+from datetime import datetime, timedelta
+
+
+def test_every_get_route_checked(app, catalogue):
+  from app import URLS
+  from extensions import db
+  from models import Venue, Artist, Show
+  from plancheck import routes_to_check, SKIPPED
+  with app.app_context():
+    start = datetime.now() + timedelta(days=500)
+    db.session.add(Show(id_venue=catalogue.venue_id, id_artist=catalogue.artist_id,
+                        start_time=start, end_time=start + timedelta(hours=2)))
+    db.session.commit()
+    checked = {name.split(':')[0] for name, _, _, _ in routes_to_check(app, db, Venue, Artist)}
+  expected = {view for _, view, methods in URLS if methods is None or 'GET' in methods}
+  assert expected - SKIPPED <= checked
+  assert {'nearby_venues', 'api_nearby_venues', 'api_typeahead', 'api_export'} <= checked
+
+
+def test_plans_use_indexes(app, capsys):
+  from extensions import db
+  from models import Venue, Artist
+  from plancheck import check_plans
+  violations = check_plans(app, db, Venue, Artist)
+  assert violations == [], capsys.readouterr().out
@@ -0,0 +1,52 @@
+# Per-request SQL stats: the X-SQL-Stats header and, under TESTING, the
+# N+1 check failing the request.
+
+import os
+import re
+import pytest
+
+
+@pytest.fixture(scope='module')
+def repeating_app():
+  # an app of its own with a view running one statement per row, routed
+  # before its first request
+  if not os.environ.get('DATABASE_URL'):
+    pytest.skip('DATABASE_URL is not set')
+  from app import create_app
+  from conftest import testing_config
+  from extensions import db
+  from models import Venue
+  app = create_app(testing_config(METRICS_ENABLED=False))
+
+  def venue_names():
+    rows = db.session.query(Venue.id).order_by(Venue.id).limit(app.config['SQL_N_PLUS_ONE_THRESHOLD'] + 1)
+    ids = [id for id, in rows]
+    return ', '.join(db.session.query(Venue.name).filter(Venue.id == id).scalar() for id in ids)
+  app.add_url_rule('/test/venue-names', 'venue_names', venue_names)
+  return app
+
+
+def test_n_plus_one_raises(repeating_app, catalogue):
+  from extensions import db
+  from models import Venue
+  from sqlstats import NPlusOneError
+  with repeating_app.app_context():
+    missing = repeating_app.config['SQL_N_PLUS_ONE_THRESHOLD'] + 1 - Venue.query.count()
+    for n in range(max(missing, 0)):
+      db.session.add(Venue(name='Test Venue %s %d' % (catalogue.tag, n), city='Testville', state='NY',
+                           address='1 Test St', phone='555-555-5555'))
+    db.session.commit()
+  try:
+    with pytest.raises(NPlusOneError, match='venue_names ran'):
+      repeating_app.test_client().get('/test/venue-names')
+  finally:
+    with repeating_app.app_context():
+      Venue.query.filter(Venue.name.like('Test Venue %s %%' % catalogue.tag)).delete(synchronize_session=False)
+      db.session.commit()
+
+
+def test_header(client, catalogue):
+  response = client.get('/venues/%d' % catalogue.venue_id)
+  assert response.status_code == 200
+  match = re.match(r'queries=(\d+); db_ms=\d+\.\d{3}$', response.headers['X-SQL-Stats'])
+  assert match and int(match.group(1)) > 0
@@ -0,0 +1,194 @@
+#----------------------------------------------------------------------------#
+# Typeahead.
+#
+# Name prefix suggestions for the venue and artist pickers of the show
+# forms, answered from memory so keystroke-rate requests never reach
+# Postgres. An index is a sorted list of normalized names, one entry per
+# word start ("gar" finds "The Blue Garden"), so a lookup is a bisect plus
+# at most `limit` steps.
+#
+# Indexes are built by a background thread on first use; until one is ready
+# lookups fall back to a LIMITed database query. Writes from this process
+# update the index in place and bump the 'typeahead:<kind>' page cache tag.
+# A process seeing the tag change (with the shared 'file' backend, after
+# any worker's write) rebuilds in the background, serving the index it has
+# meanwhile. TYPEAHEAD_MAX_AGE bounds the staleness otherwise.
+#----------------------------------------------------------------------------#
+
+import time
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+
+def normalize(text):
+  return ' '.join(text.casefold().split())
+
+
+def word_keys(name):
+  # the normalized name from each of its words on
+  words = normalize(name or '').split(' ')
+  return [' '.join(words[n:]) for n in range(len(words)) if words[n]]
+
+
+class PrefixIndex(object):
+  # (id, name) pairs searchable by a prefix of any word of the name; names
+  # starting with the prefix come first. Not thread safe, see Typeahead.
+
+  def __init__(self, rows=(), version=None):
+    self.version = version
+    self.built_at = time.monotonic()
+    self.stale = False
+    self.names = {}
+    # sorted (key, id) lists: keys from the first word, keys from later words
+    self.starts, self.words = [], []
+    for id, name in rows:
+      self.names[id] = name
+      keys = word_keys(name)
+      self.starts.extend((key, id) for key in keys[:1])
+      self.words.extend((key, id) for key in keys[1:])
+    self.starts.sort()
+    self.words.sort()
+
+  def __len__(self):
+    return len(self.names)
+
+  def put(self, id, name):
+    self.remove(id)
+    self.names[id] = name
+    keys = word_keys(name)
+    for key in keys[:1]:
+      insort(self.starts, (key, id))
+    for key in keys[1:]:
+      insort(self.words, (key, id))
+
+  def remove(self, id):
+    name = self.names.pop(id, None)
+    if name is None:
+      return
+    keys = word_keys(name)
+    for entries, entry_keys in ((self.starts, keys[:1]), (self.words, keys[1:])):
+      for key in entry_keys:
+        n = bisect_left(entries, (key, id))
+        if n < len(entries) and entries[n] == (key, id):
+          del entries[n]
+
+  def search(self, prefix, limit=10):
+    prefix = normalize(prefix)
+    if not prefix:
+      return []
+    found = {}
+    for entries in (self.starts, self.words):
+      n = bisect_left(entries, (prefix,))
+      while n < len(entries) and len(found) < limit and entries[n][0].startswith(prefix):
+        found.setdefault(entries[n][1], None)
+        n += 1
+    return [(id, self.names[id]) for id in found]
+
+
+class Typeahead(object):
+  # Flask extension over a PrefixIndex per kind; configured through
+  #   TYPEAHEAD_LIMIT    suggestions per lookup by default
+  #   TYPEAHEAD_MAX_AGE  seconds after which an index is rebuilt regardless
+
+  def __init__(self, db, page_cache):
+    self.db = db
+    self.page_cache = page_cache
+    self.app = None
+    self.sources = {}
+    self.indexes = {}
+    self.building = set()
+    self.writes = Counter()
+    self.lock = threading.Lock()
+
+  def init_app(self, app, sources):
+    # sources: {kind: model with id and name columns}
+    self.app = app
+    self.sources = dict(sources)
+    app.extensions['typeahead'] = self
+
+  def tag(self, kind):
+    return 'typeahead:%s' % kind
+
+  def lookup(self, kind, prefix, limit=None):
+    # [(id, name)] of kind with a word of the name starting with prefix
+    limit = limit or self.app.config.get('TYPEAHEAD_LIMIT', 10)
+    index = self.current(kind)
+    if index is None:
+      return self.query(kind, prefix, limit)
+    with self.lock:
+      return index.search(prefix, limit)
+
+  def current(self, kind):
+    # kind's index (None before the first build), rebuilding it in the
+    # background when stale
+    index = self.indexes.get(kind)
+    version = self.page_cache.tag_version(self.tag(kind))
+    if index is None or index.stale or index.version != version or \
+        time.monotonic() - index.built_at > self.app.config.get('TYPEAHEAD_MAX_AGE', 300):
+      self.rebuild(kind, version)
+    return index
+
+  def rebuild(self, kind, version):
+    with self.lock:
+      if kind in self.building:
+        return
+      self.building.add(kind)
+    threading.Thread(target=self.build, args=(kind, version), daemon=True).start()
+
+  def build(self, kind, version):
+    model = self.sources[kind]
+    try:
+      writes = self.writes[kind]
+      with self.app.app_context():
+        try:
+          index = PrefixIndex(self.db.session.query(model.id, model.name).all(), version)
+        finally:
+          self.db.session.remove()
+      with self.lock:
+        # an in-place update made while reading would be lost: build again
+        index.stale = self.writes[kind] != writes
+        self.indexes[kind] = index
+    except Exception:
+      self.app.logger.exception('typeahead: building the %s index failed', kind)
+    finally:
+      with self.lock:
+        self.building.discard(kind)
+
+  def query(self, kind, prefix, limit):
+    # the database fallback of a cold index
+    prefix = normalize(prefix)
+    if not prefix:
+      return []
+    model = self.sources[kind]
+    pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    rows = self.db.session.query(model.id, model.name) \
+      .filter(self.db.or_(model.name.ilike(pattern, escape='\\'),
+                          model.name.ilike('% ' + pattern, escape='\\'))) \
+      .order_by(model.name).limit(limit)
+    return [tuple(row) for row in rows]
+
+  def put(self, kind, id, name):
+    # after a create or rename of kind's row id (committed)
+    with self.lock:
+      self.writes[kind] += 1
+      if kind in self.indexes:
+        self.indexes[kind].put(id, name)
+    self.page_cache.invalidate(self.tag(kind))
+
+  def remove(self, kind, id):
+    # after a delete (committed)
+    with self.lock:
+      self.writes[kind] += 1
+      if kind in self.indexes:
+        self.indexes[kind].remove(id)
+    self.page_cache.invalidate(self.tag(kind))
+
+  def invalidate(self, *kinds):
+    # after bulk writes: rebuild on the next lookup
+    self.page_cache.invalidate(*[self.tag(kind) for kind in kinds])
+    with self.lock:
+      for kind in kinds:
+        self.writes[kind] += 1
+        if kind in self.indexes:
+          self.indexes[kind].stale = True
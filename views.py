@@ -0,0 +1,633 @@
+#----------------------------------------------------------------------------#
+# Views.
+#
+# The controllers. Routed by the URL table in app.py, which only imports this
+# module (and the forms, Babel and orjson with it) when the first request
+# reaches one of them.
+#----------------------------------------------------------------------------#
+
+import hashlib
+import orjson
+import dateutil.parser
+from datetime import datetime, timedelta
+from psycopg2.errorcodes import EXCLUSION_VIOLATION
+from sqlalchemy.exc import IntegrityError
+from flask import render_template, request, Response, flash, redirect, url_for, abort, stream_with_context, g, current_app
+import datefmt
+from forms import VenueForm, ArtistForm, ShowForm, ShowSeriesForm
+from extensions import db, page_cache, typeahead
+from models import Venue, Artist, Show, ShowSeries, ShowSeriesOverride, DEFAULT_SHOW_DURATION, genres_named
+from queries import (counterpart_tags, touch_counterparts, search_response, venue_areas,
+                     artist_summaries, venue_listing, artist_listing, listing_filters, venue_detail, artist_detail, show_listing, export_query,
+                     table_version, shows_version, entity_version, show_version, free_slots,
+                     first_booked,
+                     nearby_listing, text_search_results, search_version)
+from recurrence import parse_rule, last_date, is_date, expand
+from exporter import export_lines, FORMATS as EXPORT_FORMATS
+from assets import send_asset
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+def select_locale():
+  # display locale from Accept-Language, display timezone from the 'tz' cookie
+  g.locale, g.timezone = datefmt.request_locale(request, current_app.config.get('LOCALES', ['en_US']))
+
+# pages are rendered per locale/timezone
+page_cache.vary(lambda: (g.get('locale'), g.get('timezone')))
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+def index():
+  return render_template('pages/home.html')
+
+def asset(filename):
+  # fingerprinted static files, see assets.py
+  return send_asset(current_app.config['ASSETS_DIR'], filename, request.accept_encodings)
+
+def search():
+  # full-text search over venues and artists: ?q=, ?type=, ?page=
+  results = text_search_results(per_page=current_app.config.get('SEARCH_PAGE_SIZE', 20))
+  return render_template('pages/search.html', results=results)
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@page_cache.cached(tags=lambda: ['venues'])
+def venues():
+  # DONE: replace with real venues data.
+  # DONE: num_shows should be aggregated based on number of upcoming shows per venue.
+  data = venue_listing()
+
+  return render_template('pages/venues.html', areas=data['data'], listing=data);
+
+def search_venues():
+  # DONE: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+  response = search_response(Venue)
+
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+def nearby_venues():
+  # ?city=&state= or ?lat=&lng=, ?km=; distance ordered, paged by ?after=
+  results = error = next_url = first_url = None
+  if request.args:
+    try:
+      results = nearby_listing()
+    except ValueError as e:
+      error = str(e)
+  if results is not None:
+    args = request.args.to_dict()
+    args.pop('after', None)
+    first_url = url_for('nearby_venues', **args)
+    if results['next']:
+      next_url = url_for('nearby_venues', after=results['next'], **args)
+  return render_template('pages/nearby_venues.html', results=results, error=error,
+                         next_url=next_url, first_url=first_url)
+
+@page_cache.cached(tags=lambda venue_id: ['venue:%d' % venue_id])
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  # DONE: replace with real venue data from the venues table, using venue_id
+  
+  data = venue_detail(venue_id)
+  if data is None:
+    abort(404)
+
+  return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+def create_venue_submission():
+  # DONE: insert form data as a new Venue record in the db, instead
+  # DONE: modify data to be the data object returned from db insertion
+  try:
+    form = VenueForm()
+    name = request.form['name']
+    city = request.form['city']
+    state = request.form['state']
+    address = request.form['address']
+    phone = request.form['phone']##
+    genres = genres_named(request.form.getlist('genres'))
+    facebook_link = request.form['facebook_link']
+    seeking_talent = True #request.form['seeking_talent']
+    seeking_description = "Seeking_exceptional Talent" #request.form['seeking_talent_description']
+    image_link = "https://upload.wikimedia.org/wikipedia/commons/thumb/4/4b/Madison_Square_Garden_%28MSG%29_-_Full_%2848124330357%29.jpg/275px-Madison_Square_Garden_%28MSG%29_-_Full_%2848124330357%29.jpg" #request.form['image_link']
+
+    venue = Venue(name=name, city=city, state = state, 
+                  address = address, phone = phone, genres = genres, 
+                  facebook_link = facebook_link, seeking_talent = seeking_talent,
+                  seeking_description = seeking_description,
+                  image_link = image_link)
+
+    db.session.add(venue)
+    db.session.commit()
+    page_cache.invalidate('venues')
+    typeahead.put('venues', venue.id, name)
+    # on successful db insert, flash success
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    
+  except Exception as e:
+    # DONE: on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    flash('Venue ' + request.form['name'] + ' Could not be created!')
+    db.session.rollback()
+    print (e)
+
+  finally:
+    db.session.close()
+
+
+  return render_template('pages/home.html') 
+
+def delete_venue(venue_id):
+  # DONE: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  try:
+    venue = Venue.query.get(venue_id)
+    tags = ['venues', 'shows', 'venue:%d' % venue.id] + \
+      counterpart_tags(Show.id_venue, venue.id, Show.id_artist, 'artist')
+    db.session.delete(venue)
+    db.session.commit()
+    page_cache.invalidate(*tags)
+    typeahead.remove('venues', int(venue_id))
+    flash('Venue ' + str(venue_id) + ' Deleted!')
+  except Exception as e:
+    print (e)
+    db.session.rollback()
+    flash('Venue ' + str(venue_id) + ' Could not be deleted!')
+  finally:
+    db.session.close()
+  
+  return render_template('pages/home.html')
+
+#  Artists
+#  ----------------------------------------------------------------
+@page_cache.cached(tags=lambda: ['artists'])
+def artists():
+  # DONE: replace with real data returned from querying the database
+
+  data = artist_listing()
+
+  return render_template('pages/artists.html', artists=data['data'], listing=data)
+
+def search_artists():
+  # DONE: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+
+  response = search_response(Artist)
+
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+@page_cache.cached(tags=lambda artist_id: ['artist:%d' % artist_id])
+def show_artist(artist_id):
+  # shows the venue page with the given venue_id
+  # DONE: replace with real venue data from the venues table, using venue_id
+  
+  data = artist_detail(artist_id)
+  if data is None:
+    abort(404)
+
+  return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+def edit_artist(artist_id):
+  form = ArtistForm()
+
+  artist = Artist.query.filter_by(id = artist_id).first()
+
+  artist={
+    "id": artist_id,
+    "name": artist.name,
+    "genres": [genre.name for genre in artist.genres],
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link
+    }
+
+  # DONE: populate form with fields from artist with ID <artist_id>
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+def edit_artist_submission(artist_id):
+  # DONE: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+  
+  try:
+    form =ArtistForm()
+    artist = Artist.query.filter_by(id = artist_id).first()
+
+    artist.name = request.form['name']
+    genres = genres_named(request.form.getlist('genres'))
+    if set(genres) != set(artist.genres):
+      # links only: bump updated_at for the API versions
+      artist.genres = genres
+      artist.updated_at = datetime.utcnow()
+    artist.city = request.form['city']
+    artist.state = request.form['state']
+    artist.phone = request.form['phone']
+    artist.facebook_link = request.form['facebook_link']
+    artist.image_link = 'https://upload.wikimedia.org/wikipedia/commons/thumb/a/a3/GNR_London_Stadium_2017_3_%28cropped%29.jpg/300px-GNR_London_Stadium_2017_3_%28cropped%29.jpg'
+    artist.seeking_venue = 'yes'
+    artist.seeking_description = 'seeking venues'
+    artist.website = 'www.youtube.com'
+    touch_counterparts(Show.id_artist, artist_id, Venue, Show.id_venue)
+    db.session.commit()
+    page_cache.invalidate('artists', 'shows', 'artist:%d' % artist_id,
+                          *counterpart_tags(Show.id_artist, artist_id, Show.id_venue, 'venue'))
+    typeahead.put('artists', artist_id, request.form['name'])
+  except Exception as e:
+    print (e)
+    db.session.rollback()
+  finally:
+    db.session.close()
+
+  return redirect(url_for('show_artist', artist_id=artist_id))
+
+def edit_venue(venue_id):
+  form = VenueForm()
+  venue = Venue.query.filter_by(id = venue_id).first()
+
+  venue={
+    "id": venue_id,
+    "name": venue.name,
+    "genres": [genre.name for genre in venue.genres],
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": True,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link
+  }
+
+  # DONE: populate form with values from venue with ID <venue_id>
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+def edit_venue_submission(venue_id):
+  # DONE: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+
+  try:
+    form = VenueForm()
+    venue = Venue.query.filter_by(id = venue_id).first()
+
+    if (venue.address, venue.city, venue.state) != \
+        (request.form['address'], request.form['city'], request.form['state']):
+      # moved: located again by the next `flask fyyur geocode`
+      venue.latitude = venue.longitude = venue.geohash = None
+    venue.name = request.form['name']
+    genres = genres_named(request.form.getlist('genres'))
+    if set(genres) != set(venue.genres):
+      # links only: bump updated_at for the API versions
+      venue.genres = genres
+      venue.updated_at = datetime.utcnow()
+    venue.address = request.form['address']
+    venue.city = request.form['city']
+    venue.state = request.form['state']
+    venue.phone = request.form['phone']
+    venue.facebook_link = request.form['facebook_link']
+    venue.seeking_talent = 'Yes'
+    venue.seeking_description = 'Seeking intersting talent'
+    venue.image_link = 'https://upload.wikimedia.org/wikipedia/commons/thumb/4/4b/Madison_Square_Garden_%28MSG%29_-_Full_%2848124330357%29.jpg/1920px-Madison_Square_Garden_%28MSG%29_-_Full_%2848124330357%29.jpg'
+    venue.website = 'www.youtube.com'
+    touch_counterparts(Show.id_venue, venue_id, Artist, Show.id_artist)
+    db.session.commit()
+    page_cache.invalidate('venues', 'shows', 'venue:%d' % venue_id,
+                          *counterpart_tags(Show.id_venue, venue_id, Show.id_artist, 'artist'))
+    typeahead.put('venues', venue_id, request.form['name'])
+
+  except Exception as e:
+    db.session.rollback()
+    print (e)
+
+  finally:
+    db.session.close()
+  return redirect(url_for('show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  # DONE: insert form data as a new Venue record in the db, instead
+  # DONE: modify data to be the data object returned from db insertion
+
+  try:
+    form = ArtistForm()
+    name = request.form['name']
+    city = request.form['city']
+    state = request.form['state']
+    phone = request.form['phone']
+    genres = genres_named(request.form.getlist('genres'))
+    image_link = 'https://cdn.antenne.de/thumbs/images/galleries/407413/107406_metallica_2018_Ross_Halfin_230916_04283000_crop.b237ccfa.png'
+    address = 'Alexanderplatz'
+    facebook_link = request.form['facebook_link']
+    seeking_venue = 'Yes'
+    seeking_description = 'Seeking interesting Venue'
+    website = 'www.youtube.com'
+
+    artist = Artist(name=name, city=city, state = state, phone = phone,genres=genres,
+    image_link = image_link, address=address, facebook_link= facebook_link, seeking_venue = seeking_venue,
+    seeking_description = seeking_description, website= website)
+
+    db.session.add(artist)
+    db.session.commit()
+    page_cache.invalidate('artists')
+    typeahead.put('artists', artist.id, name)
+
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  except Exception as e:
+    db.session.rollback()
+    print (e)
+    flash('Artist ' + request.form['name'] + ' failed to be listed!')
+  finally:
+    db.session.close()
+
+  # on successful db insert, flash success
+  
+  # DONE: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+  return render_template('pages/home.html')
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@page_cache.cached(tags=lambda: ['shows'])
+def shows():
+  # displays list of shows at /shows
+  # DONE: replace with real venues data.
+  #       num_shows should be aggregated based on number of upcoming shows per venue.
+  # ?all=1 includes past shows, ?after=/?before= carry the keyset cursor
+  data, show_all, prev_cursor, next_cursor = show_listing()
+
+  return render_template('pages/shows.html', shows=data, show_all=show_all,
+                         prev_cursor=prev_cursor, next_cursor=next_cursor)
+
+def create_shows():
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  # DONE: insert form data as a new Show record in the db, instead
+  try:
+    id_artist = request.form['artist_id']
+    id_venue = request.form['venue_id']
+    start_time = dateutil.parser.parse(request.form['start_time'])
+    end_time = request.form.get('end_time', '').strip()
+    end_time = dateutil.parser.parse(end_time) if end_time else start_time + DEFAULT_SHOW_DURATION
+    if end_time <= start_time:
+      raise ValueError('end_time must be after start_time')
+    # the exclusion constraint only sees shows, not series dates
+    if first_booked(int(id_venue), [(start_time, end_time)]) is not None:
+      flash('The venue is already booked at that time!')
+      return render_template('pages/home.html')
+
+    show = Show(id_artist=id_artist, id_venue= id_venue, start_time = start_time, end_time = end_time)
+
+    db.session.add(show)
+    db.session.commit()
+    page_cache.invalidate('shows', 'venues', 'venue:%d' % show.id_venue, 'artist:%d' % show.id_artist)
+    flash('Show was successfully listed!')
+  except IntegrityError as e:
+    # ex_show_venue_during: the venue has another show in that time
+    db.session.rollback()
+    print (e)
+    if getattr(e.orig, 'pgcode', None) == EXCLUSION_VIOLATION:
+      flash('The venue is already booked at that time!')
+    else:
+      flash('Show Could not be listed listed!')
+  except Exception as e:
+    db.session.rollback()
+    print (e)
+    flash('Show Could not be listed listed!')
+  finally:
+    db.session.close()
+  # on successful db insert, flash success
+  
+  # DONE: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Show could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  return render_template('pages/home.html')
+
+#  Show series
+#  ----------------------------------------------------------------
+#  A recurring show is stored once, as a recurrence rule; its dates are
+#  expanded by the listings (see recurrence.py). Creating or changing one
+#  bumps the venue and artist updated_at, for the API versions.
+
+def touch_series(series):
+  now = datetime.utcnow()
+  series.updated_at = now
+  series.venue.updated_at = now
+  series.artist.updated_at = now
+
+def create_series_form():
+  form = ShowSeriesForm()
+  return render_template('forms/new_series.html', form=form)
+
+def create_series_submission():
+  try:
+    starts_at = dateutil.parser.parse(request.form['start_time'])
+    rule = parse_rule(request.form['rule'], starts_at)
+    id_venue = int(request.form['venue_id'])
+    # its dates over the coming SERIES_HORIZON_DAYS against the venue's shows
+    # and other series
+    lower = max(starts_at, datetime.now())
+    dates = expand(rule, lower, lower + timedelta(days=current_app.config.get('SERIES_HORIZON_DAYS', 365)))
+    booked = first_booked(id_venue, [(date, date + DEFAULT_SHOW_DURATION) for date in dates])
+    if booked is not None:
+      flash('The venue is already booked on %s!' % booked.strftime('%Y-%m-%d %H:%M'))
+      return render_template('pages/home.html')
+    series = ShowSeries(id_artist=request.form['artist_id'], id_venue=request.form['venue_id'],
+                        rule=request.form['rule'].strip(), starts_at=starts_at, ends_at=last_date(rule))
+    db.session.add(series)
+    db.session.flush()
+    touch_series(series)
+    db.session.commit()
+    page_cache.invalidate('shows', 'venue:%d' % series.id_venue, 'artist:%d' % series.id_artist)
+    flash('Show series was successfully listed!')
+  except ValueError as e:
+    db.session.rollback()
+    flash('Show series could not be listed: %s' % e)
+  except Exception as e:
+    db.session.rollback()
+    print (e)
+    flash('Show series could not be listed!')
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
+
+def override_series_date(series_id):
+  # Moves one date of a series (occurrence=<date>&start_time=<new start>), or
+  # cancels it when start_time is empty.
+  series = ShowSeries.query.get_or_404(series_id)
+  venue_id = series.id_venue
+  try:
+    occurrence = dateutil.parser.parse(request.form['occurrence'])
+    start_time = request.form.get('start_time', '').strip()
+    start_time = dateutil.parser.parse(start_time) if start_time else None
+    if not is_date(series.recurrence(), occurrence):
+      raise ValueError('%s is not a date of series %d' % (occurrence, series_id))
+    override = ShowSeriesOverride.query.filter_by(id_series=series_id, occurrence=occurrence).first()
+    if override is None:
+      override = ShowSeriesOverride(id_series=series_id, occurrence=occurrence)
+      db.session.add(override)
+    override.start_time = start_time
+    touch_series(series)
+    db.session.commit()
+    page_cache.invalidate('shows', 'venue:%d' % series.id_venue, 'artist:%d' % series.id_artist)
+    flash('Show ' + ('moved!' if start_time else 'cancelled!'))
+  except Exception as e:
+    db.session.rollback()
+    print (e)
+    flash('Show could not be changed!')
+  finally:
+    db.session.close()
+  return redirect(url_for('show_venue', venue_id=venue_id))
+
+#  API
+#  ----------------------------------------------------------------
+#  Read-only JSON views of the pages above. Responses carry a weak ETag
+#  derived from the data version; a matching If-None-Match gets a 304 before
+#  any of the document is built.
+
+def json_response(data, status=200):
+  return Response(orjson.dumps(data), status=status, content_type='application/json')
+
+def api_response(version, build):
+  if version is None:
+    return json_response({'error': 'not found'}, 404)
+  # weak: the same document goes out gzip or brotli encoded too
+  etag = hashlib.sha1(repr((request.full_path, tuple(version))).encode('utf-8')).hexdigest()
+  if request.if_none_match.contains_weak(etag):
+    response = Response(status=304)
+  else:
+    response = json_response(build())
+  response.set_etag(etag, weak=True)
+  response.headers['Cache-Control'] = 'no-cache'
+  return response
+
+def api_search():
+  # same arguments as /search; snippets are HTML with the matches in <mark>
+  return api_response(search_version(),
+                      lambda: text_search_results(per_page=current_app.config.get('SEARCH_PAGE_SIZE', 20)))
+
+def api_typeahead(kind):
+  # ?q= name prefix, ?limit=; answered from memory, see typeahead.py
+  limit = min(max(request.args.get('limit', type=int, default=current_app.config.get('TYPEAHEAD_LIMIT', 10)), 1), 50)
+  matches = typeahead.lookup(kind, request.args.get('q', ''), limit)
+  response = json_response([{'id': id, 'name': name} for id, name in matches])
+  response.headers['Cache-Control'] = 'private, max-age=30'
+  return response
+
+def api_venues():
+  return api_response(table_version(Venue), lambda: venue_areas(**listing_filters(request.args)))
+
+def api_venue(venue_id):
+  return api_response(entity_version(Venue, venue_id, Show.id_venue),
+                      lambda: venue_detail(venue_id))
+
+def api_nearby_venues():
+  # same arguments as /venues/nearby
+  try:
+    return api_response(table_version(Venue), nearby_listing)
+  except ValueError as e:
+    return json_response({'error': str(e)}, 400)
+
+def api_venue_free_slots(venue_id):
+  # ?from=, ?to= (default: the next 7 days, at most FREE_SLOTS_MAX_DAYS) and
+  # ?min_minutes= for the shortest gap worth listing
+  try:
+    lower = dateutil.parser.parse(request.args['from']) if request.args.get('from') else datetime.now()
+    upper = dateutil.parser.parse(request.args['to']) if request.args.get('to') else lower + timedelta(days=7)
+  except ValueError:
+    return json_response({'error': 'invalid from/to timestamp'}, 400)
+  if upper <= lower or upper - lower > timedelta(days=current_app.config.get('FREE_SLOTS_MAX_DAYS', 92)):
+    return json_response({'error': 'to must be after from, within %d days'
+                                   % current_app.config.get('FREE_SLOTS_MAX_DAYS', 92)}, 400)
+  min_minutes = request.args.get('min_minutes', type=int)
+
+  def build():
+    slots = free_slots(venue_id, lower, upper, timedelta(minutes=min_minutes) if min_minutes else None)
+    return {'venue_id': venue_id,
+            'free': [{'start': str(start), 'end': str(end)} for start, end in slots]}
+  return api_response(entity_version(Venue, venue_id, Show.id_venue), build)
+
+def api_artists():
+  return api_response(table_version(Artist), lambda: artist_summaries(**listing_filters(request.args)))
+
+def api_artist(artist_id):
+  return api_response(entity_version(Artist, artist_id, Show.id_artist),
+                      lambda: artist_detail(artist_id))
+
+def api_shows():
+  def build():
+    data, show_all, prev_cursor, next_cursor = show_listing()
+    return {'shows': data, 'prev': prev_cursor, 'next': next_cursor}
+  return api_response(shows_version(), build)
+
+def api_show(show_id):
+  def build():
+    show = db.session.query(Show.id, Show.start_time, Venue.id, Venue.name,
+                            Artist.id, Artist.name, Artist.image_link, Show.end_time) \
+      .join(Show.venue).join(Show.artist) \
+      .filter(Show.id == show_id).one()
+    return {'id': show[0],
+            'start_time': str(show[1]),
+            'end_time': str(show[7]),
+            'venue_id': show[2],
+            'venue_name': show[3],
+            'artist_id': show[4],
+            'artist_name': show[5],
+            'artist_image_link': show[6]}
+  return api_response(show_version(show_id), build)
+
+def api_export(kind):
+  # ?format=ndjson|csv, ?since=<timestamp> for rows updated after it
+  fmt = request.args.get('format', 'ndjson')
+  if fmt not in EXPORT_FORMATS:
+    return json_response({'error': 'format must be one of %s' % ', '.join(EXPORT_FORMATS)}, 400)
+  since = request.args.get('since')
+  try:
+    since = dateutil.parser.parse(since) if since else None
+  except ValueError:
+    return json_response({'error': 'invalid since timestamp'}, 400)
+  lines = export_lines(export_query(kind, since), fmt, current_app.config.get('EXPORT_BATCH_SIZE', 1000))
+  return Response(stream_with_context(lines), content_type=EXPORT_FORMATS[fmt],
+                  headers={'Content-Disposition': 'attachment; filename=%s.%s' % (kind, fmt)})
+
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+def server_error(error):
+    return render_template('errors/500.html'), 500
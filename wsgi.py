@@ -0,0 +1,14 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point.
+#
+# Loads every view up front so forked workers share them:
+#
+#   $ gunicorn --preload -w 4 wsgi:app
+#
+# The flask command finds create_app() in app.py on its own and keeps the
+# views lazy.
+#----------------------------------------------------------------------------#
+
+from app import create_app
+
+app = create_app(lazy=False)